@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""BFS on synthetic power-law graphs: queue BFS vs level-synchronous BFS.
+
+Usage: python benchmarks/bench_bfs.py [NODES [AVG_DEGREE]]
+"""
+
+import collections
+import random
+import sys
+import time
+
+from sgmt import graphstore
+
+
+def power_law_graph(nodes, avg_degree, seed=1):
+    '''Preferential attachment-like graph built directly as a Graph.'''
+    rnd = random.Random(seed)
+    graph = graphstore.Graph(edges=graphstore.NullStore())
+    for i in range(nodes):
+        graph.nodes.intern(str(i))
+    targets = [0]
+    for src in range(1, nodes):
+        for _ in range(max(1, int(rnd.expovariate(1 / avg_degree)))):
+            dst = rnd.choice(targets)
+            graph.edge_srcs.append(src)
+            graph.edge_dsts.append(dst)
+            graph.edge_srcs.append(dst)
+            graph.edge_dsts.append(src)
+            targets.append(dst)
+        targets.append(src)
+    graph.edges.count = len(graph.edge_srcs)
+    return graph.freeze()
+
+
+def queue_bfs(graph, seeds):
+    visited = set(seeds)
+    queue = collections.deque(visited)
+    count = 0
+    while queue:
+        for d, _ in graph.successors(queue.popleft()):
+            count += 1
+            if d not in visited:
+                visited.add(d)
+                queue.append(d)
+    return count
+
+
+def level_bfs(graph, seeds):
+    return sum(len(edges) for _, edges in graphstore.bfs_levels(graph, seeds))
+
+
+def main(argv):
+    nodes = int(argv[1]) if len(argv) > 1 else 200000
+    avg_degree = float(argv[2]) if len(argv) > 2 else 4
+    graph = power_law_graph(nodes, avg_degree)
+    print('{} nodes, {} edges'.format(len(graph), len(graph.targets)))
+    numpy = graphstore.numpy
+    variants = [('queue', queue_bfs), ('levels/python', None)]
+    if numpy is not None:
+        variants.append(('levels/numpy', None))
+    for name, run in variants:
+        if run is None:
+            graphstore.numpy = numpy if name.endswith('numpy') else None
+            run = level_bfs
+        started = time.perf_counter()
+        edges = run(graph, [0])
+        elapsed = time.perf_counter() - started
+        print('{:<14} {:8.3f}s  {:12.0f} edges/s'.format(name, elapsed, edges / elapsed))
+    graphstore.numpy = numpy
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Memory per edge: dict-of-dicts of rows vs. interned CSR graph store.
+
+Usage: python benchmarks/bench_graphstore.py [EDGES [NODES]]
+"""
+
+import collections
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from sgmt import csvutil
+from sgmt import graphstore
+
+
+def make_rows(edges, nodes, seed=1):
+    rnd = random.Random(seed)
+    for i in range(edges):
+        yield csvutil.Row(
+            src='node{}'.format(rnd.randrange(nodes)),
+            dst='node{}'.format(rnd.randrange(nodes)),
+            kind=rnd.choice(('build', 'test', 'run')),
+        )
+
+
+def build_dicts(rows):
+    deps = collections.defaultdict(dict)
+    for r in rows:
+        deps[r['src']][r['dst']] = r
+    return deps
+
+
+def build_graph(rows):
+    return graphstore.Graph.from_rows(rows)
+
+
+def measure(build, edges, nodes):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build(make_rows(edges, nodes))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return {
+        'seconds': elapsed,
+        'bytes_per_edge': current / edges,
+        'peak_bytes_per_edge': peak / edges,
+    }
+
+
+def main(argv):
+    edges = int(argv[1]) if len(argv) > 1 else 200000
+    nodes = int(argv[2]) if len(argv) > 2 else edges // 10
+    for name, build in (('dict-of-dicts', build_dicts), ('graphstore', build_graph)):
+        m = measure(build, edges, nodes)
+        print('{:<14} {:8.2f}s  {:8.1f} B/edge  (peak {:8.1f} B/edge)'.format(
+            name, m['seconds'], m['bytes_per_edge'], m['peak_bytes_per_edge']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Node pattern matching: alternation regex vs `nodeutil.Matcher`.
+
+Usage: python benchmarks/bench_matcher.py [PATTERNS...]
+
+The regex is only measured for up to REGEX_LIMIT patterns, it takes too long
+beyond that.
+"""
+
+import random
+import sys
+import time
+
+from sgmt import nodeutil
+
+
+REGEX_LIMIT = 10000
+TEXTS = 10000
+
+
+def make_patterns(count, rnd):
+    result = []
+    for i in range(count):
+        name = 'pkg{}.mod{}'.format(rnd.randrange(count), i)
+        shape = rnd.random()
+        if shape < 0.6:
+            result.append('^' + name.replace('.', '_') + '^')
+        elif shape < 0.9:
+            result.append('^' + name)
+        else:
+            result.append(name)
+    return result
+
+
+def make_texts(patterns, rnd):
+    result = []
+    for i in range(TEXTS):
+        name = rnd.choice(patterns).strip('^')
+        if rnd.random() < 0.5:
+            name = name.replace('mod', 'dom')
+        result.append('//src/{}:target_{}'.format(name, i))
+    return result
+
+
+def measure(name, build, texts):
+    started = time.perf_counter()
+    match = build()
+    built = time.perf_counter()
+    hits = sum(1 for t in texts if match(t))
+    done = time.perf_counter()
+    print('  {:<8} build {:8.2f}s  match {:10.0f} texts/s  ({} hits)'.format(
+        name, built - started, len(texts) / (done - built), hits))
+
+
+def main(argv):
+    sizes = [int(a) for a in argv[1:]] or [1000, 100000, 1000000]
+    for size in sizes:
+        rnd = random.Random(size)
+        patterns = make_patterns(size, rnd)
+        texts = make_texts(patterns, rnd)
+        print('{} patterns'.format(size))
+        if size <= REGEX_LIMIT:
+            measure('regex', lambda: nodeutil.re_contains(patterns).search, texts)
+        measure('matcher', lambda: nodeutil.Matcher(patterns), texts)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
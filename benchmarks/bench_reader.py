@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Rows/sec of `Reader` (Row per record) vs `TupleReader`, read and write.
+
+Usage: python benchmarks/bench_reader.py [ROWS]
+"""
+
+import io
+import random
+import sys
+import time
+
+from sgmt import csvutil
+
+
+def make_csv(rows, seed=1):
+    rnd = random.Random(seed)
+    out = io.StringIO()
+    out.write('src,dst,kind,weight\n')
+    for i in range(rows):
+        out.write('node{},node{},{},{}\n'.format(
+            rnd.randrange(rows), rnd.randrange(rows),
+            rnd.choice(('build', 'test', '')), rnd.randrange(100)))
+    return out.getvalue()
+
+
+def run(reader_type, data, write):
+    started = time.perf_counter()
+    reader = reader_type(io.StringIO(data), dialect='default', fn=0, rn=None)
+    count = 0
+    if write:
+        w = csvutil.Writer(io.StringIO(), fieldnames=reader.fieldnames, dialect='default', extrasaction='ignore')
+        for r in reader:
+            w.writerow(r)
+            count += 1
+    else:
+        for r in reader:
+            count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main(argv):
+    rows = int(argv[1]) if len(argv) > 1 else 500000
+    data = make_csv(rows)
+    for write in (False, True):
+        for reader_type in (csvutil.Reader, csvutil.TupleReader):
+            print('{:<12} {:<10} {:12.0f} rows/s'.format(
+                reader_type.__name__, 'read+write' if write else 'read', run(reader_type, data, write)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""End-to-end benchmark suite.
+
+Generates synthetic data with "sgmt gen", runs commands as subprocesses and
+records wall time, rows/sec and peak RSS per command.  A pipeline case times
+each stage separately.  Results are saved as JSON; --compare prints the
+ratio against a previous result file.
+
+Usage: python benchmarks/run.py [--scale N] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sgmt_command(*args):
+    return [sys.executable, '-m', 'sgmt.scripts.sgmt'] + [str(a) for a in args]
+
+
+def run(args, stdout=subprocess.DEVNULL):
+    '''Runs a command.  Returns (seconds, peak RSS in KB).'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    started = time.perf_counter()
+    proc = subprocess.Popen(args, stdout=stdout, env=env)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, args)
+    return elapsed, rusage.ru_maxrss
+
+
+def count_rows(filename):
+    with open(filename, 'rb') as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+class Suite(object):
+    def __init__(self, tmp, scale):
+        self.tmp = tmp
+        self.scale = scale
+        self.results = []
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def generate(self):
+        n = self.scale
+        run(sgmt_command('gen', '--kind', 'powerlaw', '--nodes', n, '--edges', 10 * n, '--output', self.path('powerlaw.csv')))
+        run(sgmt_command('gen', '--kind', 'random', '--nodes', n, '--edges', 10 * n, '--output', self.path('random.csv')))
+        run(sgmt_command('gen', '--kind', 'chain', '--nodes', n, '--output', self.path('chain.csv')))
+        run(sgmt_command('gen', '--kind', 'fanout', '--nodes', 10 * n, '--output', self.path('fanout.csv')))
+        run(sgmt_command('gen', '--kind', 'sets', '--nodes', 5 * n, '--edges', 5 * n, '--files', 3, '--output', self.path('set{}.csv')))
+        with open(self.path('seeds.csv'), 'w') as f:
+            f.write('node\n')
+            for i in range(0, n, max(1, n // 100)):
+                f.write('^n{}^\n'.format(i))
+
+    def case(self, name, inputs, *args):
+        output = self.path(name + '.out.csv')
+        input_args = []
+        for i in inputs:
+            input_args += ['--input', self.path(i)]
+        seconds, rss = run(sgmt_command(*(list(args) + input_args + ['--output', output])))
+        rows_in = sum(count_rows(self.path(i)) for i in inputs)
+        result = {
+            'name': name,
+            'command': ' '.join(str(a) for a in args),
+            'rows_in': rows_in,
+            'rows_out': count_rows(output),
+            'seconds': seconds,
+            'rows_per_sec': rows_in / seconds if seconds else None,
+            'peak_rss_kb': rss,
+        }
+        self.results.append(result)
+        print('{:<24} {:8.2f}s {:12.0f} rows/s {:10d} KB'.format(name, seconds, result['rows_per_sec'] or 0, rss))
+        return result
+
+    def pipeline(self, name, source, stages):
+        '''Runs stages one by one through intermediate files.'''
+        stage_results = []
+        current = source
+        for i, args in enumerate(stages):
+            stage_name = '{}.{}.{}'.format(name, i, args[0])
+            stage_results.append(self.case(stage_name, [current], *args))
+            current = stage_name + '.out.csv'
+        self.results.append({
+            'name': name,
+            'seconds': sum(r['seconds'] for r in stage_results),
+            'peak_rss_kb': max(r['peak_rss_kb'] for r in stage_results),
+            'stages': [r['name'] for r in stage_results],
+        })
+
+    def run_all(self):
+        self.generate()
+        sets = ['set0.csv', 'set1.csv', 'set2.csv']
+        self.case('cat', ['random.csv'], 'cat')
+        self.case('filter', ['random.csv'], 'filter', '--column', 'src', '--nodes', self.path('seeds.csv'))
+        self.case('extract', ['random.csv'], 'extract', '--column', 'a=src')
+        for cmd in ('int', 'uni', 'sub', 'diff'):
+            self.case(cmd, sets, cmd, '--key', 'key')
+            self.case(cmd + '.compact', sets, cmd, '--key', 'key', '--compact')
+        for graph in ('powerlaw', 'random', 'chain', 'fanout'):
+            self.case('bfs.' + graph, [graph + '.csv'], 'bfs', '--nodes', self.path('seeds.csv'))
+            self.case('srcs.' + graph, [graph + '.csv'], 'srcs')
+            self.case('gstats.' + graph, [graph + '.csv'], 'gstats')
+        self.pipeline('pipeline', 'random.csv', [
+            ('filter', '--column', 'dst', '--nodes', self.path('seeds.csv')),
+            ('extract', '--column', 'src=src', '--column', 'dst=dst'),
+            ('uni',),
+            ('bfs', '--nodes', self.path('seeds.csv')),
+        ])
+        return self.results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_filename):
+    with open(old_filename) as f:
+        old = {r['name']: r for r in json.load(f)['results']}
+    print('\n{:<24} {:>10} {:>10}'.format('case', 'time', 'rss'))
+    for r in results:
+        o = old.get(r['name'])
+        if o is None:
+            continue
+        print('{:<24} {:9.2f}x {:9.2f}x'.format(
+            r['name'], r['seconds'] / o['seconds'], r['peak_rss_kb'] / o['peak_rss_kb']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=20000, help='Number of nodes in generated graphs')
+    parser.add_argument('--output', help='Save results to this JSON file')
+    parser.add_argument('--compare', help='Previous results JSON file to compare with')
+    parser.add_argument('--keep', action='store_true', help='Keep generated data')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='sgmt-bench-')
+    try:
+        results = Suite(tmp, args.scale).run_all()
+    finally:
+        if args.keep:
+            print('Data kept in', tmp)
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'scale': args.scale,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
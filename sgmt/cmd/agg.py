@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Group-by aggregation."""
+
+import logging
+import re
+
+from dsapy import app
+
+from sgmt import common
+from sgmt import csvutil
+from sgmt import spill
+
+from sgmt.cmd import set_ops
+
+
+_logger = logging.getLogger(__name__)
+
+
+AGG_RE = re.compile(r'^\s*([^=]+?)\s*=\s*(\w+)\s*\(\s*([^)]*?)\s*\)\s*$')
+DEFAULT_AGG = 'count=count()'
+
+# Rough memory footprint of a group and of a distinct value, in bytes.
+GROUP_SIZE = 200
+VALUE_SIZE = 80
+
+
+def parse_number(value):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def order_key(value):
+    '''Numbers are compared as numbers and go before other strings.'''
+    try:
+        return (0, parse_number(value), value)
+    except ValueError:
+        return (1, 0, value)
+
+
+class Aggregate(object):
+    '''Aggregate function of `column` values of a group.
+
+    Group state is built with `add` and partial states of the same group are
+    combined with `merge`, so states can be spilled to disk.  Empty values
+    are skipped by all functions but "count()" and "first".
+    '''
+
+    def __init__(self, name, column):
+        self.name = name
+        self.column = column
+
+    def init(self):
+        return None
+
+    def add(self, state, value):
+        return state
+
+    def merge(self, state, other):
+        '''Combines `state` with a later partial `other`.'''
+        return state
+
+    def result(self, state):
+        return '' if state is None else str(state)
+
+
+class Count(Aggregate):
+    def init(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1 if self.column is None or value != '' else state
+
+    def merge(self, state, other):
+        return state + other
+
+
+class CountDistinct(Aggregate):
+    def init(self):
+        return set()
+
+    def add(self, state, value):
+        if value != '':
+            state.add(value)
+        return state
+
+    def merge(self, state, other):
+        state |= other
+        return state
+
+    def result(self, state):
+        return str(len(state))
+
+
+class Min(Aggregate):
+    def better(self, a, b):
+        return a < b
+
+    def add(self, state, value):
+        if value == '':
+            return state
+        key = order_key(value)
+        if state is None or self.better(key, state):
+            return key
+        return state
+
+    def merge(self, state, other):
+        if state is None or (other is not None and self.better(other, state)):
+            return other
+        return state
+
+    def result(self, state):
+        return '' if state is None else state[2]
+
+
+class Max(Min):
+    def better(self, a, b):
+        return a > b
+
+
+class Sum(Aggregate):
+    def add(self, state, value):
+        if value == '':
+            return state
+        try:
+            number = parse_number(value)
+        except ValueError:
+            raise ValueError('sum({}): not a number: {!r}'.format(self.column, value))
+        return number if state is None else state + number
+
+    def merge(self, state, other):
+        if state is None or other is None:
+            return other if state is None else state
+        return state + other
+
+
+class First(Aggregate):
+    # State is a 1-tuple, so that an empty first value is kept.
+
+    def add(self, state, value):
+        return (value,) if state is None else state
+
+    def merge(self, state, other):
+        return other if state is None else state
+
+    def result(self, state):
+        return '' if state is None else state[0]
+
+
+FUNCTIONS = {
+    'count': Count,
+    'count_distinct': CountDistinct,
+    'min': Min,
+    'max': Max,
+    'sum': Sum,
+    'first': First,
+}
+
+
+def parse_aggregate(spec):
+    '''Parses NAME=FUNC(COLUMN).'''
+    m = AGG_RE.match(spec)
+    if not m:
+        raise ValueError('Invalid aggregate {!r}, expected NAME=FUNC(COLUMN)'.format(spec))
+    name, func, column = m.groups()
+    if func not in FUNCTIONS:
+        raise ValueError('Unknown aggregate function {!r}, known are: {}'.format(func, ', '.join(sorted(FUNCTIONS))))
+    if not column and func != 'count':
+        raise ValueError('{}() requires a column'.format(func))
+    return FUNCTIONS[func](name, column or None)
+
+
+class AggCmd(set_ops.SortedMixin, spill.SpillMixin, csvutil.Filter, app.Command):
+    '''Group rows by key and aggregate column values.'''
+    name = 'agg'
+    TUPLE_ROWS = True
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--agg',
+            action='append',
+            metavar='NAME=FUNC(COLUMN)',
+            help='Output column NAME with FUNC of COLUMN values per group, FUNC is one of: {}.  '
+                 '"count()" counts rows, other functions skip empty values.  '
+                 'Default is "{}"'.format(', '.join(sorted(FUNCTIONS)), DEFAULT_AGG),
+        )
+
+    @common.lazy
+    def aggregates(self):
+        aggs = [parse_aggregate(spec) for spec in self.flags.agg or [DEFAULT_AGG]]
+        fieldnames = self.get_in_fieldnames()
+        for a in aggs:
+            if a.column is not None and a.column not in fieldnames:
+                raise ValueError('{}: no column {!r} in input'.format(a.name, a.column))
+        return aggs
+
+    @common.lazy
+    def out_header(self):
+        return csvutil.Header(list(self.key_columns()) + [a.name for a in self.aggregates()])
+
+    def get_out_fieldnames(self):
+        return self.out_header().fieldnames
+
+    def process(self, rows):
+        # Check arguments before reading anything.
+        self.out_header()
+        if self.flags.sorted:
+            return self.process_sorted()
+        return self.process_hash(rows)
+
+    def process_sorted(self):
+        '''One group at a time from inputs sorted by key.'''
+        aggs = self.aggregates()
+        for key, group in self.sorted_groups():
+            states = [a.init() for a in aggs]
+            for _, _, r in group:
+                states = self.add_row(states, r)
+            yield self.output_row(key, states)
+
+    def add_row(self, states, row):
+        return [a.add(s, row[a.column] if a.column is not None else None) for a, s in zip(self.aggregates(), states)]
+
+    def output_row(self, key, states):
+        return csvutil.TupleRow(self.out_header(), tuple(key) + tuple(a.result(s) for a, s in zip(self.aggregates(), states)))
+
+    def process_hash(self, rows):
+        '''Hash aggregation.
+
+        With --external, partial states are hash-partitioned to disk when
+        groups take more than --memory-limit, and are merged per partition.
+        '''
+        aggs = self.aggregates()
+        memory_limit = common.parse_size(self.flags.memory_limit) if self.flags.external else None
+        distinct = [i for i, a in enumerate(aggs) if isinstance(a, CountDistinct)]
+        groups = {}
+        size = 0
+        partitioner = None
+        for r in rows:
+            k = self.row_key(r)
+            states = groups.get(k)
+            if states is None:
+                states = groups[k] = [a.init() for a in aggs]
+                size += GROUP_SIZE + sum(map(len, k))
+            for i in distinct:
+                size -= VALUE_SIZE * len(states[i])
+            states[:] = self.add_row(states, r)
+            for i in distinct:
+                size += VALUE_SIZE * len(states[i])
+            if memory_limit is not None and size > memory_limit:
+                if partitioner is None:
+                    partitioner = self.partial_partitioner()
+                _logger.debug('Spilling %d partial groups', len(groups))
+                for item in groups.items():
+                    partitioner.add(item)
+                groups, size = {}, 0
+
+        if partitioner is None:
+            for k, states in groups.items():
+                yield self.output_row(k, states)
+            return
+        with partitioner:
+            for item in groups.items():
+                partitioner.add(item)
+            groups = None
+            for part in partitioner.partitions():
+                merged = {}
+                for k, states in part:
+                    old = merged.get(k)
+                    merged[k] = states if old is None else [a.merge(s, o) for a, s, o in zip(aggs, old, states)]
+                for k, states in merged.items():
+                    yield self.output_row(k, states)
+
+    def partial_partitioner(self):
+        return spill.Partitioner(
+            lambda item: item[0],
+            memory_limit=common.parse_size(self.flags.memory_limit),
+            dir=self.flags.spill_dir,
+            codec=spill.PlainCodec(),
+            size=partial_size,
+        )
+
+
+def partial_size(item):
+    k, states = item
+    return GROUP_SIZE + sum(map(len, k)) + sum(VALUE_SIZE * len(s) for s in states if isinstance(s, set))
@@ -20,6 +20,8 @@ _logger = logging.getLogger(__name__)
 class CatCmd(csvutil.Filter, app.Command):
     '''Concatenate inputs to output.'''
     name = 'cat'
+    TUPLE_ROWS = True
+    PARALLEL = True
 
     @classmethod
     def add_arguments(cls, parser):
@@ -43,6 +45,8 @@ class CatCmd(csvutil.Filter, app.Command):
 class ExtractCmd(csvutil.Filter, app.Command):
     '''Extract columns with rename.'''
     name = 'extract'
+    TUPLE_ROWS = True
+    PARALLEL = True
 
     @classmethod
     def add_arguments(cls, parser):
@@ -67,23 +71,30 @@ class ExtractCmd(csvutil.Filter, app.Command):
         return [dst for dst, _ in self.column_pairs()]
 
     def process(self, rows):
+        header = csvutil.Header(self.get_out_fieldnames())
+        get_key = csvutil.ColumnGetter([src for _, src in self.column_pairs()])
         known = set()
         for r in rows:
-            q = csvutil.Row()
-            k = []
-            for dst, src in self.column_pairs():
-                q[dst] = r[src]
-                k.append(r[src])
-            k = tuple(k)
+            k = get_key(r)
             if k in known:
                 continue
             known.add(k)
-            yield q
+            yield csvutil.TupleRow(header, k)
+
+    def process_merge(self, rows):
+        known = set()
+        for r in rows:
+            if r.values in known:
+                continue
+            known.add(r.values)
+            yield r
 
 
 class FilterCmd(nodeutil.PatternsMixin, csvutil.Filter, app.Command):
     '''Filter by column patterns.'''
     name = 'filter'
+    TUPLE_ROWS = True
+    PARALLEL = True
 
     @classmethod
     def add_arguments(cls, parser):
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Synthetic data generator."""
+
+import logging
+import random
+
+from dsapy import app
+
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+GRAPH_KINDS = ('random', 'powerlaw', 'chain', 'fanout')
+SET_KIND = 'sets'
+
+
+class GenCmd(csvutil.Out, app.Command):
+    '''Generate reproducible synthetic graphs and sets.
+
+    Graph kinds output edges with "src", "dst" and "w" columns.  Kind "sets"
+    outputs --files files with "key" and "value" columns, --output must have
+    "{}" for file number then.
+    '''
+    name = 'gen'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--kind',
+            choices=GRAPH_KINDS + (SET_KIND,),
+            default='random',
+            help='Kind of data to generate',
+        )
+        parser.add_argument(
+            '--nodes',
+            type=int,
+            default=1000,
+            help='Number of graph nodes, or number of distinct keys for sets',
+        )
+        parser.add_argument(
+            '--edges',
+            type=int,
+            default=10000,
+            help='Number of edges for "random" and "powerlaw", rows per file for sets',
+        )
+        parser.add_argument(
+            '--fanout',
+            type=int,
+            default=100,
+            help='Children per node for "fanout"',
+        )
+        parser.add_argument(
+            '--files',
+            type=int,
+            default=3,
+            help='Number of files for sets',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed',
+        )
+
+    def get_out_fieldnames(self):
+        if self.flags.kind == SET_KIND:
+            return ['key', 'value']
+        return ['src', 'dst', 'w']
+
+    def main(self):
+        with self.instrumented():
+            self.generate()
+
+    def generate(self):
+        rnd = random.Random(self.flags.seed)
+        if self.flags.kind == SET_KIND:
+            if self.flags.files > 1 and '{}' not in self.flags.output:
+                raise ValueError('--output must contain "{}" for several files')
+            for fn in range(self.flags.files):
+                with self.get_output(self.flags.output.format(fn)) as csv_out:
+                    csv_out.writerows(gen_set(rnd, self.flags.nodes, self.flags.edges, fn))
+            return
+        edges = GENERATORS[self.flags.kind](rnd, self.flags)
+        with self.get_output() as csv_out:
+            csv_out.writerows(edge_rows(rnd, edges))
+
+
+def edge_rows(rnd, edges):
+    header = csvutil.Header(['src', 'dst', 'w'])
+    for src, dst in edges:
+        yield csvutil.TupleRow(header, ('n{}'.format(src), 'n{}'.format(dst), str(rnd.randrange(100))))
+
+
+def gen_random(rnd, flags):
+    n = flags.nodes
+    for _ in range(flags.edges):
+        yield rnd.randrange(n), rnd.randrange(n)
+
+
+def gen_powerlaw(rnd, flags):
+    '''Preferential attachment: new nodes link to nodes with high degree.
+
+    Exactly --edges edges are spread evenly over nodes 1 .. n - 1.
+    '''
+    n = flags.nodes
+    if n < 2:
+        if flags.edges:
+            raise ValueError('"powerlaw" graph needs at least 2 nodes')
+        return
+    per_node, extra = divmod(flags.edges, n - 1)
+    targets = [0]
+    for src in range(1, n):
+        for _ in range(per_node + (src <= extra)):
+            dst = rnd.choice(targets)
+            yield src, dst
+            targets.append(dst)
+        targets.append(src)
+
+
+def gen_chain(rnd, flags):
+    for i in range(flags.nodes - 1):
+        yield i, i + 1
+
+
+def gen_fanout(rnd, flags):
+    for i in range(1, flags.nodes):
+        yield (i - 1) // flags.fanout, i
+
+
+GENERATORS = {
+    'random': gen_random,
+    'powerlaw': gen_powerlaw,
+    'chain': gen_chain,
+    'fanout': gen_fanout,
+}
+
+
+def gen_set(rnd, keys, rows, fn):
+    header = csvutil.Header(['key', 'value'])
+    for i in range(rows):
+        yield csvutil.TupleRow(header, ('k{}'.format(rnd.randrange(keys)), '{}.{}'.format(fn, i)))
@@ -4,19 +4,40 @@
 """Command description."""
 
 import collections
+import contextlib
+import heapq
 import itertools
 import logging
+import operator
+import os
 
 from dsapy import app
 
+from sgmt import columnar
 from sgmt import common
 from sgmt import csvutil
+from sgmt import graphindex
+from sgmt import graphstore
 from sgmt import nodeutil
+from sgmt import reachstate
+from sgmt import sketch
+from sgmt import sortedfile
 
 
 _logger = logging.getLogger(__name__)
 
 
+DEFAULT_SAMPLE_SIZE = '1M'
+# Minimum number of nodes tracked for top degrees of sampled graphs.
+HUB_CAPACITY = 10000
+
+# Peak memory of `bfs` per node without its name, per edge without payload
+# and per payload value id, fitted to measured runs.
+NODE_BYTES = 210
+EDGE_BYTES = 100
+VALUE_ID_BYTES = 8
+
+
 class GraphOpMixin(object):
     @classmethod
     def add_arguments(cls, parser):
@@ -89,22 +110,394 @@ class InvertableMixin(InvertableInputMixin, InvertableOutputMixin):
     pass
 
 
-class BfsCmd(InvertableMixin, nodeutil.PatternsMixin, csvutil.Filter, app.Command):
+class GraphInputMixin(InvertableArg, GraphOpMixin):
+    '''Loads the graph from input rows or from a prebuilt index.'''
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--index',
+            help='Graph index file built with "index" command.  Input file is only read for output rows.',
+        )
+
+    def get_in_fieldnames(self):
+        if self.flags.index:
+            return self.load_index().fieldnames
+        return super().get_in_fieldnames()
+
+    @common.lazy
+    def get_index_source(self):
+        input_list = self.flags.input or []
+        if len(input_list) > 1:
+            raise ValueError('Only one input file may be used with --index')
+        return input_list[0] if input_list else None
+
+    def load_graph(self, rows, payload=True):
+        '''Returns a frozen `graphstore.Graph`.
+
+        Rows are expected to be inverted already with --inverted.
+        '''
+        if getattr(self.flags, 'index', None):
+            return self.load_index()
+        return self.graph_tool().graph(rows, payload=payload)
+
+    @common.lazy
+    def load_index(self):
+        return graphindex.load(self.flags.index, source=self.get_index_source(), reverse=self.flags.inverted)
+
+    def load_transposed(self, graph):
+        '''Returns `graph` loaded by `load_graph` with edges inverted.'''
+        if getattr(self.flags, 'index', None):
+            return graphindex.load(self.flags.index, source=self.get_index_source(), reverse=not self.flags.inverted)
+        return graph.transpose()
+
+
+class BfsCmd(GraphInputMixin, InvertableMixin, nodeutil.PatternsMixin, csvutil.Filter, app.Command):
     '''BFS on graph.'''
     name = 'bfs'
 
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--max-depth',
+            type=int,
+            help='Only output edges up to this distance from initial nodes',
+        )
+        parser.add_argument(
+            '--depth-column',
+            metavar='NAME',
+            help='Output edge distance from initial nodes to this column, 1 for edges from initial nodes',
+        )
+        parser.add_argument(
+            '--state',
+            metavar='FILE',
+            help='BFS state file.  If it exists, inputs are new edges to extend the saved result with.  '
+                 'The updated state is saved back.  Edges from nodes not reached yet are kept in FILE{}'.format(
+                     reachstate.DORMANT_SUFFIX),
+        )
+        parser.add_argument(
+            '--delta',
+            action='store_true',
+            help='With --state, only output edges reached in this run',
+        )
+        parser.add_argument(
+            '--lazy',
+            action='store_true',
+            help='Look up edges of visited nodes instead of reading the whole input: in --index, or with binary '
+                 'search in the input file, which must be sorted by source column (by destination column with '
+                 '--inverted).  Patterns in --nodes are exact node names then',
+        )
+
+    def get_out_fieldnames(self):
+        if getattr(self.flags, 'state', None):
+            return self.load_state_fieldnames()
+        fieldnames = super().get_out_fieldnames()
+        depth_column = getattr(self.flags, 'depth_column', None)
+        if depth_column and depth_column not in fieldnames:
+            fieldnames = list(fieldnames) + [depth_column]
+        return fieldnames
+
     def process(self, rows):
+        if getattr(self.flags, 'state', None):
+            # Resolve field names before the input is read.
+            return self.process_state(rows, list(self.load_state_fieldnames()))
+        if getattr(self.flags, 'lazy', False):
+            return self.process_lazy()
         gt = self.graph_tool()
-        return gt.bfs(rows, self.nodes_match_func())
+        return gt.bfs_graph(
+            self.load_graph(rows),
+            self.nodes_match_func(),
+            max_depth=getattr(self.flags, 'max_depth', None),
+            depth_column=getattr(self.flags, 'depth_column', None),
+        )
+
+    def process_lazy(self):
+        '''BFS with edges of visited nodes looked up in --index or a sorted input file.'''
+        with self.lazy_lookup() as lookup:
+            yield from self.graph_tool().bfs_lazy(
+                lookup,
+                nodeutil.exact_names(self.get_nodes()),
+                max_depth=self.flags.max_depth,
+                depth_column=self.flags.depth_column,
+            )
+
+    @contextlib.contextmanager
+    def lazy_lookup(self):
+        '''Yields a function returning rows of edges from a node, inverted already with --inverted.'''
+        if self.flags.index:
+            # Loaded with edges grouped by destination with --inverted.
+            graph = self.load_index()
+            def lookup(node):
+                node_id = graph.nodes.get(node)
+                if node_id is None:
+                    return []
+                return [graph.edge_row(edge_id) for _, edge_id in graph.successors(node_id)]
+            yield lookup
+            return
+        input_list = self.flags.input or []
+        if len(input_list) != 1 or input_list[0] == '-':
+            raise ValueError(
+                '--lazy requires --index or exactly one input file sorted by {} column'.format(
+                    'destination' if self.flags.inverted else 'source'))
+        key = self.flags.dst if self.flags.inverted else self.flags.src
+        dialect = self.file_dialect(input_list[0], self.flags.input_dialect)
+        with sortedfile.SortedFile(input_list[0], key, dialect=dialect) as sf:
+            def lookup(node):
+                return [self.preprocess_input(r) for r in sf.lookup(node)]
+            yield lookup
+
+    def state_signature(self):
+        return {
+            'nodes': sorted(self.get_nodes()),
+            'src': self.flags.src,
+            'dst': self.flags.dst,
+            'inverted': self.flags.inverted,
+        }
+
+    @common.lazy
+    def load_state(self):
+        '''Saved state, or None if the state file doesn't exist yet.'''
+        if self.flags.max_depth is not None or self.flags.depth_column or self.flags.index:
+            raise ValueError('--state can not be used with --max-depth, --depth-column or --index')
+        if not os.path.exists(self.flags.state):
+            return None
+        return reachstate.State.load(self.flags.state, self.state_signature())
+
+    def load_state_fieldnames(self):
+        state = self.load_state()
+        if state is None:
+            return self.get_in_fieldnames()
+        return state.fieldnames
+
+    def process_state(self, rows, fieldnames):
+        '''Extends saved BFS result with new edges from `rows`.
+
+        Output rows come in the order edges were reached, which may differ
+        from BFS order of a full run.  Input columns missing from the state
+        are dropped.  The state is saved before any output, so new edges are
+        kept even if output stops early.
+        '''
+        state = self.load_state()
+        try:
+            if state is None:
+                graph = self.load_graph(rows)
+                seeds = [n for n in graph.find_nodes(self.nodes_match_func()) if graph.out_degree(n)]
+                edge_ids = list(graphstore.bfs(graph, seeds))
+                dormant = reachstate.DormantStore(reachstate.dormant_filename(self.flags.state), new=True)
+                state = reachstate.State.from_graph(graph, self.state_signature(), fieldnames, seeds, edge_ids, dormant)
+                reached = state.edges.items()
+            else:
+                reached = state.extend(rows, self.nodes_match_func())
+            state.save(self.flags.state)
+        finally:
+            if state is not None:
+                state.close()
+        yield from state.rows(reached if self.flags.delta else state.edges.items())
+
+
+class PathsCmd(GraphInputMixin, InvertableMixin, nodeutil.PatternsMixin, csvutil.Filter, app.Command):
+    '''Edges on paths from --nodes to --to-nodes.
+
+    By default only edges on shortest paths are output: paths of the
+    shortest length from any of --nodes to any of --to-nodes, found with
+    bidirectional BFS.  With --all-paths edges on any path are output.
+    '''
+    name = 'paths'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--to-nodes',
+            action='append',
+            required=True,
+            help='Target nodes file, uses --nodes-dialect and --node-column',
+        )
+        parser.add_argument(
+            '--all-paths',
+            action='store_true',
+            help='Output edges on any path, not only on shortest ones',
+        )
+
+    @common.lazy
+    def get_to_nodes(self):
+        result = set()
+        for filename in self.flags.to_nodes:
+            with self.csv_file_reader(filename=filename, dialect=self.flags.nodes_dialect) as nodes_reader:
+                for r in nodes_reader:
+                    result.add(r[self.flags.node_column])
+        return result
+    set_to_nodes = get_to_nodes.set
+
+    @common.lazy
+    def to_nodes_match_func(self):
+        return nodeutil.Matcher(self.get_to_nodes())
+
+    def process(self, rows):
+        graph = self.load_graph(rows)
+        return self.graph_tool().paths_graph(
+            graph,
+            self.load_transposed(graph),
+            self.nodes_match_func(),
+            self.to_nodes_match_func(),
+            all_paths=self.flags.all_paths,
+        )
 
 
-class SourcesCmd(InvertableInputMixin, GraphNodeOpMixin, csvutil.Filter, app.Command):
+class SourcesCmd(GraphInputMixin, InvertableInputMixin, GraphNodeOpMixin, csvutil.Filter, app.Command):
     '''Extract source nodes of the graph.'''
     name = 'srcs'
 
     def process(self, rows):
         gt = self.graph_tool()
-        return gt.sources(rows)
+        return gt.sources_graph(self.load_graph(rows, payload=False))
+
+
+class SinksCmd(GraphInputMixin, InvertableInputMixin, GraphNodeOpMixin, csvutil.Filter, app.Command):
+    '''Extract sink nodes of the graph.'''
+    name = 'sinks'
+
+    def process(self, rows):
+        gt = self.graph_tool()
+        return gt.sinks_graph(self.load_graph(rows, payload=False))
+
+
+class SccCmd(GraphInputMixin, InvertableInputMixin, GraphNodeOpMixin, csvutil.Filter, app.Command):
+    '''Strongly connected components of the graph.
+
+    Outputs every node with its component id.  Component ids follow
+    topological order of components: edges between components go from lower
+    ids to higher ones.
+    '''
+    name = 'scc'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--component-column',
+            default='component',
+            help='Component id output column name.',
+        )
+        parser.add_argument(
+            '--cycles',
+            action='store_true',
+            help='Only output components with cycles: several nodes or a self-loop',
+        )
+
+    def get_out_fieldnames(self):
+        return super().get_out_fieldnames() + [self.flags.component_column]
+
+    def process(self, rows):
+        gt = self.graph_tool()
+        return gt.scc_graph(self.load_graph(rows, payload=False), self.flags.component_column, cycles=self.flags.cycles)
+
+
+class ToposortCmd(GraphInputMixin, InvertableInputMixin, GraphNodeOpMixin, csvutil.Filter, app.Command):
+    '''Topological sort of the graph.
+
+    Level of a node is the length of the longest path to it from a source,
+    nodes of the same level are sorted by name.  Nodes on cycles and nodes
+    reachable from them can't be sorted and are skipped with a warning.
+    '''
+    name = 'toposort'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--order-column',
+            default='order',
+            help='Node position output column name.',
+        )
+        parser.add_argument(
+            '--level-column',
+            default='level',
+            help='Node level output column name.',
+        )
+
+    def get_out_fieldnames(self):
+        return super().get_out_fieldnames() + [self.flags.order_column, self.flags.level_column]
+
+    def process(self, rows):
+        gt = self.graph_tool()
+        return gt.toposort_graph(self.load_graph(rows, payload=False), self.flags.order_column, self.flags.level_column)
+
+
+class GraphStatsCmd(GraphOpMixin, csvutil.Filter, app.Command):
+    '''Graph statistics in one pass over edges.
+
+    Outputs node and edge counts, degree histograms with power of two
+    buckets, top nodes by degree and an estimate of memory used by "bfs"
+    without --index.  Degrees are counted for a bounded sample of nodes and
+    duplicates are found in a bounded sample of edges, counts are estimates
+    if a sample rate is below 1.  Top nodes are tracked apart from the
+    sample, so they are not lost to sampling.
+    '''
+    name = 'gstats'
+    TUPLE_ROWS = True
+    OUT_FIELDS = ['stat', 'key', 'value']
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of top nodes by degree to output',
+        )
+        parser.add_argument(
+            '--sample-size',
+            default=DEFAULT_SAMPLE_SIZE,
+            help='Maximum number of nodes and of edges to keep in memory, like 1M',
+        )
+
+    def process(self, rows):
+        fieldnames = self.get_in_fieldnames()
+        payload_columns = [f for f in fieldnames if f not in (self.flags.src, self.flags.dst) and not f.startswith('@')]
+        return self.graph_tool().stats(
+            rows,
+            payload_columns=len(payload_columns),
+            sample_size=common.parse_size(getattr(self.flags, 'sample_size', DEFAULT_SAMPLE_SIZE)),
+            top=getattr(self.flags, 'top', 10),
+        )
+
+
+class IndexCmd(GraphOpMixin, csvutil.In, app.Command):
+    '''Build graph index for --index option of graph commands.'''
+    name = 'index'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--index',
+            required=True,
+            help='Index file to write.',
+        )
+
+    def main(self):
+        input_list = self.flags.input or []
+        if len(input_list) != 1 or input_list[0] == '-':
+            raise ValueError('Exactly one input file is required to build index')
+        filename = input_list[0]
+        if columnar.is_columnar_file(filename):
+            raise ValueError('{}: index can only be built for CSV files'.format(filename))
+        with self.instrumented():
+            dialect = self.file_dialect(filename, self.flags.input_dialect)
+            graph = graphindex.build(filename, src=self.flags.src, dst=self.flags.dst, dialect=dialect)
+            graphindex.write(graph, filename, self.flags.index, dialect=dialect)
+        _logger.info('Index %s: %d nodes, %d edges', self.flags.index, len(graph), len(graph.targets))
 
 
 class GraphTool(object):
@@ -113,17 +506,44 @@ class GraphTool(object):
         self.dst = dst
         self.node = node
 
+    def graph(self, rows, payload=True):
+        return graphstore.Graph.from_rows(rows, src=self.src, dst=self.dst, payload=payload)
+
     def bfs(self, rows, is_src):
         return bfs(rows, is_src, self.src, self.dst)
 
+    def bfs_graph(self, graph, is_src, max_depth=None, depth_column=None):
+        return bfs_graph(graph, is_src, max_depth=max_depth, depth_column=depth_column)
+
+    def paths_graph(self, graph, transposed, is_src, is_dst, all_paths=False):
+        return paths_graph(graph, transposed, is_src, is_dst, all_paths=all_paths)
+
     def invert(self, row):
         row = row.copy()
         row[self.src], row[self.dst] = row[self.dst], row[self.src]
         return row
 
+    def bfs_lazy(self, lookup, seeds, max_depth=None, depth_column=None):
+        return bfs_lazy(lookup, seeds, self.src, self.dst, max_depth=max_depth, depth_column=depth_column)
+
     def sources(self, rows):
         return sources(rows, self.node, self.src, self.dst)
 
+    def sources_graph(self, graph):
+        return sources_graph(graph, self.node)
+
+    def sinks_graph(self, graph):
+        return sinks_graph(graph, self.node)
+
+    def scc_graph(self, graph, component_column, cycles=False):
+        return scc_graph(graph, self.node, component_column, cycles=cycles)
+
+    def toposort_graph(self, graph, order_column, level_column):
+        return toposort_graph(graph, self.node, order_column, level_column)
+
+    def stats(self, rows, payload_columns=0, sample_size=None, top=10):
+        return graph_stats(rows, self.src, self.dst, payload_columns=payload_columns, sample_size=sample_size, top=top)
+
 
 def bfs(rows, is_src, src, dst):
     '''BFS.
@@ -141,29 +561,209 @@ def bfs(rows, is_src, src, dst):
 
     Yields rows.
     '''
-    deps = collections.defaultdict(dict)
-    for r in rows:
-        deps[r[src]][r[dst]] = r
+    return bfs_graph(graphstore.Graph.from_rows(rows, src=src, dst=dst), is_src)
 
-    visited = {n for n in deps if is_src(n)}
-    queue = collections.deque(visited)
-    while queue:
-        fsrc = queue.popleft()
-        for fdst, row in deps[fsrc].items():
-            yield row
-            if fdst in visited:
-                continue
-            visited.add(fdst)
-            queue.append(fdst)
+
+def bfs_graph(graph, is_src, max_depth=None, depth_column=None):
+    seeds = [n for n in graph.find_nodes(is_src) if graph.out_degree(n)]
+    for depth, edge_ids in graphstore.bfs_levels(graph, seeds, max_depth=max_depth):
+        for edge_id in edge_ids:
+            r = graph.edge_row(edge_id)
+            if depth_column:
+                r[depth_column] = str(depth)
+            yield r
+
+
+def paths_graph(graph, transposed, is_src, is_dst, all_paths=False):
+    sources = graph.find_nodes(is_src)
+    targets = graph.find_nodes(is_dst)
+    if all_paths:
+        edge_ids = graphstore.path_edges(graph, transposed, sources, targets)
+    else:
+        edge_ids = graphstore.shortest_path_edges(graph, transposed, sources, targets)
+    for edge_id in edge_ids:
+        yield graph.edge_row(edge_id)
+
+
+def bfs_lazy(lookup, seeds, src, dst, max_depth=None, depth_column=None):
+    '''Level-synchronous BFS with edges looked up on demand.
+
+    `lookup(node)` returns rows of edges from `node`.  Like in `bfs`, only
+    the last edge between two nodes is kept.  Seeds are visited in name
+    order.
+    '''
+    visited = set(seeds)
+    frontier = sorted(visited)
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth):
+        depth += 1
+        next_frontier = []
+        for n in frontier:
+            edges = {}
+            for r in lookup(n):
+                edges[r[dst]] = r
+            for d, r in edges.items():
+                if depth_column:
+                    r = r.copy()
+                    r[depth_column] = str(depth)
+                yield r
+                if d not in visited:
+                    visited.add(d)
+                    next_frontier.append(d)
+        frontier = next_frontier
 
 
 def sources(rows, node, src, dst):
-    srcs, dsts = set(), set()
-    for row in rows:
-        srcs.add(row[src])
-        if dst != src:
-            dsts.add(row[dst])
-    for n in sorted(srcs - dsts):
+    graph = graphstore.Graph.from_rows(rows, src=src, dst=dst, payload=False)
+    if dst == src:
+        return sorted_nodes(range(len(graph)), graph, node)
+    return sources_graph(graph, node)
+
+
+def sources_graph(graph, node):
+    return sorted_nodes(graphstore.sources(graph), graph, node)
+
+
+def sinks_graph(graph, node):
+    return sorted_nodes(graphstore.sinks(graph), graph, node)
+
+
+def scc_graph(graph, node, component_column, cycles=False):
+    '''Yields rows with node names and component ids ordered by component.'''
+    count, components = graphstore.strongly_connected_components(graph)
+    members = [[] for _ in range(count)]
+    for i, c in enumerate(components):
+        members[c].append(i)
+    for c, node_ids in enumerate(members):
+        if cycles and len(node_ids) == 1 and not has_self_loop(graph, node_ids[0]):
+            continue
+        for name in sorted(graph.nodes.name(i) for i in node_ids):
+            r = csvutil.Row()
+            r[node] = name
+            r[component_column] = str(c)
+            yield r
+
+
+def has_self_loop(graph, node_id):
+    return any(d == node_id for d, _ in graph.successors(node_id))
+
+
+def toposort_graph(graph, node, order_column, level_column):
+    levels = graphstore.topological_levels(graph)
+    unsorted = len(graph) - sum(map(len, levels))
+    if unsorted:
+        _logger.warning('%d nodes are on cycles or reachable from cycles and are not sorted, see "scc --cycles"', unsorted)
+    order = 0
+    for level, node_ids in enumerate(levels):
+        for name in sorted(graph.nodes.name(i) for i in node_ids):
+            r = csvutil.Row()
+            r[node] = name
+            r[order_column] = str(order)
+            r[level_column] = str(level)
+            order += 1
+            yield r
+
+
+def sorted_nodes(node_ids, graph, node):
+    for n in sorted(graph.nodes.name(i) for i in node_ids):
         r = csvutil.Row()
         r[node] = n
         yield r
+
+
+def degree_bucket(degree):
+    return 1 << (degree.bit_length() - 1) if degree else 0
+
+
+def graph_stats(rows, src, dst, payload_columns=0, sample_size=None, top=10, hub_capacity=None):
+    '''Yields rows of statistics of the graph of edge `rows`.
+
+    Top nodes by degree are exact while the node sample holds all nodes.
+    When it is reduced, out and in degrees of top nodes are tracked with
+    `sketch.SpaceSaving`, started with exact degrees of the top nodes.
+    '''
+    if sample_size is None:
+        sample_size = common.parse_size(DEFAULT_SAMPLE_SIZE)
+    if hub_capacity is None:
+        hub_capacity = max(HUB_CAPACITY, 10 * top)
+    # Out and in degree trackers of top nodes.
+    hubs = []
+
+    def start_hubs(sample):
+        if hubs:
+            return
+        for i in (0, 1):
+            degrees = ((k, v[i]) for k, v in sample.items.items())
+            hubs.append(sketch.SpaceSaving(hub_capacity, heapq.nlargest(hub_capacity, degrees, key=operator.itemgetter(1))))
+
+    # Out and in degrees of sampled nodes.
+    nodes = sketch.DistinctSample(sample_size, lambda: [0, 0], on_shrink=start_hubs)
+    # Occurrences of sampled edges by hash of (src, dst), collisions of
+    # 64-bit hashes are negligible at bounded sample size.
+    edges = sketch.DistinctSample(sample_size, lambda: [0], hash=lambda h: h)
+    node_items, edge_items = nodes.items, edges.items
+    key_hash = sketch.key_hash
+    edge_count = self_loops = 0
+    for r in rows:
+        s, d = r[src], r[dst]
+        edge_count += 1
+        if s == d:
+            self_loops += 1
+        # Both nodes are looked up before counting, so that hubs start with
+        # degrees before this edge.
+        vs = node_items.get(s) or nodes.get(s)
+        vd = node_items.get(d) or nodes.get(d)
+        if vs is not None:
+            vs[0] += 1
+        if vd is not None:
+            vd[1] += 1
+        if hubs:
+            hubs[0].add(s)
+            hubs[1].add(d)
+        h = key_hash((s, d))
+        v = edge_items.get(h) or edges.get(h)
+        if v is not None:
+            v[0] += 1
+
+    estimate = nodes.estimate
+    node_count = estimate(len(node_items))
+    duplicates = edges.estimate(sum(v[0] - 1 for v in edge_items.values()))
+    out_hist, in_hist = collections.Counter(), collections.Counter()
+    sources = sinks = 0
+    for out_degree, in_degree in node_items.values():
+        out_hist[degree_bucket(out_degree)] += 1
+        in_hist[degree_bucket(in_degree)] += 1
+        if not in_degree:
+            sources += 1
+        elif not out_degree:
+            sinks += 1
+    name_bytes = estimate(sum(map(len, node_items)))
+
+    def stat(stat, key, value):
+        return csvutil.TupleRow(STATS_HEADER, (stat, str(key), str(value)))
+
+    yield stat('graph', 'nodes', node_count)
+    yield stat('graph', 'edges', edge_count)
+    yield stat('graph', 'distinct_edges', edge_count - duplicates)
+    yield stat('graph', 'duplicate_edges', duplicates)
+    yield stat('graph', 'self_loops', self_loops)
+    yield stat('graph', 'sources', estimate(sources))
+    yield stat('graph', 'sinks', estimate(sinks))
+    for name, hist in (('out_degree', out_hist), ('in_degree', in_hist)):
+        for bucket in sorted(hist):
+            yield stat(name, bucket, estimate(hist[bucket]))
+    for name, i in (('top_out_degree', 0), ('top_in_degree', 1)):
+        if hubs:
+            top_nodes = hubs[i].top(top)
+        else:
+            top_nodes = heapq.nlargest(top, ((k, v[i]) for k, v in node_items.items()), key=operator.itemgetter(1))
+        for node, degree in top_nodes:
+            if degree:
+                yield stat(name, node, degree)
+    bfs_bytes = node_count * NODE_BYTES + name_bytes + edge_count * (EDGE_BYTES + VALUE_ID_BYTES * payload_columns)
+    yield stat('memory', 'bfs', bfs_bytes)
+    yield stat('sample', 'nodes', nodes.rate)
+    yield stat('sample', 'edges', edges.rate)
+
+
+STATS_HEADER = csvutil.Header(GraphStatsCmd.OUT_FIELDS)
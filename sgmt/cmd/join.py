@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Hash join of inputs with another file."""
+
+import logging
+import os
+
+from dsapy import app
+
+from sgmt import common
+from sgmt import csvutil
+from sgmt import spill
+
+from sgmt.cmd import set_ops
+
+
+_logger = logging.getLogger(__name__)
+
+
+MODES = ('inner', 'left', 'anti')
+BUILD_SIDES = ('auto', 'left', 'right')
+
+
+class JoinCmd(set_ops.KeyMixin, spill.SpillMixin, csvutil.Filter, app.Command):
+    '''Join inputs with --right file by key.
+
+    Output rows have all input columns followed by non-key columns of --right
+    (with --right-prefix), one row per matching pair.  Modes:
+
+        - inner: only rows with a match;
+        - left: also input rows without a match, with empty right columns;
+        - anti: only input rows without a match, without right columns.
+
+    Key columns default to the columns both sides have.  A hash table is
+    built from the smaller side.  With --external both sides are partitioned
+    to disk by key and joined partition by partition.
+    '''
+    name = 'join'
+    TUPLE_ROWS = True
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--right',
+            required=True,
+            help='File to join inputs with',
+        )
+        parser.add_argument(
+            '--right-dialect',
+            metavar='DIALECT',
+            choices=csvutil.list_input_dialects(),
+            default='default',
+            help='CSV dialect for --right file',
+        )
+        parser.add_argument(
+            '--right-key',
+            help='Comma-separated key column names of --right, same as --key by default',
+        )
+        parser.add_argument(
+            '--right-prefix',
+            default='',
+            help='Prefix for column names taken from --right',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            default='inner',
+            help='Join mode',
+        )
+        parser.add_argument(
+            '--build',
+            choices=BUILD_SIDES,
+            default='auto',
+            help='Side to build the hash table from, the smaller file by default',
+        )
+
+    @common.lazy
+    @common.stepback
+    def iter_right(self):
+        with self.csv_file_reader(filename=self.flags.right, dialect=self.flags.right_dialect, tuples=True) as reader:
+            yield reader
+
+    def right_reader(self):
+        return next(iter(self.iter_right()))
+
+    def right_rows(self):
+        return self.stats().wrap_rows('read', self.right_reader())
+
+    @common.lazy
+    def key_columns(self):
+        if self.flags.key is not None:
+            return tuple(self.flags.key.split(','))
+        right = set(self.right_reader().fieldnames)
+        key = tuple(n for n in self.get_in_fieldnames() if n in right)
+        if not key:
+            raise ValueError('Inputs and {} have no common columns, use --key'.format(self.flags.right))
+        return key
+
+    @common.lazy
+    def right_key_columns(self):
+        if self.flags.right_key is None:
+            return self.key_columns()
+        key = tuple(self.flags.right_key.split(','))
+        if len(key) != len(self.key_columns()):
+            raise ValueError('--key and --right-key must have the same number of columns')
+        return key
+
+    @common.lazy
+    def right_key_getter(self):
+        return csvutil.ColumnGetter(self.right_key_columns())
+
+    def right_key(self, row):
+        return self.right_key_getter()(row)
+
+    @common.lazy
+    def right_columns(self):
+        '''Columns taken from --right rows.'''
+        key = set(self.right_key_columns())
+        columns = [n for n in self.right_reader().fieldnames if n not in key]
+        if self.flags.mode == 'anti':
+            return columns
+        left = set(self.get_in_fieldnames())
+        clashes = [n for n in columns if self.flags.right_prefix + n in left]
+        if clashes:
+            raise ValueError('Columns of {} clash with input columns: {}, use --right-prefix'.format(
+                self.flags.right, ','.join(clashes)))
+        return columns
+
+    @common.lazy
+    def right_values(self):
+        return csvutil.ColumnGetter(self.right_columns())
+
+    @common.lazy
+    def left_values(self):
+        return csvutil.ColumnGetter(self.get_in_fieldnames())
+
+    def get_out_fieldnames(self):
+        fieldnames = list(self.get_in_fieldnames())
+        if self.flags.mode != 'anti':
+            fieldnames += [self.flags.right_prefix + n for n in self.right_columns()]
+        return fieldnames
+
+    @common.lazy
+    def out_header(self):
+        return csvutil.Header(self.get_out_fieldnames())
+
+    def merge(self, row, right_values):
+        '''Output row for an input row and values of `right_columns`.'''
+        if self.flags.mode == 'anti':
+            return row
+        if right_values is None:
+            right_values = ('',) * len(self.right_columns())
+        return csvutil.TupleRow(self.out_header(), self.left_values()(row) + right_values)
+
+    def build_left(self):
+        if self.flags.build != 'auto':
+            return self.flags.build == 'left'
+        input_list = self.flags.input or ['-']
+        if self.upstream is not None or '-' in input_list or self.flags.right == '-':
+            return False
+        left_size = sum(os.path.getsize(filename) for filename in input_list)
+        return left_size < os.path.getsize(self.flags.right)
+
+    def process(self, rows):
+        # Resolve columns before reading any rows.
+        self.out_header()
+        self.left_values()
+        self.right_values()
+        self.right_key_columns()
+        if self.flags.external:
+            return self.process_external(rows)
+        if self.build_left():
+            return self.join_build_left(rows, self.right_rows())
+        return self.join_build_right(rows, self.right_rows())
+
+    def build_right_table(self, right_rows):
+        table = {}
+        right_key, right_values = self.right_key, self.right_values()
+        for r in right_rows:
+            table.setdefault(right_key(r), []).append(right_values(r))
+        return table
+
+    def join_build_right(self, rows, right_rows):
+        table = self.build_right_table(right_rows)
+        inner = self.flags.mode == 'inner'
+        anti = self.flags.mode == 'anti'
+        row_key, merge = self.row_key, self.merge
+        for r in rows:
+            matches = table.get(row_key(r))
+            if matches is None:
+                if not inner:
+                    yield merge(r, None)
+            elif not anti:
+                for values in matches:
+                    yield merge(r, values)
+
+    def join_build_left(self, rows, right_rows):
+        left_rows = []
+        table = {}
+        row_key = self.row_key
+        for r in rows:
+            left_rows.append(r)
+            table.setdefault(row_key(r), []).append(r)
+
+        matched = set()
+        right_key, right_values, merge = self.right_key, self.right_values(), self.merge
+        anti = self.flags.mode == 'anti'
+        for rr in right_rows:
+            k = right_key(rr)
+            matches = table.get(k)
+            if matches is None:
+                continue
+            matched.add(k)
+            if not anti:
+                values = right_values(rr)
+                for r in matches:
+                    yield merge(r, values)
+
+        if self.flags.mode != 'inner':
+            for r in left_rows:
+                if row_key(r) not in matched:
+                    yield merge(r, None)
+
+    def process_external(self, rows):
+        '''Grace hash join: both sides are partitioned by key.'''
+        right_header = self.right_reader().header
+        def is_right(r):
+            return type(r) is csvutil.TupleRow and r.header is right_header
+        def key(r):
+            return self.right_key(r) if is_right(r) else self.row_key(r)
+
+        with self.partitioner(key) as partitioner:
+            for r in rows:
+                partitioner.add(r)
+            for r in self.right_rows():
+                partitioner.add(r)
+            for part in partitioner.partitions():
+                part = list(part)
+                yield from self.join_build_right(
+                    (r for r in part if not is_right(r)),
+                    (r for r in part if is_right(r)),
+                )
@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Run a chain of commands in one process."""
+
+import argparse
+import itertools
+import logging
+
+from dsapy import app
+
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+SEPARATOR = '::'
+# Options of `csvutil.Out` used only by the last stage.
+OUTPUT_OPTIONS = ('output', 'output_dialect', 'compress_level')
+
+
+class PipeCmd(app.Command):
+    '''Run commands separated by "::" as a pipeline without CSV between them.
+
+    Like `sgmt A | sgmt B | sgmt C`, but `process` generators of the commands
+    are chained directly.  Only the first command reads inputs and only the
+    last one writes output.  Example:
+
+        sgmt pipe filter --column src --nodes seeds.csv :: extract --column a=src :: uni
+    '''
+    name = 'pipe'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            'stages',
+            nargs=argparse.REMAINDER,
+            help='Commands with arguments separated by "{}"'.format(SEPARATOR),
+        )
+
+    def main(self):
+        stages = self.make_stages()
+        last = stages[-1]
+        # All stages report to the stats of the last one.
+        for stage in stages[:-1]:
+            type(stage).stats.set(stage, last.stats())
+        with last.instrumented(), last.get_output() as csv_out:
+            csv_out.writerows(run(stages))
+
+    def make_stages(self):
+        commands = find_commands()
+        stages = []
+        last_parser = None
+        for args in split_args(self.flags.stages):
+            if not args:
+                raise ValueError('Empty pipe stage')
+            cmd_type = commands.get(args[0])
+            if cmd_type is None:
+                raise ValueError('Unknown pipe stage command: {}'.format(args[0]))
+            parser = argparse.ArgumentParser(prog='sgmt pipe ' + args[0])
+            cmd_type.add_arguments(parser)
+            stage = cmd_type()
+            stage.flags = parser.parse_args(args[1:])
+            if stages:
+                check_output_options(stages[-1], last_parser)
+                if stage.flags.input:
+                    raise ValueError('{}: only the first pipe stage reads --input'.format(args[0]))
+                if getattr(stage.flags, 'sorted', False):
+                    raise ValueError('{}: --sorted is only supported in the first pipe stage'.format(args[0]))
+                stage.upstream = stages[-1]
+            stages.append(stage)
+            last_parser = parser
+        if not stages:
+            raise ValueError('No pipe stages')
+        return stages
+
+
+def check_output_options(stage, parser):
+    for option in OUTPUT_OPTIONS:
+        if getattr(stage.flags, option, None) != parser.get_default(option):
+            raise ValueError('{}: --{} is only supported in the last pipe stage'.format(stage.name, option.replace('_', '-')))
+
+
+def run(stages):
+    '''Chains `process` of stages.  Yields rows of the last stage.'''
+    # Resolve field names before any stage consumes its input.
+    fieldnames = [list(stage.get_out_fieldnames()) for stage in stages]
+    rows = stages[0].process_rows()
+    for prev, stage, prev_fieldnames in zip(stages, stages[1:], fieldnames):
+        rows = stage.process(restream(rows, prev, stage, prev_fieldnames))
+    return rows
+
+
+def restream(rows, prev, stage, fieldnames):
+    '''Makes rows of `prev` look like read by `stage` from a single CSV input.
+
+    Rows are postprocessed by `prev`, restricted to its output `fieldnames`,
+    renumbered as the only input and preprocessed by `stage`.
+    '''
+    out_header = csvutil.Header(fieldnames, fn=0)
+    out_header.rn_start = 0
+    postprocess, preprocess = prev.postprocess_output, stage.preprocess_input
+    headers = {}
+    for rn, r in enumerate(rows):
+        r = postprocess(r)
+        if type(r) is csvutil.TupleRow:
+            get = headers.get(r.header)
+            if get is None:
+                get = headers[r.header] = r.header.getter(fieldnames)
+            r = csvutil.TupleRow(out_header, get(r.values), rn)
+            if not stage.TUPLE_ROWS:
+                r = r.as_row()
+        else:
+            r = csvutil.Row((k, r[k]) for k in fieldnames)
+            r['@fn'] = 0
+            r['@frn'] = rn
+            r['@rn'] = rn
+        yield preprocess(r)
+
+
+def find_commands():
+    '''Filter commands by name.'''
+    result = {}
+    def walk(cls):
+        for sub in cls.__subclasses__():
+            if isinstance(getattr(sub, 'name', None), str) and issubclass(sub, app.Command):
+                result[sub.name] = sub
+            walk(sub)
+    walk(csvutil.Filter)
+    return result
+
+
+def split_args(args):
+    return [
+        list(group)
+        for is_separator, group in itertools.groupby(args, key=lambda a: a == SEPARATOR)
+        if not is_separator
+    ]
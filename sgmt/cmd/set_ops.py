@@ -3,6 +3,8 @@
 
 """Command description."""
 
+import array
+import heapq
 import itertools
 import logging
 
@@ -10,12 +12,22 @@ from dsapy import app
 
 from sgmt import common
 from sgmt import csvutil
+from sgmt import keytable
+from sgmt import setexpr
+from sgmt import sketch
+from sgmt import spill
 
 
 _logger = logging.getLogger(__name__)
 
 
-class SetOpMixin(object):
+class UnsortedInputError(Exception):
+    '''Input is not sorted by key in --sorted mode.'''
+
+
+class KeyMixin(object):
+    '''Rows are identified by --key columns, all columns by default.'''
+
     @classmethod
     def add_arguments(cls, parser):
         super().add_arguments(parser)
@@ -32,36 +44,300 @@ class SetOpMixin(object):
             return self.get_in_fieldnames()
         return tuple(key.split(','))
 
+    @common.lazy
+    def key_getter(self):
+        return csvutil.ColumnGetter(self.key_columns())
+
     def row_key(self, row):
-        return tuple(
-            row[k]
-            for k in self.key_columns()
+        return self.key_getter()(row)
+
+
+class SortedMixin(KeyMixin):
+    '''Streaming merge of inputs sorted by key.'''
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--sorted',
+            action='store_true',
+            help='Inputs are sorted by key: merge them in streaming mode',
+        )
+
+    def sorted_groups(self):
+        '''K-way merge of sorted inputs.
+
+        Yields (key, group) for each key, where group iterates (key, fn, row)
+        of rows with the key in input order.
+        '''
+        input_list = self.flags.input or ['-']
+        with self.open_all_inputs() as readers:
+            streams = [
+                self.iter_sorted(filename, reader)
+                for filename, reader in zip(input_list, readers)
+            ]
+            merged = heapq.merge(*streams, key=lambda x: x[0])
+            yield from itertools.groupby(merged, key=lambda x: x[0])
+
+    def iter_sorted(self, filename, reader):
+        prev = None
+        for frn, r in enumerate(self.stats().wrap_rows('read', reader)):
+            r = self.preprocess_input(r)
+            k = self.row_key(r)
+            if prev is not None and k < prev:
+                raise UnsortedInputError('{}: row {}: key {!r} is less than previous key {!r}'.format(
+                    filename, frn + 1, k, prev))
+            prev = k
+            yield k, reader.fn, r
+
+
+class SetOpMixin(SortedMixin, spill.SpillMixin):
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='Keep key digests and serialized rows in memory instead of row objects',
+        )
+
+    def input_count(self):
+        return len(self.flags.input or ['-'])
+
+    def is_compact(self):
+        return getattr(self.flags, 'compact', False)
+
+    def process(self, rows):
+        if self.flags.sorted:
+            return self.process_sorted()
+        if self.flags.external:
+            return self.process_external(rows)
+        return self.process_in_memory(rows)
+
+    def process_sorted(self):
+        '''Rows with the same key are grouped together as a list of (fn, row)
+        pairs in input order, `select_sorted` chooses the row to output.
+        '''
+        input_count = self.input_count()
+        for _, group in self.sorted_groups():
+            r = self.select_sorted([(fn, r) for _, fn, r in group], input_count)
+            if r is not None:
+                yield r
+
+    def select_sorted(self, group, input_count):
+        return None
+
+    def process_external(self, rows):
+        with self.partitioner(self.row_key) as partitioner:
+            for r in rows:
+                partitioner.add(r)
+            for part in partitioner.partitions():
+                yield from self.process_partition(common.StepBackIterable(part))
+
+    def process_partition(self, rows):
+        return self.process_in_memory(rows)
+
+    def process_in_memory(self, rows):
+        return []
+
+
+class ApproxMixin(sketch.SketchMixin):
+    '''Estimate of the number of keys in the result of a set operation.
+
+    Commands define `approx_count(rows)` returning the estimate.
+    '''
+    APPROX_FIELDS = ['estimate']
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--approx',
+            action='store_true',
+            help='Output only estimated number of keys in the result, computed in fixed memory',
         )
 
+    def get_out_fieldnames(self):
+        if getattr(self.flags, 'approx', False):
+            return self.APPROX_FIELDS
+        return super().get_out_fieldnames()
+
+    def process(self, rows):
+        if getattr(self.flags, 'approx', False):
+            return self.process_approx(rows)
+        return super().process(rows)
+
+    def process_approx(self, rows):
+        yield csvutil.Row(estimate=round(self.approx_count(rows)))
+
+    def input_sketches(self, rows):
+        '''HyperLogLog sketch of keys of each input.'''
+        sketches = [self.hyperloglog() for _ in range(self.input_count())]
+        for fn, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            add = sketches[fn].add
+            for r in grs:
+                add(self.row_key(r))
+        return sketches
+
 
-class IntersectionCmd(SetOpMixin, csvutil.Filter, app.Command):
+class IntersectionCmd(ApproxMixin, SetOpMixin, csvutil.Filter, app.Command):
     '''Intersect sets.'''
     name = 'int'
+    TUPLE_ROWS = True
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--prefilter',
+            action='store_true',
+            help='Read other inputs first to keep only rows of the first input which may be in all of them.  '
+                 'Inputs except the first one are read twice, so they must be files',
+        )
 
     def process(self, rows):
+        if getattr(self.flags, 'prefilter', False) and not self.flags.approx:
+            if self.flags.sorted:
+                raise ValueError('--prefilter can not be used with --sorted')
+            rows = common.StepBackIterable(self.prefiltered(rows))
+        return super().process(rows)
+
+    def prefiltered(self, rows):
+        '''Drops rows of the first input which are not in the Bloom filter of the others.'''
+        candidates = self.candidate_filter()
+        if candidates is None:
+            yield from rows
+            return
+        row_key = self.row_key
+        for r in itertools.takewhile(lambda r: r['@fn'] == 0, rows):
+            if row_key(r) in candidates:
+                yield r
+        yield from rows
+
+    def candidate_filter(self):
+        '''Bloom filter of keys found in all inputs except the first one.'''
+        input_list = self.flags.input or ['-']
+        if len(input_list) < 2:
+            return None
+        if '-' in input_list[1:]:
+            raise ValueError('--prefilter requires all inputs except the first one to be files')
+        candidates = None
+        with self.stats().phase('prefilter'):
+            for fn, filename in enumerate(input_list[1:], 1):
+                with self.csv_file_reader(filename=filename, dialect=self.flags.input_dialect, fn=fn, tuples=self.TUPLE_ROWS) as reader:
+                    candidates = self.filter_keys(map(self.preprocess_input, reader), candidates)
+        return candidates
+
+    def filter_keys(self, rows, candidates):
+        '''Bloom filter of keys of `rows` which are in `candidates`.'''
+        result = self.bloom_filter()
+        for r in rows:
+            k = self.row_key(r)
+            if candidates is None or k in candidates:
+                result.add(k)
+        return result
+
+    def approx_count(self, rows):
+        '''Keys of the last input which pass Bloom filters of all previous inputs.'''
+        input_count = self.input_count()
+        candidates = None
+        result = self.hyperloglog()
+        seen = 0
+        for fn, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            seen += 1
+            if fn < input_count - 1:
+                candidates = self.filter_keys(grs, candidates)
+                continue
+            for r in grs:
+                k = self.row_key(r)
+                if candidates is None or k in candidates:
+                    result.add(k)
+        if seen < input_count:
+            return 0
+        return result.count()
+
+    def process_in_memory(self, rows):
+        return self.intersect(rows)
+
+    def process_partition(self, rows):
+        # A partition may have no rows from some of the inputs.
+        return self.intersect(rows, self.input_count())
+
+    def select_sorted(self, group, input_count):
+        if len({fn for fn, _ in group}) == input_count:
+            return last_of_first(group)
+
+    def intersect(self, rows, input_count=None):
+        if self.is_compact():
+            return self.intersect_compact(rows, input_count)
         result = {
             self.row_key(r): r
             for r in itertools.takewhile(lambda r: r['@fn'] == 0, rows)
         }
+        seen = 1
         for _, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            seen += 1
             result, old = {}, result
             for r in grs:
                 k = self.row_key(r)
                 if k in old:
                     result[k] = old[k]
+        if input_count is not None and seen < input_count:
+            return []
         return result.values()
 
+    def intersect_compact(self, rows, input_count=None):
+        table = keytable.RowTable()
+        for r in itertools.takewhile(lambda r: r['@fn'] == 0, rows):
+            table.add(self.row_key(r), r)
+        # Ids of keys found in all inputs so far, in order of the last input.
+        order = range(len(table))
+        alive = None
+        seen = 1
+        for _, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            seen += 1
+            found, order = bytearray(len(table)), array.array('q')
+            for r in grs:
+                key_id = table.get(self.row_key(r))
+                if key_id is not None and not found[key_id] and (alive is None or alive[key_id]):
+                    found[key_id] = 1
+                    order.append(key_id)
+            alive = found
+        if input_count is not None and seen < input_count:
+            return []
+        return table.rows(order)
+
 
-class UnionCmd(SetOpMixin, csvutil.Filter, app.Command):
+class UnionCmd(ApproxMixin, SetOpMixin, csvutil.Filter, app.Command):
     '''Union sets.'''
     name = 'uni'
+    TUPLE_ROWS = True
 
-    def process(self, rows):
+    def select_sorted(self, group, input_count):
+        return group[0][1]
+
+    def approx_count(self, rows):
+        result = self.hyperloglog()
+        for r in rows:
+            result.add(self.row_key(r))
+        return result.count()
+
+    def process_in_memory(self, rows):
+        if self.is_compact():
+            return self.union_compact(rows)
+        return self.union(rows)
+
+    def union_compact(self, rows):
+        add = keytable.KeyTable().add
+        for r in rows:
+            if add(self.row_key(r))[1]:
+                yield r
+
+    def union(self, rows):
         known = set()
         for r in rows:
             k = self.row_key(r)
@@ -71,11 +347,26 @@ class UnionCmd(SetOpMixin, csvutil.Filter, app.Command):
             yield r
 
 
-class SubtractCmd(SetOpMixin, csvutil.Filter, app.Command):
+class SubtractCmd(ApproxMixin, SetOpMixin, csvutil.Filter, app.Command):
     '''Subtract subsequent sets from the first one.'''
     name = 'sub'
+    TUPLE_ROWS = True
 
-    def process(self, rows):
+    def select_sorted(self, group, input_count):
+        if group[-1][0] == 0:
+            return last_of_first(group)
+
+    def approx_count(self, rows):
+        # |A - B| = |A + B| - |B|, where B is the union of other inputs.
+        first, *others = self.input_sketches(rows)
+        if not others:
+            return first.count()
+        rest = sketch.union(others)
+        return max(first.merge(rest).count() - rest.count(), 0.0)
+
+    def process_in_memory(self, rows):
+        if self.is_compact():
+            return self.subtract_compact(rows)
         result = {
             self.row_key(r): r
             for r in itertools.takewhile(lambda r: r['@fn'] == 0, rows)
@@ -86,12 +377,40 @@ class SubtractCmd(SetOpMixin, csvutil.Filter, app.Command):
                 result.pop(k, None)
         return result.values()
 
+    def subtract_compact(self, rows):
+        table = keytable.RowTable()
+        for r in itertools.takewhile(lambda r: r['@fn'] == 0, rows):
+            table.add(self.row_key(r), r)
+        alive = bytearray([1]) * len(table)
+        for r in rows:
+            key_id = table.get(self.row_key(r))
+            if key_id is not None:
+                alive[key_id] = 0
+        return table.rows(i for i, a in enumerate(alive) if a)
+
 
-class DiffCmd(SetOpMixin, csvutil.Filter, app.Command):
+class DiffCmd(ApproxMixin, SetOpMixin, csvutil.Filter, app.Command):
     '''Keep records contained in only one set.'''
     name = 'diff'
+    TUPLE_ROWS = True
 
-    def process(self, rows):
+    def select_sorted(self, group, input_count):
+        if len(group) == 1:
+            return group[0][1]
+
+    def approx_count(self, rows):
+        '''Keys found in only one of inputs, duplicates within an input are not detected.'''
+        sketches = self.input_sketches(rows)
+        if len(sketches) == 1:
+            return sketches[0].count()
+        if len(sketches) != 2:
+            raise ValueError('diff --approx supports at most two inputs')
+        c = sketch.compare(*sketches)
+        return max(c.union - c.intersection, 0.0)
+
+    def process_in_memory(self, rows):
+        if self.is_compact():
+            return self.diff_compact(rows)
         result = {}
         conflict = set()
         for _, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
@@ -105,3 +424,148 @@ class DiffCmd(SetOpMixin, csvutil.Filter, app.Command):
                     continue
                 result[k] = r
         return result.values()
+
+    def diff_compact(self, rows):
+        table = keytable.RowTable()
+        alive = bytearray()
+        for r in rows:
+            key_id, new = table.add_new(self.row_key(r), r)
+            if new:
+                alive.append(1)
+            else:
+                alive[key_id] = 0
+        return table.rows(i for i, a in enumerate(alive) if a)
+
+
+class SetExprCmd(SetOpMixin, csvutil.Filter, app.Command):
+    '''Evaluate a set expression over inputs in one pass.'''
+    name = 'setexpr'
+    TUPLE_ROWS = True
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--expr',
+            required=True,
+            help='Set expression over inputs, like "(a & b) - c | d".  '
+                 'Operators are & | - ^ ~ with Python precedence',
+        )
+        parser.add_argument(
+            '--aliases',
+            help='Comma-separated names of inputs in the expression, "a,b,c..." by default',
+        )
+
+    @common.lazy
+    def expr(self):
+        input_count = self.input_count()
+        if self.flags.aliases:
+            aliases = self.flags.aliases.split(',')
+            if len(aliases) != input_count:
+                raise setexpr.ExprError('{} aliases for {} inputs'.format(len(aliases), input_count))
+        else:
+            aliases = setexpr.default_aliases(input_count)
+        return setexpr.SetExpr(self.flags.expr, aliases)
+
+    def process(self, rows):
+        # Check the expression before reading anything.
+        self.expr()
+        return super().process(rows)
+
+    def select_sorted(self, group, input_count):
+        mask = 0
+        for fn, _ in group:
+            mask |= 1 << fn
+        if self.expr()(mask):
+            return group[0][1]
+
+    def process_in_memory(self, rows):
+        '''Keeps the first row and membership mask of each key.'''
+        if self.is_compact():
+            return self.process_compact(rows)
+        result = {}
+        for fn, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            bit = 1 << fn
+            for r in grs:
+                k = self.row_key(r)
+                entry = result.get(k)
+                if entry is None:
+                    result[k] = [bit, r]
+                else:
+                    entry[0] |= bit
+        expr = self.expr()
+        return (r for mask, r in result.values() if expr(mask))
+
+    def process_compact(self, rows):
+        table = keytable.RowTable()
+        masks = []
+        for fn, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            bit = 1 << fn
+            for r in grs:
+                key_id, new = table.add_new(self.row_key(r), r)
+                if new:
+                    masks.append(bit)
+                else:
+                    masks[key_id] |= bit
+        expr = self.expr()
+        return table.rows(i for i, mask in enumerate(masks) if expr(mask))
+
+
+class CardCmd(KeyMixin, sketch.SketchMixin, csvutil.Filter, app.Command):
+    '''Estimate numbers of distinct keys of inputs and their overlaps.'''
+    name = 'card'
+    TUPLE_ROWS = True
+
+    INPUT_FIELDS = ['input', 'rows', 'keys']
+    PAIR_FIELDS = ['left', 'right', 'left_keys', 'right_keys', 'union', 'intersection', 'jaccard', 'left_in_right', 'right_in_left']
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--pairs',
+            action='store_true',
+            help='Output estimated union, intersection, Jaccard similarity and containment for each pair of inputs',
+        )
+
+    def get_out_fieldnames(self):
+        return self.PAIR_FIELDS if self.flags.pairs else self.INPUT_FIELDS
+
+    def process(self, rows):
+        input_list = self.flags.input or ['-']
+        sketches = [self.hyperloglog() for _ in input_list]
+        counts = [0] * len(input_list)
+        for fn, grs in itertools.groupby(rows, key=lambda r: r['@fn']):
+            add = sketches[fn].add
+            for r in grs:
+                add(self.row_key(r))
+                counts[fn] += 1
+        if not self.flags.pairs:
+            for filename, s, count in zip(input_list, sketches, counts):
+                yield csvutil.Row(input=filename, rows=count, keys=round(s.count()))
+            return
+        for (i, a), (j, b) in itertools.combinations(enumerate(sketches), 2):
+            c = sketch.compare(a, b)
+            yield csvutil.Row(
+                left=input_list[i],
+                right=input_list[j],
+                left_keys=round(c.left),
+                right_keys=round(c.right),
+                union=round(c.union),
+                intersection=round(c.intersection),
+                jaccard='{:.4f}'.format(c.jaccard),
+                left_in_right='{:.4f}'.format(c.left_in_right),
+                right_in_left='{:.4f}'.format(c.right_in_left),
+            )
+
+
+def last_of_first(group):
+    '''The last row from the first input in a sorted group.'''
+    result = None
+    for fn, r in group:
+        if fn != 0:
+            break
+        result = r
+    return result
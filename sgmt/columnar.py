@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Binary columnar stream format for piping between sgmt commands.
+
+The stream starts with MAGIC followed by frames.  Each frame is a one byte
+type, 4 bytes of payload length and payload:
+
+    - HEADER: a string list with field names;
+    - BLOCK: 4 bytes of row count followed by a string list per column.
+
+String list is an array of 4 bytes value lengths (in bytes) followed by
+concatenated UTF-8 encoded values.  All numbers are little endian.
+"""
+
+import array
+import itertools
+import logging
+import struct
+import sys
+
+from sgmt import compression
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+DIALECT = 'columnar'
+MAGIC = b'SGMTCOL1\n'
+
+HEADER = b'H'
+BLOCK = b'B'
+
+FRAME = struct.Struct('<cI')
+COUNT = struct.Struct('<I')
+LENGTH_TYPE = 'I'
+
+BLOCK_ROWS = 65536
+
+
+def is_columnar(data):
+    return data.startswith(MAGIC)
+
+
+def is_columnar_file(filename):
+    with compression.open_input(filename) as f:
+        return is_columnar(f.read(len(MAGIC)))
+
+
+def encode_strings(values):
+    encoded = [str(v).encode('utf-8') for v in values]
+    lengths = array.array(LENGTH_TYPE, map(len, encoded))
+    if sys.byteorder != 'little':
+        lengths.byteswap()
+    return lengths.tobytes() + b''.join(encoded)
+
+
+def decode_strings(data, count, start=0):
+    '''Returns (list of strings, end position).'''
+    lengths = array.array(LENGTH_TYPE)
+    lengths.frombytes(data[start:start + count * lengths.itemsize])
+    if sys.byteorder != 'little':
+        lengths.byteswap()
+    start += count * lengths.itemsize
+    end = start + sum(lengths)
+    blob = data[start:end]
+    text = blob.decode('utf-8')
+    result = []
+    pos = 0
+    if len(text) == len(blob):
+        # ASCII only: byte offsets are character offsets.
+        for n in lengths:
+            result.append(text[pos:pos + n])
+            pos += n
+    else:
+        for n in lengths:
+            result.append(blob[pos:pos + n].decode('utf-8'))
+            pos += n
+    return result, end
+
+
+class Reader(object):
+    '''Reads columnar stream from a binary file.
+
+    Produces `csvutil.TupleRow`s, or `csvutil.Row`s unless `tuples`.
+    '''
+
+    def __init__(self, f, fn=None, rn=None, tuples=True, preprocess=None):
+        self.f = f
+        self.fn = fn
+        if rn is None and fn is not None:
+            rn = itertools.count()
+        self.rn = rn
+        self.frn = itertools.count()
+        self.tuples = tuples
+        self.preprocess = preprocess
+        self._header = None
+        self._rows = self._iter_rows()
+
+    def read_frame(self):
+        head = self.f.read(FRAME.size)
+        if not head:
+            return None, None
+        if len(head) < FRAME.size:
+            raise ValueError('Truncated columnar stream')
+        frame_type, size = FRAME.unpack(head)
+        payload = self.f.read(size)
+        if len(payload) < size:
+            raise ValueError('Truncated columnar stream')
+        return frame_type, payload
+
+    @property
+    def header(self):
+        if self._header is None:
+            if self.f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('Not a columnar stream')
+            frame_type, payload = self.read_frame()
+            if frame_type != HEADER:
+                raise ValueError('Columnar stream has no header')
+            count, = COUNT.unpack_from(payload)
+            fieldnames, _ = decode_strings(payload, count, COUNT.size)
+            self._header = csvutil.Header(fieldnames, fn=self.fn)
+        return self._header
+
+    @property
+    def fieldnames(self):
+        return self.header.fieldnames
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    def _iter_rows(self):
+        header = self.header
+        while True:
+            frame_type, payload = self.read_frame()
+            if frame_type is None:
+                return
+            if frame_type != BLOCK:
+                continue
+            count, = COUNT.unpack_from(payload)
+            pos = COUNT.size
+            columns = []
+            for _ in header.fieldnames:
+                column, pos = decode_strings(payload, count, pos)
+                columns.append(column)
+            for values in zip(*columns):
+                yield self.make_row(header, values)
+
+    def make_row(self, header, values):
+        rn = None if self.rn is None else next(self.rn)
+        if self.tuples:
+            r = csvutil.TupleRow(header, values, rn)
+            if header.rn_start is None:
+                header.rn_start = rn
+        else:
+            r = csvutil.Row(zip(header.fieldnames, values))
+            if self.fn is not None:
+                r['@fn'] = self.fn
+                r['@frn'] = next(self.frn)
+            if rn is not None:
+                r['@rn'] = rn
+        if self.preprocess is not None:
+            r = self.preprocess(r)
+        return r
+
+
+class Writer(object):
+    '''Writes rows to a binary file in columnar format.
+
+    Has the same interface as `csvutil.Writer`.  Rows are buffered and
+    written in blocks of `block_rows`, call `flush` at the end.
+    '''
+
+    def __init__(self, f, fieldnames, postprocess=None, block_rows=BLOCK_ROWS):
+        self.f = f
+        self.fieldnames = list(fieldnames)
+        self.postprocess = postprocess or (lambda r: r)
+        self.block_rows = block_rows
+        self.rows = []
+        self._tuple_header = None
+        self._tuple_get = None
+
+    def write_frame(self, frame_type, payload):
+        self.f.write(FRAME.pack(frame_type, len(payload)))
+        self.f.write(payload)
+
+    def writeheader(self):
+        self.f.write(MAGIC)
+        self.write_frame(HEADER, COUNT.pack(len(self.fieldnames)) + encode_strings(self.fieldnames))
+
+    def writerow(self, row):
+        row = self.postprocess(row)
+        if type(row) is csvutil.TupleRow:
+            if row.header is not self._tuple_header:
+                self._tuple_header = row.header
+                self._tuple_get = row.header.getter(self.fieldnames)
+            values = self._tuple_get(row.values)
+        else:
+            values = [row[k] for k in self.fieldnames]
+        self.rows.append(values)
+        if len(self.rows) >= self.block_rows:
+            self.write_block()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def write_block(self):
+        if not self.rows:
+            return
+        parts = [COUNT.pack(len(self.rows))]
+        for column in zip(*self.rows):
+            parts.append(encode_strings(column))
+        self.rows = []
+        self.write_frame(BLOCK, b''.join(parts))
+
+    def flush(self):
+        self.write_block()
+        self.f.flush()
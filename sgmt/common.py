@@ -5,10 +5,14 @@
 
 import contextlib
 import functools
+import io
 import locale
 import logging
+import os
 import sys
 
+from sgmt import compression
+
 
 _logger = logging.getLogger(__name__)
 
@@ -17,13 +21,40 @@ ENCODING = locale.getpreferredencoding(False)
 
 
 @contextlib.contextmanager
-def open_file(filename, mode='r'):
-    '''Like `open` but returns a standard stream for name "-".'''
-    if filename and filename != '-':
+def open_file(filename, mode='r', compress_level=None):
+    '''Like `open` but returns a standard stream for name "-".
+
+    Text files are transparently decompressed when read and compressed when
+    written if the name has a compressed file extension, see `compression`.
+    '''
+    writing = mode and mode[0] in 'wxa'
+    filename = filename or '-'
+    if 'b' in mode or (writing and (filename == '-' or compression.format_for_name(filename) is None)):
+        if filename == '-':
+            yield sys.stdout if writing else sys.stdin
+            return
         with open(filename, mode) as f:
             yield f
+    elif writing:
+        with io.TextIOWrapper(compression.open_output(filename, compress_level), encoding=ENCODING) as f:
+            yield f
     else:
-        yield (sys.stdout if mode and mode[0] in 'wxa' else sys.stdin)
+        f = compression.open_input(filename)
+        if f is sys.stdin.buffer:
+            yield sys.stdin
+            return
+        with io.TextIOWrapper(f, encoding=ENCODING) as f:
+            yield f
+
+
+def discard_stdout():
+    '''Redirects standard output to /dev/null after its reader has gone.
+
+    Otherwise flushing stdout at exit fails with BrokenPipeError again.
+    '''
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.close(devnull)
 
 
 def lazy(f):
@@ -98,6 +129,21 @@ class Struct(dict):
     def copy(self):
         return type(self)(self._as_dict())
 
+    def __reduce__(self):
+        return (type(self), (self._as_dict(),))
+
+
+SIZE_SUFFIXES = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(s):
+    '''Parses size like "512M" or "2G" to a number of bytes.'''
+    s = s.strip().upper()
+    if s.endswith('B'):
+        s = s[:-1]
+    suffix = s[-1:] if s[-1:] in SIZE_SUFFIXES else ''
+    return int(float(s[:len(s) - len(suffix)]) * SIZE_SUFFIXES[suffix])
+
 
 def as_dict(obj):
     f = getattr(obj, '_as_dict', None)
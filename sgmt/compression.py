@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Transparent compression of input and output files.
+
+Compressed inputs are detected by magic bytes, outputs are compressed by
+file name extension.  Supported formats are gzip, bzip2, xz and zstd (with
+optional `zstandard` module).  Inputs are decompressed in a background
+thread, so decompression overlaps with parsing.
+"""
+
+import bz2
+import collections
+import gzip
+import io
+import logging
+import lzma
+import queue
+import sys
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+_logger = logging.getLogger(__name__)
+
+
+CHUNK_SIZE = 1 << 20
+QUEUE_DEPTH = 4
+MAGIC_SIZE = 6
+
+
+def zstd_module():
+    if zstandard is None:
+        raise ValueError('zstd compression requires "zstandard" module')
+    return zstandard
+
+
+def read_zstd(f):
+    return zstd_module().ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=False)
+
+
+def write_zstd(filename, level):
+    cctx = zstd_module().ZstdCompressor(**({} if level is None else {'level': level}))
+    return cctx.stream_writer(open(filename, 'wb'), closefd=True)
+
+
+def read_gzip(f):
+    return gzip.GzipFile(fileobj=f, mode='rb')
+
+
+def write_gzip(filename, level):
+    return gzip.open(filename, 'wb', compresslevel=9 if level is None else level)
+
+
+def read_bz2(f):
+    return bz2.BZ2File(f, mode='rb')
+
+
+def write_bz2(filename, level):
+    return bz2.open(filename, 'wb', compresslevel=9 if level is None else level)
+
+
+def read_xz(f):
+    return lzma.LZMAFile(f, mode='rb')
+
+
+def write_xz(filename, level):
+    return lzma.open(filename, 'wb', preset=level)
+
+
+Format = collections.namedtuple('Format', 'name extensions magic reader writer')
+
+FORMATS = [
+    Format('gzip', ('.gz', '.gzip'), b'\x1f\x8b', read_gzip, write_gzip),
+    Format('bzip2', ('.bz2',), b'BZh', read_bz2, write_bz2),
+    Format('xz', ('.xz',), b'\xfd7zXZ\x00', read_xz, write_xz),
+    Format('zstd', ('.zst', '.zstd'), b'\x28\xb5\x2f\xfd', read_zstd, write_zstd),
+]
+
+
+def detect(data):
+    '''Format of data starting with `data`, or None.'''
+    for fmt in FORMATS:
+        if data.startswith(fmt.magic):
+            return fmt
+    return None
+
+
+def format_for_name(filename):
+    for fmt in FORMATS:
+        if filename.endswith(fmt.extensions):
+            return fmt
+    return None
+
+
+def is_compressed(filename):
+    if filename == '-':
+        return False
+    with open(filename, 'rb') as f:
+        return detect(f.read(MAGIC_SIZE)) is not None
+
+
+def open_input(filename):
+    '''Opens a file for binary reading, decompressed if needed.
+
+    Returns a buffered reader.  Standard input is used for name "-".
+    '''
+    if filename == '-':
+        f = sys.stdin.buffer
+    else:
+        f = open(filename, 'rb')
+    fmt = detect(f.peek(MAGIC_SIZE)[:MAGIC_SIZE])
+    if fmt is None:
+        return f
+    source = f if filename != '-' else None
+    return io.BufferedReader(ThreadedReader(fmt.reader(f), source=source), CHUNK_SIZE)
+
+
+def source_file(f):
+    '''The file a reader returned by `open_input` reads from, to count bytes read.'''
+    raw = getattr(f, 'raw', None)
+    if not isinstance(raw, ThreadedReader):
+        return f
+    return raw.source if raw.source is not None else sys.stdin.buffer
+
+
+def open_output(filename, level=None):
+    '''Opens a file for binary writing, compressed if the name says so.'''
+    fmt = format_for_name(filename)
+    if fmt is None:
+        return open(filename, 'wb')
+    return fmt.writer(filename, level)
+
+
+class ThreadedReader(io.RawIOBase):
+    '''Reads a binary file in a background thread.
+
+    Chunks are read ahead into a bounded queue.  Decompressors release the
+    GIL, so they run in parallel with the consumer.  Closing the reader
+    closes `f` and `source`, the file `f` reads from.
+    '''
+
+    def __init__(self, f, source=None, chunk_size=CHUNK_SIZE, depth=QUEUE_DEPTH):
+        self.f = f
+        self.source = source
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(depth)
+        self.stopped = threading.Event()
+        self.buffer = b''
+        self.pos = 0
+        self.eof = False
+        # Not a daemon: a daemon thread could be frozen at interpreter exit
+        # holding the lock of `f`, which is then closed by the GC.
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                data = self.f.read(self.chunk_size)
+                if not self.put(data) or not data:
+                    return
+        except BaseException as e:
+            self.put(e)
+
+    def put(self, item):
+        '''Waits for space in the queue.  Returns False if reading should stop.'''
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                # The consumer has gone away, e.g. on an exception.
+                if not threading.main_thread().is_alive():
+                    return False
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.pos >= len(self.buffer):
+            if self.eof:
+                return 0
+            item = self.queue.get()
+            if isinstance(item, BaseException):
+                self.eof = True
+                raise item
+            if not item:
+                self.eof = True
+                return 0
+            self.buffer, self.pos = item, 0
+        n = min(len(b), len(self.buffer) - self.pos)
+        b[:n] = memoryview(self.buffer)[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.f.close()
+        if self.source is not None:
+            self.source.close()
+        super().close()
@@ -7,9 +7,15 @@ import contextlib
 import csv
 import itertools
 import logging
+import operator
 
 
+from . import columnar
 from . import common
+from . import compression
+from . import dialects
+from . import parallel
+from . import stats
 
 
 _logger = logging.getLogger(__name__)
@@ -17,6 +23,9 @@ _logger = logging.getLogger(__name__)
 
 ANCHOR = '^'
 
+# Rows formatted at once by `Writer.writerows`.
+BATCH_ROWS = 4096
+
 
 class Row(common.Struct):
     def __init__(self, *args, **kw):
@@ -74,33 +83,315 @@ class Reader(csv.DictReader):
         return self.preprocess(r)
 
 
+class Header(object):
+    '''Field names shared by all rows of a tuple-based input.'''
+
+    def __init__(self, fieldnames, fn=None):
+        self.fieldnames = list(fieldnames)
+        self.index = {n: i for i, n in enumerate(self.fieldnames)}
+        self.fn = fn
+        self.rn_start = None
+        self._getters = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_getters'] = {}
+        return state
+
+    def getter(self, names):
+        '''Returns a function to extract a tuple of `names` values.'''
+        names = tuple(names)
+        result = self._getters.get(names)
+        if result is None:
+            result = self._getters[names] = make_getter([self.index.get(n) for n in names])
+        return result
+
+
+def make_getter(indexes):
+    if not indexes:
+        return lambda values: ()
+    if None in indexes:
+        return lambda values: tuple('' if i is None else values[i] for i in indexes)
+    if len(indexes) == 1:
+        i, = indexes
+        return lambda values: (values[i],)
+    return operator.itemgetter(*indexes)
+
+
+class TupleRow(object):
+    '''Read-only row backed by a tuple of values and a shared `Header`.
+
+    Supports `Row`-like access by column name.  Use `as_row` to get a mutable
+    `Row`.
+    '''
+    __slots__ = ('header', 'values', 'rn')
+
+    def __init__(self, header, values, rn=None):
+        self.header = header
+        self.values = values
+        self.rn = rn
+
+    def __getitem__(self, key):
+        i = self.header.index.get(key)
+        if i is not None:
+            return self.values[i]
+        if key == '@fn':
+            return self.header.fn if self.header.fn is not None else ''
+        if key == '@rn':
+            return self.rn if self.rn is not None else ''
+        if key == '@frn':
+            if self.header.fn is None or self.rn is None:
+                return ''
+            return self.rn - self.header.rn_start
+        return ''
+
+    def __getattr__(self, key):
+        if key.startswith('__'):
+            raise AttributeError(key)
+        return self[key]
+
+    def get(self, key, default=''):
+        return self[key] or default
+
+    def _as_dict(self):
+        result = {k: v for k, v in zip(self.header.fieldnames, self.values) if v != ''}
+        for k in ('@fn', '@frn', '@rn'):
+            v = self[k]
+            if v != '':
+                result[k] = v
+        return result
+
+    def as_row(self):
+        return Row(self._as_dict())
+    copy = as_row
+
+    def items(self):
+        return self._as_dict().items()
+
+    def __eq__(self, other):
+        return self._as_dict() == common.as_dict(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'TupleRow({!r})'.format(self._as_dict())
+
+
+class ColumnGetter(object):
+    '''Extracts a tuple of column values from `Row` and `TupleRow` alike.'''
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self._header = None
+        self._get = None
+
+    def __call__(self, row):
+        if type(row) is TupleRow:
+            header = row.header
+            if header is not self._header:
+                self._header = header
+                self._get = header.getter(self.names)
+            return self._get(row.values)
+        return tuple(row[n] for n in self.names)
+
+
+class TupleReader(object):
+    '''CSV reader producing `TupleRow`s.
+
+    Unlike `Reader` it doesn't build a dict per record: values are kept in a
+    plain tuple, and column names are resolved through one shared `Header`.
+    '''
+
+    def __init__(self, f, preprocess=None, fn=None, rn=None, fieldnames=None, **kw):
+        self.reader = csv.reader(f, **kw)
+        self.preprocess = preprocess
+        self.fn = fn
+        if rn is None and fn is not None:
+            rn = itertools.count()
+        self.rn = rn
+        self._header = None if fieldnames is None else Header(fieldnames, fn=fn)
+        self._rows = self._iter_rows()
+
+    @property
+    def header(self):
+        if self._header is None:
+            for fieldnames in self.reader:
+                if fieldnames:
+                    break
+            else:
+                fieldnames = []
+            self._header = Header(fieldnames, fn=self.fn)
+        return self._header
+
+    @property
+    def fieldnames(self):
+        return self.header.fieldnames
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    def _iter_rows(self):
+        header = self.header
+        width = len(header.fieldnames)
+        preprocess = self.preprocess
+        rn = self.rn
+        for values in self.reader:
+            if not values:
+                continue
+            if len(values) < width:
+                values += [''] * (width - len(values))
+            if rn is None:
+                r = TupleRow(header, tuple(values))
+            else:
+                r = TupleRow(header, tuple(values), next(rn))
+                if header.rn_start is None:
+                    header.rn_start = r.rn
+            if preprocess is not None:
+                r = preprocess(r)
+            yield r
+
+
 class Writer(csv.DictWriter):
+    '''DictWriter which also writes `TupleRow`s and formats rows in batches.
+
+    `writerows` takes rows in batches.  Values of a batch of `TupleRow`s with
+    a common header are picked with one precomputed getter, dicts with all
+    fields present with `operator.itemgetter`, so that the per-row work is
+    done in C.
+    '''
+
     def __init__(self, *args, **kw):
-        postprocess = kw.pop('postprocess', None)
+        self.postprocess = kw.pop('postprocess', None)
+        self.batch_rows = kw.pop('batch_rows', BATCH_ROWS)
         super().__init__(*args, **kw)
-        if postprocess is None:
-            postprocess = lambda r: r
-        self.postprocess = postprocess
+        self._fieldnames = list(self.fieldnames)
+        self._tuple_header = None
+        self._tuple_get = None
+        self._dict_get = make_dict_getter(self._fieldnames)
 
     def writerow(self, row):
-        return super().writerow(self.postprocess(row))
+        if self.postprocess is not None:
+            row = self.postprocess(row)
+        return self.writer.writerow(self.row_values(row))
 
     def writerows(self, rows):
-        return super().writerows(self.postprocess(row) for row in rows)
-
-
-class Base(object):
-    SNIFF_SIZE = 1024
-
+        it = iter(rows)
+        while True:
+            batch = list(itertools.islice(it, self.batch_rows))
+            if not batch:
+                return
+            self.write_batch(batch)
+
+    def write_batch(self, rows):
+        '''Formats and writes a list of rows.'''
+        if self.postprocess is not None:
+            rows = list(map(self.postprocess, rows))
+        self.writer.writerows(self.batch_values(rows))
+
+    def batch_values(self, rows):
+        '''Values of postprocessed `rows`.'''
+        types = set(map(type, rows))
+        if types == {TupleRow}:
+            headers = set(map(ROW_HEADER, rows))
+            if len(headers) == 1:
+                header = headers.pop()
+                values = list(map(ROW_VALUES, rows))
+                if header.fieldnames == self._fieldnames and max(map(len, values)) <= len(self._fieldnames):
+                    return values
+                return map(self.tuple_getter(header), values)
+        elif self.extrasaction == 'ignore' and TupleRow not in types:
+            try:
+                return list(map(self._dict_get, rows))
+            except KeyError:
+                pass
+        return map(self.row_values, rows)
+
+    def row_values(self, row):
+        '''Values of a postprocessed row.'''
+        if type(row) is TupleRow:
+            return self.tuple_values(row)
+        if self.extrasaction != 'ignore':
+            return self._dict_to_list(row)
+        restval = self.restval
+        return [row.get(k, restval) for k in self.fieldnames]
+
+    def tuple_values(self, row):
+        return self.tuple_getter(row.header)(row.values)
+
+    def tuple_getter(self, header):
+        if header is not self._tuple_header:
+            self._tuple_header = header
+            self._tuple_get = self.make_tuple_getter(header)
+        return self._tuple_get
+
+    def make_tuple_getter(self, header):
+        if header.fieldnames == self._fieldnames:
+            width = len(self._fieldnames)
+            return lambda values: values if len(values) == width else values[:width]
+        return header.getter(self._fieldnames)
+
+
+def make_dict_getter(fieldnames):
+    '''Returns a function to extract a tuple of `fieldnames` values from a dict.'''
+    if len(fieldnames) == 1:
+        name, = fieldnames
+        return lambda row: (row[name],)
+    return operator.itemgetter(*fieldnames)
+
+
+ROW_HEADER = operator.attrgetter('header')
+ROW_VALUES = operator.attrgetter('values')
+
+
+class Base(stats.StatsMixin):
     @contextlib.contextmanager
-    def csv_file_reader(self, filename, dialect=None, fn=None, rn=None):
+    def csv_file_reader(self, filename, dialect=None, fn=None, rn=None, tuples=False):
+        st = self.stats()
         with common.open_file(filename) as f:
-            if not dialect:
-                dialect = csv.Sniffer().sniff(f.buffer.peek(self.SNIFF_SIZE).decode(common.ENCODING))
-            yield Reader(f, dialect=dialect, fn=fn, rn=rn)
+            with st.phase('sniff'):
+                is_columnar = dialect == columnar.DIALECT or columnar.is_columnar(f.buffer.peek(len(columnar.MAGIC)))
+                if not is_columnar:
+                    dialect = self.resolve_dialect(filename, f.buffer, dialect)
+            if is_columnar:
+                yield columnar.Reader(f.buffer, fn=fn, rn=rn, tuples=tuples)
+            else:
+                reader_type = TupleReader if tuples else Reader
+                yield reader_type(f, dialect=dialect, fn=fn, rn=rn)
+            st.add_bytes_in(compression.source_file(f.buffer))
+
+    def resolve_dialect(self, filename, f, dialect):
+        '''Returns `dialect`, or detected dialect of binary file `f` for "auto".'''
+        if not dialects.is_auto(dialect):
+            return dialect
+        return dialects.detect(f, filename)
+
+    def file_dialect(self, filename, dialect):
+        '''Like `resolve_dialect`, but opens the file itself.'''
+        if not dialects.is_auto(dialect):
+            return dialect
+        with compression.open_input(filename) as f:
+            return self.resolve_dialect(filename, f, dialect)
 
 
 class In(Base):
+    # Read rows as `TupleRow`s instead of `Row`s.  Commands which don't modify
+    # rows in place should set it to True.
+    TUPLE_ROWS = False
+
+    # Previous command when rows come from another command in the same
+    # process, see "pipe" command.
+    upstream = None
+
+    # Dialect of all inputs with --assume-same-dialect.
+    same_dialect = None
+
     @classmethod
     def input_args(cls, parser):
         parser.add_argument(
@@ -111,9 +402,25 @@ class In(Base):
         parser.add_argument(
             '--input-dialect',
             metavar='DIALECT',
-            choices=csv.list_dialects(),
+            choices=list_input_dialects(),
             default='default',
-            help='CSV dialect for input file',
+            help='CSV dialect for input file, "{}" to detect it.  Columnar input is detected automatically'.format(dialects.AUTO),
+        )
+        parser.add_argument(
+            '--assume-same-dialect',
+            action='store_true',
+            help='With "--input-dialect {}", detect dialect of the first input file and use it for all of them'.format(dialects.AUTO),
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Number of worker processes to parse input files',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            help='With --jobs, split input files larger than this, like 64M.  '
+                 'Chunks are split on line boundaries, so quoted values must not contain newlines',
         )
 
     @classmethod
@@ -127,28 +434,66 @@ class In(Base):
         rn = itertools.count()
         input_list = self.flags.input or ['-']
         for fn, filename in enumerate(input_list):
-            with self.csv_file_reader(filename=filename, dialect=self.flags.input_dialect, fn=fn, rn=rn) as csv_reader:
+            with self.csv_file_reader(filename=filename, dialect=self.flags.input_dialect, fn=fn, rn=rn, tuples=self.TUPLE_ROWS) as csv_reader:
                 yield csv_reader
 
     @common.lazy
     @common.stepback
     def iter_rows(self):
+        st = self.stats()
+        if self.flags.jobs > 1:
+            # Workers count input rows and bytes, see `parallel.iter_rows`.
+            yield from st.wrap_rows('read', parallel.iter_rows(self), count=False)
+            return
+        preprocess_input = st.wrap_func('preprocess', self.preprocess_input)
         for reader in self.iter_inputs():
-            for r in reader:
-                yield self.preprocess_input(r)
+            for r in st.wrap_rows('read', reader):
+                yield preprocess_input(r)
+
+    def worker_clone(self):
+        '''Returns a copy of the command to be sent to worker processes.'''
+        clone = type(self)()
+        clone.flags = self.flags
+        self.prepare_worker(clone)
+        return clone
+
+    def prepare_worker(self, clone):
+        '''Copies state that workers can't build themselves, like data read from stdin.'''
+        pass
 
     def preprocess_input(self, row):
         return row
 
+    def resolve_dialect(self, filename, f, dialect):
+        if (not dialects.is_auto(dialect) or not getattr(self.flags, 'assume_same_dialect', False)
+                or filename not in (self.flags.input or ['-'])):
+            return super().resolve_dialect(filename, f, dialect)
+        if self.same_dialect is None:
+            self.same_dialect = super().resolve_dialect(filename, f, dialect)
+        return self.same_dialect
+
     def get_current_input(self):
         return next(iter(self.iter_inputs()))
 
+    @contextlib.contextmanager
+    def open_all_inputs(self):
+        '''Opens all input files at once.  Yields a list of readers.'''
+        input_list = self.flags.input or ['-']
+        with contextlib.ExitStack() as stack:
+            readers = [self.get_current_input()]
+            for fn, filename in enumerate(input_list[1:], 1):
+                readers.append(stack.enter_context(self.csv_file_reader(
+                    filename=filename, dialect=self.flags.input_dialect, fn=fn, tuples=self.TUPLE_ROWS)))
+            yield readers
+
     def get_in_fieldnames(self):
+        if self.upstream is not None:
+            return self.upstream.get_out_fieldnames()
         return self.get_current_input().fieldnames
 
 
 
-class Out(object):
+class Out(stats.StatsMixin):
     OUT_FIELDS = None
 
     @classmethod
@@ -163,36 +508,102 @@ class Out(object):
         parser.add_argument(
             '--output-dialect',
             metavar='DIALECT',
-            choices=csv.list_dialects(),
+            choices=list_dialects(),
             default='default',
-            help='CSV dialect for output file',
+            help='CSV dialect for output file, or "{}" for binary stream to other sgmt commands'.format(columnar.DIALECT),
+        )
+        parser.add_argument(
+            '--compress-level',
+            metavar='LEVEL',
+            type=int,
+            help='Compression level for output files with .gz, .bz2, .xz or .zst extension',
         )
 
     def get_out_fieldnames(self):
         return self.OUT_FIELDS
 
     @contextlib.contextmanager
-    def get_output(self):
-        with common.open_file(self.flags.output, 'w+') as out_f:
-            w = Writer(out_f, fieldnames=self.get_out_fieldnames(), dialect=self.flags.output_dialect, extrasaction='ignore', postprocess=self.postprocess_output)
+    def get_output(self, filename=None):
+        '''Opens output and yields a writer.
+
+        When the reader of standard output goes away (e.g. `| head`), the rest
+        of output is discarded silently.
+        '''
+        filename = filename or self.flags.output
+        try:
+            with self.open_output(filename) as w:
+                yield w
+        except BrokenPipeError:
+            if filename != '-':
+                raise
+            _logger.debug('Output pipe is closed, discarding the rest of output')
+            common.discard_stdout()
+
+    @contextlib.contextmanager
+    def open_output(self, filename):
+        level = getattr(self.flags, 'compress_level', None)
+        st = self.stats()
+        postprocess = None
+        if type(self).postprocess_output is not Out.postprocess_output:
+            postprocess = st.wrap_func('postprocess', self.postprocess_output)
+        if self.flags.output_dialect == columnar.DIALECT:
+            with common.open_file(filename, 'w+', compress_level=level) as out_f:
+                out_f.flush()
+                w = columnar.Writer(out_f.buffer, fieldnames=self.get_out_fieldnames(), postprocess=postprocess)
+                w.writeheader()
+                yield st.wrap_writer(w)
+                with st.phase('write'):
+                    w.flush()
+                st.add_bytes_out(out_f.buffer)
+            return
+        with common.open_file(filename, 'w+', compress_level=level) as out_f:
+            w = Writer(out_f, fieldnames=self.get_out_fieldnames(), dialect=self.flags.output_dialect, extrasaction='ignore', postprocess=postprocess)
             w.writeheader()
-            yield w
+            yield st.wrap_writer(w)
+            with st.phase('write'):
+                out_f.flush()
+            st.add_bytes_out(out_f.buffer)
 
     def postprocess_output(self, row):
         return row
 
 
 class Filter(Out, In):
+    # `process_local` may be run in worker processes on parts of input.
+    PARALLEL = False
+
     def get_out_fieldnames(self):
         return super().get_out_fieldnames() or self.get_in_fieldnames()
 
     def main(self):
-        with self.get_output() as csv_out:
-            csv_out.writerows(self.process(self.iter_rows()))
+        with self.instrumented(), self.get_output() as csv_out:
+            csv_out.writerows(self.process_rows())
+
+    def process_rows(self):
+        if self.PARALLEL and self.flags.jobs > 1:
+            rows = parallel.iter_rows(self, local=True)
+            return self.process_merge(self.stats().wrap_rows('read', rows, count=False))
+        return self.process(self.iter_rows())
 
     def process(self, rows):
         return []
 
+    def process_local(self, rows):
+        '''Part of `process` that may run on each part of input separately.'''
+        return self.process(rows)
+
+    def process_merge(self, rows):
+        '''Combines outputs of `process_local` for parts of input.'''
+        return rows
+
+
+def list_dialects():
+    return csv.list_dialects() + [columnar.DIALECT]
+
+
+def list_input_dialects():
+    return list_dialects() + [dialects.AUTO]
+
 
 class DefaultDialect(csv.Dialect):
     """Describe the usual properties of Excel-generated CSV files."""
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""CSV dialect detection.
+
+Dialect "auto" is detected with `csv.Sniffer` on a sample of complete lines
+from the beginning of a file.  Results are cached by file signature (path,
+size and modification time), so a file is sniffed once per process.  Pipes
+are sniffed on the data already buffered; when that's not enough to detect
+anything, the default dialect is used.
+"""
+
+import csv
+import logging
+import os
+
+from sgmt import common
+
+
+_logger = logging.getLogger(__name__)
+
+
+AUTO = 'auto'
+FALLBACK = 'default'
+SAMPLE_SIZE = 64 * 1024
+DELIMITERS = ',\t;|'
+
+PARAMS = ('delimiter', 'quotechar', 'escapechar', 'doublequote', 'skipinitialspace', 'lineterminator', 'quoting')
+
+_cache = {}
+
+
+class DetectedDialect(object):
+    '''Dialect parameters found by sniffing.
+
+    Unlike dialects returned by `csv.Sniffer` it can be pickled and
+    converted to JSON with `params`.
+    '''
+
+    def __init__(self, **params):
+        self.__dict__.update(params)
+
+    @classmethod
+    def from_dialect(cls, dialect):
+        return cls(**{k: getattr(dialect, k) for k in PARAMS})
+
+    def params(self):
+        return {k: getattr(self, k) for k in PARAMS}
+
+    def __eq__(self, other):
+        return isinstance(other, DetectedDialect) and self.params() == other.params()
+
+    def __repr__(self):
+        return 'DetectedDialect({!r})'.format(self.params())
+
+
+def is_auto(dialect):
+    return not dialect or dialect == AUTO
+
+
+def to_json(dialect):
+    '''Dialect name or parameters to store in JSON.'''
+    if isinstance(dialect, DetectedDialect):
+        return dialect.params()
+    return dialect
+
+
+def from_json(data):
+    if isinstance(data, dict):
+        return DetectedDialect(**data)
+    return data
+
+
+def signature(filename):
+    st = os.stat(filename)
+    return (os.path.realpath(filename), st.st_size, st.st_mtime_ns)
+
+
+def read_sample(f):
+    '''Complete lines from the start of binary file `f`, which is not consumed.'''
+    if f.seekable():
+        pos = f.tell()
+        data = f.read(SAMPLE_SIZE)
+        f.seek(pos)
+    else:
+        data = f.peek(SAMPLE_SIZE)[:SAMPLE_SIZE]
+    end = data.rfind(b'\n')
+    if end < 0:
+        return ''
+    return data[:end + 1].decode(common.ENCODING, errors='replace')
+
+
+def sniff(sample):
+    '''Dialect of a sample, or None if it can't be detected.'''
+    if not sample:
+        return None
+    try:
+        return DetectedDialect.from_dialect(csv.Sniffer().sniff(sample, delimiters=DELIMITERS))
+    except csv.Error:
+        return None
+
+
+def detect(f, filename=None):
+    '''Dialect of binary file `f` named `filename`.'''
+    sig = None
+    if filename and filename != '-':
+        sig = signature(filename)
+        dialect = _cache.get(sig)
+        if dialect is not None:
+            return dialect
+    dialect = sniff(read_sample(f))
+    if dialect is None:
+        _logger.warning('%s: can not detect CSV dialect, using "%s"', filename or '-', FALLBACK)
+        dialect = FALLBACK
+    if sig is not None:
+        _cache[sig] = dialect
+    return dialect
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Persistent binary graph index.
+
+The index keeps a `graphstore.Graph` built from a CSV file: the node table,
+CSR adjacency for both edge directions and byte offsets of edge rows in the
+source CSV.  It is loaded with `mmap`, rows are read back from the source
+file only for edges which are output.
+
+File layout: MAGIC, 8 bytes of JSON header length, JSON header, then
+8-byte aligned sections described in the header.
+"""
+
+import csv
+import json
+import logging
+import mmap
+import os
+import struct
+
+from sgmt import common
+from sgmt import compression
+from sgmt import csvutil
+from sgmt import dialects
+from sgmt import graphstore
+
+
+_logger = logging.getLogger(__name__)
+
+
+MAGIC = b'SGMTIDX1'
+ALIGN = 8
+LENGTH = struct.Struct('<Q')
+
+
+class StaleIndexError(Exception):
+    '''Index doesn't match its source file.'''
+
+
+class OffsetLines(object):
+    '''Iterates decoded lines of a binary file tracking byte offsets.'''
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(common.ENCODING)
+
+
+class OffsetStore(object):
+    '''Edge payload store reading rows from the source CSV by byte offset.'''
+
+    def __init__(self, filename, fieldnames, dialect, offsets=None):
+        self.filename = filename
+        self.fieldnames = fieldnames
+        self.dialect = dialect
+        self.offsets = graphstore.id_array() if offsets is None else offsets
+        self._file = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, offset):
+        self.offsets.append(offset)
+        return len(self.offsets) - 1
+
+    def row(self, index):
+        if self._file is None:
+            self._file = open(self.filename, 'rb')
+        self._file.seek(self.offsets[index])
+        for values in csv.reader(OffsetLines(self._file), dialect=self.dialect):
+            if values:
+                return csvutil.Row(zip(self.fieldnames, values))
+        return csvutil.Row()
+
+
+class MappedNodeTable(object):
+    '''Read-only node table over names blob and offsets.'''
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        self._ids = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return (self.name(i) for i in range(len(self)))
+
+    def name(self, node_id):
+        return str(self.blob[self.offsets[node_id]:self.offsets[node_id + 1]], 'utf-8')
+
+    def get(self, name):
+        if self._ids is None:
+            self._ids = {n: i for i, n in enumerate(self)}
+        return self._ids.get(name)
+
+
+def source_signature(filename):
+    st = os.stat(filename)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def build(filename, src='src', dst='dst', dialect='default'):
+    '''Builds a graph with rows stored as offsets into `filename`.'''
+    if compression.is_compressed(filename):
+        raise ValueError('{}: compressed files can not be indexed, decompress it first'.format(filename))
+    with open(filename, 'rb') as f:
+        lines = OffsetLines(f)
+        reader = csv.reader(lines, dialect=dialect)
+        fieldnames = next(reader, [])
+        src_i, dst_i = fieldnames.index(src), fieldnames.index(dst)
+        edges = OffsetStore(filename, fieldnames, dialect)
+        graph = graphstore.Graph(src=src, dst=dst, edges=edges)
+        offset = lines.offset
+        for values in reader:
+            if values:
+                graph.edge_srcs.append(graph.nodes.intern(values[src_i]))
+                graph.edge_dsts.append(graph.nodes.intern(values[dst_i]))
+                edges.append(offset)
+            offset = lines.offset
+    return graph.freeze()
+
+
+def write(graph, filename, index_filename, dialect='default'):
+    names = [n.encode('utf-8') for n in graph.nodes]
+    name_offsets = graphstore.id_array(len(names) + 1)
+    for i, n in enumerate(names):
+        name_offsets[i + 1] = name_offsets[i] + len(n)
+    reverse = graph.transpose()
+    sections = [
+        ('name_offsets', name_offsets),
+        ('names', b''.join(names)),
+        ('edge_srcs', graph.edge_srcs),
+        ('edge_dsts', graph.edge_dsts),
+        ('row_offsets', graph.edges.offsets),
+        ('offsets', graph.offsets),
+        ('targets', graph.targets),
+        ('edge_ids', graph.edge_ids),
+        ('reverse_offsets', reverse.offsets),
+        ('reverse_targets', reverse.targets),
+        ('reverse_edge_ids', reverse.edge_ids),
+    ]
+
+    header = {
+        'source': os.path.abspath(filename),
+        'signature': source_signature(filename),
+        'src': graph.src,
+        'dst': graph.dst,
+        'fieldnames': graph.edges.fieldnames,
+        'dialect': dialects.to_json(dialect),
+        'id_type': graphstore.ID_TYPE,
+        'sections': {},
+    }
+    position = 0
+    for name, data in sections:
+        size = len(memoryview(data).cast('B'))
+        header['sections'][name] = [position, size]
+        position += aligned(size)
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    with open(index_filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        f.write(bytes(aligned(f.tell()) - f.tell()))
+        for _, data in sections:
+            data = memoryview(data).cast('B')
+            f.write(data)
+            f.write(bytes(aligned(len(data)) - len(data)))
+
+
+def aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('{}: not an sgmt index'.format(f.name))
+    size, = LENGTH.unpack(f.read(LENGTH.size))
+    header = json.loads(f.read(size).decode('utf-8'))
+    header['data_start'] = aligned(f.tell())
+    return header
+
+
+def load(index_filename, source=None, reverse=False):
+    '''Maps an index file and returns a frozen `graphstore.Graph`.
+
+    Raises `StaleIndexError` if the source file was changed since the index
+    was built.  With `reverse` the graph has all edges inverted.
+    '''
+    with open(index_filename, 'rb') as f:
+        header = read_header(f)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    source = source or header['source']
+    if source_signature(source) != header['signature']:
+        raise StaleIndexError('{}: index is stale for {}, rebuild it'.format(index_filename, source))
+
+    data = memoryview(mm)[header['data_start']:]
+    def section(name, fmt=header['id_type']):
+        start, size = header['sections'][name]
+        return data[start:start + size].cast(fmt)
+
+    edges = OffsetStore(source, header['fieldnames'], dialects.from_json(header['dialect']), offsets=section('row_offsets'))
+    nodes = MappedNodeTable(section('name_offsets'), section('names', 'B'))
+    graph = graphstore.Graph(src=header['src'], dst=header['dst'], nodes=nodes, edges=edges)
+    prefix = 'reverse_' if reverse else ''
+    graph.edge_srcs, graph.edge_dsts = section('edge_srcs'), section('edge_dsts')
+    if reverse:
+        graph.edge_srcs, graph.edge_dsts = graph.edge_dsts, graph.edge_srcs
+    graph.offsets = section(prefix + 'offsets')
+    graph.targets = section(prefix + 'targets')
+    graph.edge_ids = section(prefix + 'edge_ids')
+    graph.fieldnames = header['fieldnames']
+    return graph
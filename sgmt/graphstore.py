@@ -0,0 +1,516 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Compact graph storage.
+
+Node names are interned to integer ids, adjacency is kept in CSR form
+(`offsets` + `targets` arrays) and edge payload columns are stored in a
+columnar side table.  Rows are only rebuilt for edges that are output.
+"""
+
+import array
+import itertools
+import logging
+
+from sgmt import csvutil
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_logger = logging.getLogger(__name__)
+
+
+ID_TYPE = 'q'
+VALUE_TYPE = 'l'
+
+
+def id_array(size=0):
+    return array.array(ID_TYPE, bytes(size * array.array(ID_TYPE).itemsize))
+
+
+class NodeTable(object):
+    '''Interns node names to consecutive integer ids.'''
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def intern(self, name):
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return node_id
+
+    def get(self, name):
+        return self.ids.get(name)
+
+    def name(self, node_id):
+        return self.names[node_id]
+
+
+class ColumnStore(object):
+    '''Columnar storage for edge payload.
+
+    Values of all columns are interned into a single value pool, each column
+    is an array of value ids.  Columns are padded lazily, so sparse columns
+    stay short.  Internal columns (starting with "@") and columns listed in
+    `skip` are not stored.
+    '''
+
+    def __init__(self, skip=()):
+        self.skip = frozenset(skip)
+        self.columns = {}
+        self.values = ['']
+        self.value_ids = {'': 0}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        index = self.count
+        self.count += 1
+        for k, v in row.items():
+            if k in self.skip or k.startswith('@') or k == '__dict__':
+                continue
+            column = self.columns.get(k)
+            if column is None:
+                column = self.columns[k] = array.array(VALUE_TYPE)
+            if len(column) < index:
+                column.extend(itertools.repeat(0, index - len(column)))
+            value_id = self.value_ids.get(v)
+            if value_id is None:
+                value_id = self.value_ids[v] = len(self.values)
+                self.values.append(v)
+            column.append(value_id)
+        return index
+
+    def row(self, index):
+        r = csvutil.Row()
+        for k, column in self.columns.items():
+            if index < len(column):
+                r[k] = self.values[column[index]]
+        return r
+
+
+class NullStore(object):
+    '''Edge payload store that keeps nothing.'''
+
+    def __init__(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        index = self.count
+        self.count += 1
+        return index
+
+    def row(self, index):
+        return csvutil.Row()
+
+
+class Graph(object):
+    '''Directed graph with interned nodes and CSR adjacency.
+
+    Edges are added with `add_edge`/`add_rows`, then `freeze` builds the
+    adjacency.  For every source node only the last edge to a particular
+    destination is kept, destinations are ordered by first appearance.
+    '''
+
+    def __init__(self, src='src', dst='dst', nodes=None, edges=None):
+        self.src = src
+        self.dst = dst
+        self.nodes = NodeTable() if nodes is None else nodes
+        self.edges = ColumnStore(skip=(src, dst)) if edges is None else edges
+        self.edge_srcs = id_array()
+        self.edge_dsts = id_array()
+        self.offsets = None
+        self.targets = None
+        self.edge_ids = None
+
+    @classmethod
+    def from_rows(cls, rows, src='src', dst='dst', payload=True):
+        graph = cls(src=src, dst=dst, edges=None if payload else NullStore())
+        graph.add_rows(rows)
+        graph.freeze()
+        return graph
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add_edge(self, src, dst, row=None):
+        self.edge_srcs.append(self.nodes.intern(src))
+        self.edge_dsts.append(self.nodes.intern(dst))
+        return self.edges.append(row or {})
+
+    def add_rows(self, rows):
+        src, dst = self.src, self.dst
+        for r in rows:
+            self.add_edge(r[src], r[dst], r)
+
+    def freeze(self):
+        '''Build CSR adjacency from the edge list.'''
+        n = len(self.nodes)
+        offsets = id_array(n + 1)
+        for s in self.edge_srcs:
+            offsets[s + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+
+        order = id_array(len(self.edge_srcs))
+        pos = offsets[:-1]
+        for e, s in enumerate(self.edge_srcs):
+            order[pos[s]] = e
+            pos[s] += 1
+        del pos
+
+        targets, edge_ids = id_array(), id_array()
+        new_offsets = id_array(n + 1)
+        dsts = self.edge_dsts
+        for s in range(n):
+            seen = {}
+            for e in order[offsets[s]:offsets[s + 1]]:
+                d = dsts[e]
+                p = seen.get(d)
+                if p is None:
+                    seen[d] = len(targets)
+                    targets.append(d)
+                    edge_ids.append(e)
+                else:
+                    edge_ids[p] = e
+            new_offsets[s + 1] = len(targets)
+
+        self.offsets, self.targets, self.edge_ids = new_offsets, targets, edge_ids
+        return self
+
+    def transpose(self):
+        '''Frozen graph with all edges inverted.  Shares nodes and payload.'''
+        graph = type(self)(src=self.src, dst=self.dst, nodes=self.nodes, edges=self.edges)
+        graph.edge_srcs, graph.edge_dsts = self.edge_dsts, self.edge_srcs
+        return graph.freeze()
+
+    def successors(self, node_id):
+        '''Yields (dst_id, edge_id) pairs.'''
+        lo, hi = self.offsets[node_id], self.offsets[node_id + 1]
+        return zip(self.targets[lo:hi], self.edge_ids[lo:hi])
+
+    def out_degree(self, node_id):
+        return self.offsets[node_id + 1] - self.offsets[node_id]
+
+    def in_degrees(self):
+        result = id_array(len(self.nodes))
+        for d in self.targets:
+            result[d] += 1
+        return result
+
+    def find_nodes(self, predicate):
+        '''Ids of nodes which names satisfy the predicate.'''
+        return [i for i, name in enumerate(self.nodes) if predicate(name)]
+
+    def edge_row(self, edge_id):
+        '''Rebuild the row for an edge.'''
+        r = self.edges.row(edge_id)
+        r[self.src] = self.nodes.name(self.edge_srcs[edge_id])
+        r[self.dst] = self.nodes.name(self.edge_dsts[edge_id])
+        return r
+
+
+def bfs(graph, seeds, max_depth=None):
+    '''BFS over a frozen graph.
+
+    Yields edge ids in BFS order starting from `seeds` node ids.
+    '''
+    for _, edge_ids in bfs_levels(graph, seeds, max_depth=max_depth):
+        yield from edge_ids
+
+
+def bfs_levels(graph, seeds, max_depth=None):
+    '''Level-synchronous BFS over a frozen graph.
+
+    Expands whole frontiers at once.  Yields (depth, edge_ids) for every
+    level, edges of depth 1 start at seeds.  Nodes in a frontier are ordered
+    by discovery, so edges come in the same order as in a queue-based BFS.
+    Uses NumPy when available.
+    '''
+    seeds = sorted(set(seeds))
+    if numpy is not None:
+        return _bfs_levels_numpy(graph, seeds, max_depth)
+    return _bfs_levels_python(graph, seeds, max_depth)
+
+
+def _bfs_levels_python(graph, seeds, max_depth):
+    offsets, targets, edge_ids = graph.offsets, graph.targets, graph.edge_ids
+    visited = bytearray(len(graph))
+    for n in seeds:
+        visited[n] = 1
+    frontier = seeds
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth):
+        depth += 1
+        level_edges = id_array()
+        next_frontier = []
+        for n in frontier:
+            lo, hi = offsets[n], offsets[n + 1]
+            level_edges.extend(edge_ids[lo:hi])
+            for d in targets[lo:hi]:
+                if not visited[d]:
+                    visited[d] = 1
+                    next_frontier.append(d)
+        yield depth, level_edges
+        frontier = next_frontier
+
+
+def _bfs_levels_numpy(graph, seeds, max_depth):
+    offsets = numpy.asarray(graph.offsets, dtype=numpy.int64)
+    targets = numpy.asarray(graph.targets, dtype=numpy.int64)
+    edge_ids = numpy.asarray(graph.edge_ids, dtype=numpy.int64)
+    visited = numpy.zeros(len(graph), dtype=bool)
+    frontier = numpy.asarray(seeds, dtype=numpy.int64)
+    visited[frontier] = True
+    depth = 0
+    while len(frontier) and (max_depth is None or depth < max_depth):
+        depth += 1
+        starts = offsets[frontier]
+        lengths = offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            break
+        # Positions of all out-edges of the frontier, frontier order kept.
+        shifts = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+        positions = shifts + numpy.arange(total, dtype=numpy.int64)
+        yield depth, edge_ids[positions].tolist()
+
+        dsts = targets[positions]
+        dsts = dsts[~visited[dsts]]
+        _, first = numpy.unique(dsts, return_index=True)
+        frontier = dsts[numpy.sort(first)]
+        visited[frontier] = True
+
+
+def sources(graph):
+    '''Ids of nodes with outgoing edges and without incoming ones.'''
+    in_degrees = graph.in_degrees()
+    return [
+        i for i in range(len(graph))
+        if in_degrees[i] == 0 and graph.out_degree(i) > 0
+    ]
+
+
+def reachable(graph, seeds):
+    '''Marks of nodes reachable from `seeds` node ids, seeds included.'''
+    offsets, targets = graph.offsets, graph.targets
+    visited = bytearray(len(graph))
+    stack = []
+    for n in seeds:
+        if not visited[n]:
+            visited[n] = 1
+            stack.append(n)
+    while stack:
+        n = stack.pop()
+        for d in targets[offsets[n]:offsets[n + 1]]:
+            if not visited[d]:
+                visited[d] = 1
+                stack.append(d)
+    return visited
+
+
+def path_edges(graph, transposed, sources, targets):
+    '''Ids of edges lying on any path from `sources` to `targets`.
+
+    `transposed` is `graph.transpose()`.  Only nodes that can reach targets
+    are visited from sources.  Edges are yielded in BFS order.
+    '''
+    allowed = reachable(transposed, targets)
+    offsets, dsts, edge_ids = graph.offsets, graph.targets, graph.edge_ids
+    visited = bytearray(len(graph))
+    frontier = []
+    for n in sorted(set(sources)):
+        if allowed[n]:
+            visited[n] = 1
+            frontier.append(n)
+    while frontier:
+        next_frontier = []
+        for n in frontier:
+            lo, hi = offsets[n], offsets[n + 1]
+            for d, e in zip(dsts[lo:hi], edge_ids[lo:hi]):
+                if not allowed[d]:
+                    continue
+                yield e
+                if not visited[d]:
+                    visited[d] = 1
+                    next_frontier.append(d)
+        frontier = next_frontier
+
+
+def shortest_path_edges(graph, transposed, sources, targets):
+    '''Ids of edges lying on shortest paths from `sources` to `targets`.
+
+    The distance is between the node sets: the length of the shortest path
+    from any source to any target.  Bidirectional BFS expands the cheaper
+    side until searches meet, so only nodes closer to sources or targets
+    than half of the distance are visited.  `transposed` is
+    `graph.transpose()`.  Edges are yielded ordered by position on paths.
+    '''
+    forward = {n: 0 for n in sources}
+    backward = {n: 0 for n in targets}
+    if not forward or not backward or any(n in backward for n in forward):
+        return []
+    searches = [(graph, forward, list(forward)), (transposed, backward, list(backward))]
+    meet = []
+    while not meet:
+        costs = [frontier_cost(g, frontier) for g, _, frontier in searches]
+        side = 0 if costs[0] <= costs[1] else 1
+        g, dist, frontier = searches[side]
+        other = searches[1 - side][1]
+        next_frontier = []
+        depth = dist[frontier[0]] + 1
+        offsets, dsts = g.offsets, g.targets
+        for n in frontier:
+            for d in dsts[offsets[n]:offsets[n + 1]]:
+                if d not in dist:
+                    dist[d] = depth
+                    next_frontier.append(d)
+                    if d in other:
+                        meet.append(d)
+        if not next_frontier:
+            return []
+        searches[side] = (g, dist, next_frontier)
+
+    # Every shortest path passes through exactly one node of `meet`.  Trace
+    # paths back to sources and forward to targets from there.
+    head = list(trace_levels(transposed, forward, meet))
+    head.reverse()
+    result = [e for level in head for e in level]
+    for level in trace_levels(graph, backward, meet):
+        result.extend(level)
+    return result
+
+
+def frontier_cost(graph, frontier):
+    offsets = graph.offsets
+    return sum(offsets[n + 1] - offsets[n] for n in frontier)
+
+
+def trace_levels(graph, dist, nodes):
+    '''Yields edge ids level by level going from `nodes` to nodes with
+    decreasing `dist`.'''
+    current = nodes
+    while current and dist[current[0]] > 0:
+        level = []
+        next_nodes = []
+        seen = set()
+        for n in current:
+            want = dist[n] - 1
+            for d, e in graph.successors(n):
+                if dist.get(d) == want:
+                    level.append(e)
+                    if d not in seen:
+                        seen.add(d)
+                        next_nodes.append(d)
+        yield level
+        current = next_nodes
+
+
+def sinks(graph):
+    '''Ids of nodes with incoming edges and without outgoing ones.'''
+    in_degrees = graph.in_degrees()
+    return [
+        i for i in range(len(graph))
+        if in_degrees[i] > 0 and graph.out_degree(i) == 0
+    ]
+
+
+def strongly_connected_components(graph):
+    '''Iterative Tarjan's algorithm over a frozen graph.
+
+    Returns (count, components): `components[node_id]` is the component id
+    of the node.  Component ids are in topological order of the condensed
+    graph: edges between components go from lower ids to higher ones.
+    '''
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    index = array.array(ID_TYPE, [-1]) * n
+    low = id_array(n)
+    components = array.array(ID_TYPE, [-1]) * n
+    on_stack = bytearray(n)
+    stack = []
+    counter = 0
+    count = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        # Explicit call stack of (node, position of the next edge to visit).
+        work = [(root, offsets[root])]
+        while work:
+            v, pos = work[-1]
+            end = offsets[v + 1]
+            while pos < end:
+                w = targets[pos]
+                pos += 1
+                if index[w] == -1:
+                    work[-1] = (v, pos)
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = 1
+                    work.append((w, offsets[w]))
+                    break
+                if on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                work.pop()
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        components[w] = count
+                        if w == v:
+                            break
+                    count += 1
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+    # Tarjan completes components in reverse topological order.
+    for i in range(n):
+        components[i] = count - 1 - components[i]
+    return count, components
+
+
+def topological_levels(graph):
+    '''Kahn's algorithm over a frozen graph.
+
+    Returns a list of levels, each a list of node ids.  Level 0 has nodes
+    without incoming edges, a node is on the level after its farthest
+    predecessor.  Nodes on cycles or reachable from cycles are left out.
+    '''
+    offsets, targets = graph.offsets, graph.targets
+    in_degrees = graph.in_degrees()
+    frontier = [i for i in range(len(graph)) if in_degrees[i] == 0]
+    levels = []
+    while frontier:
+        levels.append(frontier)
+        next_frontier = []
+        for v in frontier:
+            for w in targets[offsets[v]:offsets[v + 1]]:
+                in_degrees[w] -= 1
+                if in_degrees[w] == 0:
+                    next_frontier.append(w)
+        frontier = next_frontier
+    return levels
@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Compact hash table of row keys.
+
+Keys are stored as 128-bit BLAKE2b digests in flat arrays with open
+addressing, and as encoded bytes in one bytearray.  Digests make lookups
+fast, on a digest match the encoded key is compared too, so equal digests of
+different keys can't merge them.
+"""
+
+import array
+import hashlib
+import logging
+import pickle
+
+from sgmt import spill
+
+
+_logger = logging.getLogger(__name__)
+
+
+EMPTY = -1
+MASK = (1 << 64) - 1
+INITIAL_CAPACITY = 1024
+MAX_LOAD = 0.7
+
+
+def encode_key(key):
+    '''Bytes of a key tuple, different for different keys.'''
+    try:
+        data = '\0'.join(key)
+    except TypeError:
+        data = None
+    if data is None or data.count('\0') != len(key) - 1:
+        # Values with NULs or not strings.  Pickle data starts with 0x80,
+        # which can't follow 0x01 in UTF-8.
+        return b'\1' + pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+    return data.encode('utf-8', 'surrogatepass')
+
+
+def key_digest(data):
+    '''128-bit digest of encoded key as a pair of 64-bit integers.'''
+    d = int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), 'little')
+    return d & MASK, d >> 64
+
+
+class RecordStore(object):
+    '''Append-only list of pickled objects in one bytearray.'''
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array.array('Q', [0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append_bytes(self, data):
+        self.data += data
+        self.offsets.append(len(self.data))
+        return len(self.offsets) - 2
+
+    def append(self, obj):
+        return self.append_bytes(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_bytes(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getitem__(self, index):
+        return pickle.loads(self.get_bytes(index))
+
+
+class KeyTable(object):
+    '''Set of keys numbered with dense ids in order of addition.'''
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.keys = RecordStore()
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.mask = capacity - 1
+        self.lo = array.array('Q', bytes(8 * capacity))
+        self.hi = array.array('Q', bytes(8 * capacity))
+        self.ids = array.array('q', [EMPTY]) * capacity
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, data, lo, hi):
+        '''Slot of encoded key, or of the empty slot where it should be added.'''
+        ids, lo_a, hi_a, mask = self.ids, self.lo, self.hi, self.mask
+        slot = lo & mask
+        while True:
+            key_id = ids[slot]
+            if key_id == EMPTY:
+                return slot
+            if lo_a[slot] == lo and hi_a[slot] == hi and self.keys.get_bytes(key_id) == data:
+                return slot
+            slot = (slot + 1) & mask
+
+    def get(self, key):
+        '''Id of `key`, or None.'''
+        data = encode_key(key)
+        key_id = self.ids[self.find(data, *key_digest(data))]
+        return None if key_id == EMPTY else key_id
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def add(self, key):
+        '''Returns (id of `key`, True if it's a new key).'''
+        data = encode_key(key)
+        lo, hi = key_digest(data)
+        slot = self.find(data, lo, hi)
+        key_id = self.ids[slot]
+        if key_id != EMPTY:
+            return key_id, False
+        key_id = self.keys.append_bytes(data)
+        self.lo[slot], self.hi[slot], self.ids[slot] = lo, hi, key_id
+        if len(self.keys) > MAX_LOAD * len(self.ids):
+            self.grow()
+        return key_id, True
+
+    def grow(self):
+        lo_a, hi_a, ids = self.lo, self.hi, self.ids
+        self.allocate(2 * len(ids))
+        mask = self.mask
+        for lo, hi, key_id in zip(lo_a, hi_a, ids):
+            if key_id == EMPTY:
+                continue
+            slot = lo & mask
+            while self.ids[slot] != EMPTY:
+                slot = (slot + 1) & mask
+            self.lo[slot], self.hi[slot], self.ids[slot] = lo, hi, key_id
+
+
+class RowTable(object):
+    '''Rows by key, with rows serialized in a `RecordStore`.
+
+    Keys get dense ids in order of addition.  A row added with a known key
+    replaces the row of that key.
+    '''
+
+    def __init__(self):
+        self.codec = spill.RowCodec()
+        self.records = RecordStore()
+        self.record_ids = array.array('q')
+        self.keys = KeyTable()
+
+    def __len__(self):
+        return len(self.record_ids)
+
+    def row(self, key_id):
+        return self.codec.decode(self.records[self.record_ids[key_id]])
+
+    def get(self, key):
+        '''Id of `key`, or None.'''
+        return self.keys.get(key)
+
+    def add(self, key, row):
+        '''Adds or replaces the row of `key`.  Returns (key id, True if the key is new).'''
+        record_id = self.records.append(self.codec.encode(row))
+        key_id, new = self.keys.add(key)
+        if new:
+            self.record_ids.append(record_id)
+        else:
+            self.record_ids[key_id] = record_id
+        return key_id, new
+
+    def add_new(self, key, row):
+        '''Adds the row if `key` is new.  Returns (key id, True if the key is new).'''
+        key_id, new = self.keys.add(key)
+        if new:
+            self.record_ids.append(self.records.append(self.codec.encode(row)))
+        return key_id, new
+
+    def rows(self, key_ids):
+        return (self.row(i) for i in key_ids)
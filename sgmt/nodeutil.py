@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 # -*- mode: python; coding: utf-8 -*-
 
-import csv
+import collections
 import re
 
 from sgmt import common
@@ -24,7 +24,7 @@ class PatternsMixin(csvutil.Base):
         parser.add_argument(
             '--nodes-dialect',
             metavar='DIALECT',
-            choices=csv.list_dialects(),
+            choices=csvutil.list_input_dialects(),
             default='default',
             help='CSV dialect for nodes file',
         )
@@ -46,13 +46,17 @@ class PatternsMixin(csvutil.Base):
         return result
     set_nodes = get_nodes.set
 
+    def prepare_worker(self, clone):
+        super().prepare_worker(clone)
+        clone.set_nodes(self.get_nodes())
+
     @common.lazy
     def nodes_re(self):
         return re_contains(self.get_nodes())
 
     @common.lazy
     def nodes_match_func(self):
-        return self.nodes_re().search
+        return Matcher(self.get_nodes())
 
 
 def re_contains(strings):
@@ -71,6 +75,138 @@ def re_contains(strings):
             ')')
 
 
+WORD_RE = re.compile(r'\w+')
+
+
+def is_word_char(c):
+    return c.isalnum() or c == '_'
+
+
+class Matcher(object):
+    '''Tests if a string contains any of node patterns.
+
+    Has the same semantics as `re_contains(patterns).search`, but picks a
+    strategy by pattern shape:
+
+        - "^name^" with `name` made of word characters matches whole words
+          only, so it's a set lookup of words of the string;
+
+        - other patterns are found with Aho-Corasick automaton, word boundary
+          anchors are checked for each occurrence;
+
+        - degenerate patterns (empty after anchors stripping) fall back to a
+          regular expression.
+    '''
+
+    def __init__(self, patterns):
+        self.words = set()
+        self.automaton = AhoCorasick()
+        rest = []
+        patterns = list(patterns)
+        if not patterns:
+            # Empty alternation matches everything.
+            rest.append('')
+        for p in patterns:
+            s, af = strip_prefix(ANCHOR, p)
+            s, ab = strip_suffix(ANCHOR, s)
+            if not s:
+                rest.append(p)
+            elif af and ab and WORD_RE.fullmatch(s):
+                self.words.add(s)
+            else:
+                self.automaton.add(s, (len(s), af, ab))
+        self.automaton.build()
+        self.rest_re = re_contains(rest) if rest else None
+
+    def __call__(self, s):
+        if self.words and not self.words.isdisjoint(WORD_RE.findall(s)):
+            return True
+        for end, (length, af, ab) in self.automaton.iter_matches(s):
+            start = end - length
+            if af and not at_word_boundary(s, start):
+                continue
+            if ab and not at_word_boundary(s, end):
+                continue
+            return True
+        if self.rest_re is not None and self.rest_re.search(s):
+            return True
+        return False
+
+
+def exact_names(patterns):
+    '''Node names for patterns with anchors stripped.'''
+    result = set()
+    for p in patterns:
+        s, _ = strip_prefix(ANCHOR, p)
+        s, _ = strip_suffix(ANCHOR, s)
+        if s:
+            result.add(s)
+    return result
+
+
+def at_word_boundary(s, i):
+    before = i > 0 and is_word_char(s[i - 1])
+    after = i < len(s) and is_word_char(s[i])
+    return before != after
+
+
+class AhoCorasick(object):
+    '''Aho-Corasick automaton over a set of strings.'''
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        # Nearest state by failure links with non-empty output.
+        self.out_link = [0]
+
+    def __bool__(self):
+        return len(self.goto) > 1
+
+    def add(self, s, value):
+        state = 0
+        for c in s:
+            nxt = self.goto[state].get(c)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][c] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.out_link.append(0)
+            state = nxt
+        self.out[state].append(value)
+
+    def build(self):
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(c, 0)
+                self.fail[nxt] = f
+                self.out_link[nxt] = f if self.out[f] else self.out_link[f]
+
+    def iter_matches(self, s):
+        '''Yields (end, value) for every occurrence, `end` is exclusive.'''
+        if not self:
+            return
+        goto, fail, out, out_link = self.goto, self.fail, self.out, self.out_link
+        state = 0
+        for i, c in enumerate(s, 1):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            o = state
+            while o:
+                for value in out[o]:
+                    yield i, value
+                o = out_link[o]
+
+
 def strip_suffix(suffix, s):
     if s.endswith(suffix):
         return s[:len(s)-len(suffix)], True
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Parallel parsing of input files in worker processes.
+
+Input files (or chunks of large files split on line boundaries) are parsed
+by a process pool.  Workers return rows of a part in input order, the parent
+fixes @frn/@rn numbering, so rows look the same as read sequentially.  Parts
+larger than a batch are passed through a temporary file in batches, so
+neither a worker nor the parent holds a whole part in memory.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import io
+import itertools
+import logging
+import os
+import pickle
+import tempfile
+
+from sgmt import columnar
+from sgmt import common
+from sgmt import compression
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+Task = collections.namedtuple('Task', 'filename fn start end fieldnames dialect')
+
+BATCH_ROWS = 4096
+
+
+def iter_rows(cmd, local=False):
+    '''Yields rows of `cmd` inputs parsed in `cmd.flags.jobs` processes.
+
+    With `local` workers also run `cmd.process_local` on their part of input.
+    Standard input is parsed in the current process.
+    '''
+    tasks = iter(make_tasks(cmd))
+    pending = collections.deque()
+    try:
+        yield from iter_results(cmd, local, tasks, pending)
+    finally:
+        # Results of parts that were not read.
+        for _, future in pending:
+            if future is not None and not future.cancel() and future.exception() is None:
+                discard_result(future.result())
+
+
+def iter_results(cmd, local, tasks, pending):
+    jobs = cmd.flags.jobs
+    st = cmd.stats()
+    with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(cmd.worker_clone(),)) as pool:
+        def submit():
+            while len(pending) < 2 * jobs:
+                task = next(tasks, None)
+                if task is None:
+                    return
+                if task.filename == '-':
+                    pending.append((task, None))
+                else:
+                    pending.append((task, pool.submit(run_task, task, local)))
+
+        rn_base = 0
+        frn_bases = collections.Counter()
+        submit()
+        while pending:
+            task, future = pending.popleft()
+            submit()
+            if future is None:
+                counter = [0]
+                rows = iter_task(cmd, task, local, counter)
+            else:
+                counter, rows, filename = future.result()
+                if filename is not None:
+                    rows = read_batches(filename)
+            try:
+                for r in rows:
+                    yield renumber(r, rn_base, frn_bases[task.fn])
+            finally:
+                if hasattr(rows, 'close'):
+                    rows.close()
+            # Standard input is read here and counted by `csv_file_reader`.
+            first = task.fn not in frn_bases
+            st.count_in(counter[0], 0 if future is None else task_size(task, first))
+            rn_base += counter[0]
+            frn_bases[task.fn] += counter[0]
+
+
+def task_size(task, first):
+    '''Bytes of the input file read by `task`, with the header for the `first` chunk.'''
+    if task.start is None:
+        return os.path.getsize(task.filename)
+    return task.end if first else task.end - task.start
+
+
+def make_tasks(cmd):
+    input_list = cmd.flags.input or ['-']
+    chunk_size = common.parse_size(cmd.flags.chunk_size) if cmd.flags.chunk_size else None
+    for fn, filename in enumerate(input_list):
+        if filename == '-' or columnar.is_columnar_file(filename):
+            yield Task(filename, fn, None, None, None, cmd.flags.input_dialect)
+            continue
+        # Detect dialect once here, not in every worker.
+        dialect = cmd.file_dialect(filename, cmd.flags.input_dialect)
+        # Compressed files can't be split at byte offsets.
+        if not chunk_size or os.path.getsize(filename) < 2 * chunk_size or compression.is_compressed(filename):
+            yield Task(filename, fn, None, None, None, dialect)
+            continue
+        yield from split_file(filename, fn, chunk_size, dialect)
+
+
+def split_file(filename, fn, chunk_size, dialect):
+    with open(filename, 'rb') as f:
+        fieldnames = next(csv.reader(read_lines(f), dialect=dialect), [])
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        while start < size:
+            f.seek(start + chunk_size)
+            f.readline()
+            end = min(f.tell(), size)
+            yield Task(filename, fn, start, end, fieldnames, dialect)
+            start = end
+
+
+def read_lines(f):
+    '''Decoded lines of a binary file, read one by one without read-ahead.'''
+    while True:
+        line = f.readline()
+        if not line:
+            return
+        yield line.decode(common.ENCODING)
+
+
+def renumber(r, rn_base, frn_base):
+    '''Turns @rn/@frn of a row local to its part into global ones.'''
+    if type(r) is csvutil.TupleRow:
+        if r.rn is not None and r.header.fn is not None:
+            r.rn += rn_base
+            r.header.rn_start = rn_base - frn_base
+    elif isinstance(r, dict):
+        if isinstance(r.get('@rn'), int):
+            r['@rn'] += rn_base
+        if isinstance(r.get('@frn'), int):
+            r['@frn'] += frn_base
+    return r
+
+
+_worker_cmd = None
+
+
+def init_worker(cmd):
+    global _worker_cmd
+    _worker_cmd = cmd
+
+
+def run_task(task, local):
+    '''Returns (counter, rows, None), or (counter, [], filename) with rows in batches in a temporary file.'''
+    counter = [0]
+    rows = iter_task(_worker_cmd, task, local, counter)
+    batch = list(itertools.islice(rows, BATCH_ROWS))
+    if len(batch) < BATCH_ROWS:
+        return counter, batch, None
+    fd, filename = tempfile.mkstemp(prefix='sgmt-', suffix='.rows', dir=getattr(_worker_cmd.flags, 'spill_dir', None))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while batch:
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                batch = list(itertools.islice(rows, BATCH_ROWS))
+    except BaseException:
+        os.unlink(filename)
+        raise
+    return counter, [], filename
+
+
+def read_batches(filename):
+    '''Rows of a temporary file written by `run_task`, the file is removed after reading.'''
+    try:
+        with open(filename, 'rb') as f:
+            while True:
+                try:
+                    batch = pickle.load(f)
+                except EOFError:
+                    return
+                yield from batch
+    finally:
+        os.unlink(filename)
+
+
+def discard_result(result):
+    _, _, filename = result
+    if filename is not None:
+        os.unlink(filename)
+
+
+def iter_task(cmd, task, local, counter):
+    with open_task(cmd, task) as reader:
+        rows = (cmd.preprocess_input(r) for r in counted(reader, counter))
+        if local:
+            rows = cmd.process_local(rows)
+        yield from rows
+
+
+def counted(rows, counter):
+    for r in rows:
+        counter[0] += 1
+        yield r
+
+
+@contextlib.contextmanager
+def open_task(cmd, task):
+    if task.start is None:
+        with cmd.csv_file_reader(filename=task.filename, dialect=task.dialect, fn=task.fn, tuples=cmd.TUPLE_ROWS) as reader:
+            yield reader
+        return
+    with open(task.filename, 'rb') as f:
+        f.seek(task.start)
+        data = f.read(task.end - task.start)
+    f = io.StringIO(data.decode(common.ENCODING), newline='')
+    reader_type = csvutil.TupleReader if cmd.TUPLE_ROWS else csvutil.Reader
+    yield reader_type(f, dialect=task.dialect, fn=task.fn, fieldnames=task.fieldnames)
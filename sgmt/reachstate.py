@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Persistent BFS state for incremental reachability.
+
+The state keeps the closure computed by BFS (visited nodes and reached
+edges) and edges from nodes that are not visited yet ("dormant" edges).
+New edges extend the closure: an edge from a visited node is reached, and
+when a node becomes visited its dormant edges are reached too.  So every
+edge is looked at once when it is added and once when it is reached.
+
+Dormant edges are kept in an SQLite database next to the state file,
+indexed by source node, so a run only reads dormant edges of nodes it
+visits and only writes its new dormant edges.
+"""
+
+import collections
+import logging
+import os
+import pickle
+import sqlite3
+
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+VERSION = 2
+DORMANT_SUFFIX = '.dormant'
+
+
+class StateMismatchError(Exception):
+    '''State was built with other seeds or columns.'''
+
+
+def dormant_filename(filename):
+    return filename + DORMANT_SUFFIX
+
+
+class DormantStore(object):
+    '''Dormant edges by source node, in memory by default.'''
+
+    def __init__(self, filename=':memory:', new=False):
+        if new and os.path.exists(filename):
+            os.unlink(filename)
+        self.db = sqlite3.connect(filename)
+        self.db.execute('CREATE TABLE IF NOT EXISTS dormant (src TEXT, dst TEXT, edge BLOB, PRIMARY KEY (src, dst))')
+        self.popped = []
+
+    def add(self, edges):
+        '''Adds (src, dst, values) edges, replacing earlier edges between the same nodes.'''
+        self.db.executemany(
+            'INSERT OR REPLACE INTO dormant VALUES (?, ?, ?)',
+            ((src, dst, pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)) for src, dst, v in edges),
+        )
+        self.db.commit()
+
+    def pop(self, src):
+        '''Returns {dst: values} of edges from `src`.  They are deleted by `drop_popped`.'''
+        self.popped.append(src)
+        return {dst: pickle.loads(v) for dst, v in self.db.execute('SELECT dst, edge FROM dormant WHERE src = ?', (src,))}
+
+    def drop_popped(self):
+        self.db.executemany('DELETE FROM dormant WHERE src = ?', ((src,) for src in self.popped))
+        self.db.commit()
+        self.popped = []
+
+    def close(self):
+        self.db.close()
+
+
+class State(object):
+    '''Reachability closure of seeds.
+
+    Edges are kept as tuples of values of `fieldnames` columns and keyed by
+    (src, dst) names.  Like `graphstore.Graph`, a later edge between the same
+    nodes replaces the earlier one.  Dormant edges are in `DormantStore`,
+    which is not pickled with the state.
+    '''
+
+    def __init__(self, signature, fieldnames, src, dst, dormant=None):
+        self.signature = signature
+        self.fieldnames = list(fieldnames)
+        self.src = src
+        self.dst = dst
+        self.visited = set()
+        self.edges = {}
+        self.dormant = DormantStore() if dormant is None else dormant
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['dormant']
+        return state
+
+    @classmethod
+    def load(cls, filename, signature):
+        with open(filename, 'rb') as f:
+            version, state = pickle.load(f)
+        if version != VERSION:
+            raise StateMismatchError('{}: unsupported state version {}'.format(filename, version))
+        if state.signature != signature:
+            raise StateMismatchError('{}: state was built with other seeds or options'.format(filename))
+        state.dormant = DormantStore(dormant_filename(filename))
+        return state
+
+    def save(self, filename):
+        '''Saves the state.  New dormant edges are already saved by `extend`.'''
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump((VERSION, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+        # Reached dormant edges are deleted only now, so that the saved state
+        # never misses them.  If this fails, they are just never read again.
+        self.dormant.drop_popped()
+
+    def close(self):
+        self.dormant.close()
+
+    @classmethod
+    def from_graph(cls, graph, signature, fieldnames, seeds, edge_ids, dormant=None):
+        '''State after BFS over `graph` from `seeds` reached `edge_ids`.'''
+        state = cls(signature, fieldnames, graph.src, graph.dst, dormant=dormant)
+        name = graph.nodes.name
+        values = csvutil.ColumnGetter(state.fieldnames)
+        state.visited.update(name(n) for n in seeds)
+        for e in edge_ids:
+            state.edges[(name(graph.edge_srcs[e]), name(graph.edge_dsts[e]))] = values(graph.edge_row(e))
+            state.visited.add(name(graph.edge_dsts[e]))
+        state.dormant.add(
+            (name(s), name(d), values(graph.edge_row(e)))
+            for s in range(len(graph)) if name(s) not in state.visited
+            for d, e in graph.successors(s)
+        )
+        return state
+
+    def extend(self, rows, is_src):
+        '''Adds edges.  Returns a list of ((src, dst), values) of reached edges.'''
+        values = csvutil.ColumnGetter(self.fieldnames)
+        reached = []
+        queue = collections.deque()
+        # New dormant edges, written to the store at the end.
+        dormant = {}
+
+        def reach(src, dst, v):
+            self.edges[(src, dst)] = v
+            reached.append(((src, dst), v))
+            if dst not in self.visited:
+                self.visited.add(dst)
+                queue.append(dst)
+
+        for r in rows:
+            src, dst = r[self.src], r[self.dst]
+            if src not in self.visited and is_src(src):
+                self.visited.add(src)
+                queue.append(src)
+            if src in self.visited:
+                reach(src, dst, values(r))
+            else:
+                dormant.setdefault(src, {})[dst] = values(r)
+            while queue:
+                n = queue.popleft()
+                edges = self.dormant.pop(n)
+                edges.update(dormant.pop(n, {}))
+                for dst, v in edges.items():
+                    reach(n, dst, v)
+        self.dormant.add((src, dst, v) for src, edges in dormant.items() for dst, v in edges.items())
+        return reached
+
+    def rows(self, edges):
+        header = csvutil.Header(self.fieldnames)
+        for _, v in edges:
+            yield csvutil.TupleRow(header, v)
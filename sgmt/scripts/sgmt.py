@@ -7,8 +7,12 @@ from dsapy import app
 from dsapy import flag
 
 import sgmt
+import sgmt.cmd.agg
 import sgmt.cmd.cat
+import sgmt.cmd.gen
 import sgmt.cmd.graph_ops
+import sgmt.cmd.join
+import sgmt.cmd.pipe
 import sgmt.cmd.set_ops
 
 
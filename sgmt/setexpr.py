@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Set expressions over inputs.
+
+An expression like "(a & b) - c | d" is parsed with Python syntax, so the
+operator precedence is Python's: "-" binds tighter than "&", then "^", then
+"|".  Supported operators are "&" (intersection), "|" (union), "-"
+(difference), "^" (symmetric difference) and "~" (complement, keys of other
+inputs).  The expression is evaluated for a key by its membership mask,
+where bit N is set if the key is in input N.
+"""
+
+import ast
+import logging
+import string
+
+
+_logger = logging.getLogger(__name__)
+
+
+BINARY = {
+    ast.BitAnd: lambda x, y: x and y,
+    ast.BitOr: lambda x, y: x or y,
+    ast.BitXor: lambda x, y: x != y,
+    ast.Sub: lambda x, y: x and not y,
+}
+
+
+class ExprError(ValueError):
+    '''Invalid set expression.'''
+
+
+def default_aliases(count):
+    if count > len(string.ascii_lowercase):
+        raise ExprError('Too many inputs for default aliases, name them with --aliases')
+    return list(string.ascii_lowercase[:count])
+
+
+class SetExpr(object):
+    def __init__(self, text, aliases):
+        self.text = text
+        self.aliases = list(aliases)
+        if len(set(self.aliases)) != len(self.aliases):
+            raise ExprError('Duplicate input aliases: {}'.format(','.join(self.aliases)))
+        try:
+            tree = ast.parse(text.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ExprError('Invalid set expression {!r}: {}'.format(text, e.msg))
+        self.func = self.build(tree.body)
+        self.cache = {}
+
+    def build(self, node):
+        if isinstance(node, ast.Name):
+            if node.id not in self.aliases:
+                raise ExprError('Unknown input {!r} in set expression, inputs are: {}'.format(
+                    node.id, ', '.join(self.aliases)))
+            bit = 1 << self.aliases.index(node.id)
+            return lambda mask: bool(mask & bit)
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY:
+            op, left, right = BINARY[type(node.op)], self.build(node.left), self.build(node.right)
+            return lambda mask: op(left(mask), right(mask))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+            operand = self.build(node.operand)
+            return lambda mask: not operand(mask)
+        raise ExprError('Unsupported {} in set expression {!r}'.format(type(node).__name__, self.text))
+
+    def __call__(self, mask):
+        '''True if a key in inputs of `mask` is in the result.'''
+        result = self.cache.get(mask)
+        if result is None:
+            result = self.cache[mask] = self.func(mask)
+        return result
@@ -0,0 +1,305 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Fixed memory sketches of key sets: Bloom filters, HyperLogLog, distinct
+samples and top keys by count.
+
+Keys are hashed with BLAKE2b, so results are the same in every run and
+sketches built in different processes can be compared.
+"""
+
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import operator
+
+from sgmt import common
+from sgmt import keytable
+
+
+_logger = logging.getLogger(__name__)
+
+
+DEFAULT_PRECISION = 14
+DEFAULT_CAPACITY = '10M'
+DEFAULT_ERROR_RATE = 0.01
+
+
+def key_hash(key):
+    '''64-bit BLAKE2b digest of a key tuple or a string.'''
+    if type(key) is str:
+        key = (key,)
+    return int.from_bytes(hashlib.blake2b(keytable.encode_key(key), digest_size=8).digest(), 'little')
+
+
+class SketchMixin(object):
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--precision',
+            type=int,
+            default=DEFAULT_PRECISION,
+            help='HyperLogLog precision: 2^PRECISION registers, standard error is 1.04/sqrt(2^PRECISION)',
+        )
+        parser.add_argument(
+            '--bloom-capacity',
+            default=DEFAULT_CAPACITY,
+            help='Expected number of keys per Bloom filter, like 10M',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=DEFAULT_ERROR_RATE,
+            help='False positive rate of Bloom filters at --bloom-capacity keys',
+        )
+
+    def hyperloglog(self):
+        return HyperLogLog(getattr(self.flags, 'precision', DEFAULT_PRECISION))
+
+    def bloom_filter(self):
+        return BloomFilter(
+            common.parse_size(getattr(self.flags, 'bloom_capacity', DEFAULT_CAPACITY)),
+            getattr(self.flags, 'error_rate', DEFAULT_ERROR_RATE),
+        )
+
+
+class BloomFilter(object):
+    '''Set of keys with false positives and fixed size.'''
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        if not 0 < error_rate < 1:
+            raise ValueError('Bloom filter error rate must be between 0 and 1')
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, h):
+        # Double hashing: i-th position is h1 + i * h2.
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def add(self, key):
+        bits = self.bits
+        for p in self.positions(key_hash(key)):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for p in self.positions(key_hash(key)):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+class HyperLogLog(object):
+    '''Cardinality estimate of a key set with relative error 1.04/sqrt(2^precision).'''
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError('HyperLogLog precision must be from 4 to 18')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key):
+        h = key_hash(key)
+        p = self.precision
+        index = h >> (64 - p)
+        rank = 64 - p - (h & ((1 << (64 - p)) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        '''Sketch of the union of both sets.'''
+        if other.precision != self.precision:
+            raise ValueError('Can not merge HyperLogLog sketches of different precision')
+        result = HyperLogLog(self.precision)
+        result.registers = bytearray(map(max, self.registers, other.registers))
+        return result
+
+    def count(self):
+        '''Improved raw estimate by O. Ertl, it needs no bias correction for small sets.'''
+        m = len(self.registers)
+        q = 64 - self.precision
+        histogram = [0] * (q + 2)
+        for r in self.registers:
+            histogram[r] += 1
+        if histogram[0] == m:
+            return 0.0
+        z = m * ertl_tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * ertl_sigma(histogram[0] / m)
+        return m * m / (2 * math.log(2) * z)
+
+
+class DistinctSample(object):
+    '''Bounded sample of distinct keys with a value per key.
+
+    Adaptive distinct sampling by P. Gibbons: a key is sampled if its hash
+    starts with `level` zero bits, so every distinct key is sampled with
+    probability 2^-level together with all its occurrences.  The level grows
+    while more than `capacity` keys are sampled.  Until then the sample holds
+    all keys.
+    '''
+
+    def __init__(self, capacity, factory, on_shrink=None, hash=key_hash):
+        self.capacity = max(capacity, 1)
+        self.factory = factory
+        # 64-bit hash of a key, identity for keys which are hashes already.
+        self.hash = hash
+        # Called with the sample before keys are dropped.
+        self.on_shrink = on_shrink
+        self.level = 0
+        self.items = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def rate(self):
+        return 0.5 ** self.level
+
+    def estimate(self, count):
+        '''Count of all keys with a property from `count` of sampled ones.'''
+        return round(count * 2 ** self.level)
+
+    def get(self, key):
+        '''Value of `key`, new for a key not seen yet, or None if the key is not sampled.'''
+        value = self.items.get(key)
+        if value is not None:
+            return value
+        if self.level and self.hash(key) >> (64 - self.level):
+            return None
+        value = self.items[key] = self.factory()
+        if len(self.items) > self.capacity:
+            self.shrink()
+            return self.items.get(key)
+        return value
+
+    def shrink(self):
+        # Keys are deleted in place, so callers may keep a reference to `items`.
+        if self.on_shrink is not None:
+            self.on_shrink(self)
+        items = self.items
+        while len(items) > self.capacity:
+            self.level += 1
+            shift = 64 - self.level
+            hash = self.hash
+            for key in [k for k in items if hash(k) >> shift]:
+                del items[key]
+        _logger.debug('Sampling rate is lowered to 2^-%d', self.level)
+
+
+class SpaceSaving(object):
+    '''Top keys by count with bounded memory.
+
+    Space-Saving by A. Metwally et al.: counts of at most `capacity` keys
+    are kept, a new key replaces the key with the smallest count and starts
+    from that count.  So counts are overestimated by at most the smallest
+    count, and keys with larger counts are never dropped.  Initial `counts`
+    must be the largest counts of all keys seen so far.
+    '''
+
+    def __init__(self, capacity, counts=()):
+        self.capacity = max(capacity, 1)
+        self.counts = dict(counts)
+        # Count inherited by a key when it was added.
+        self.errors = {}
+        # One entry per kept key, counts in entries may be behind.
+        self.seq = itertools.count()
+        self.heap = [(c, next(self.seq), k) for k, c in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, key, count=1):
+        counts = self.counts
+        c = counts.get(key)
+        if c is not None:
+            counts[key] = c + count
+            return
+        heap = self.heap
+        if len(counts) < self.capacity:
+            counts[key] = count
+            heapq.heappush(heap, (count, next(self.seq), key))
+            return
+        while True:
+            c, _, smallest = heap[0]
+            actual = counts[smallest]
+            if actual == c:
+                break
+            heapq.heapreplace(heap, (actual, next(self.seq), smallest))
+        del counts[smallest]
+        self.errors.pop(smallest, None)
+        counts[key] = c + count
+        self.errors[key] = c
+        heapq.heapreplace(heap, (c + count, next(self.seq), key))
+
+    def top(self, n):
+        '''List of (key, count) of `n` keys with largest counts.
+
+        Counts are lower bounds: counts since the key was added, exact for
+        keys kept since they were first seen.
+        '''
+        errors = self.errors
+        top = heapq.nlargest(n, self.counts.items(), key=operator.itemgetter(1))
+        return [(k, c - errors.get(k, 0)) for k, c in top]
+
+
+def ertl_sigma(x):
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        prev, z = z, z + x * y
+        y += y
+        if z == prev:
+            return z
+
+
+def ertl_tau(x):
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        y *= 0.5
+        prev, z = z, z - (1 - x) ** 2 * y
+        if z == prev:
+            return z / 3
+
+
+def union(sketches):
+    '''HyperLogLog sketch of the union of sets.'''
+    result = sketches[0]
+    for s in sketches[1:]:
+        result = result.merge(s)
+    return result
+
+
+def compare(a, b):
+    '''Estimates of pairwise statistics of two HyperLogLog sketches.
+
+    Intersection is found by inclusion-exclusion, so its error is relative to
+    the union size.
+    '''
+    a_count, b_count = a.count(), b.count()
+    union_count = a.merge(b).count()
+    intersection = min(max(a_count + b_count - union_count, 0.0), a_count, b_count)
+    return common.Struct(
+        left=a_count,
+        right=b_count,
+        union=union_count,
+        intersection=intersection,
+        jaccard=intersection / union_count if union_count else 0.0,
+        left_in_right=intersection / a_count if a_count else 0.0,
+        right_in_left=intersection / b_count if b_count else 0.0,
+    )
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Lookups in CSV files sorted by a key column.
+
+Rows with a given key are found with binary search over byte offsets, so
+only a few blocks of the file are read per lookup.  The file must be sorted
+by the key column values in code point order (which is the order of
+`LC_ALL=C sort` for unquoted values), and values must not contain newlines.
+"""
+
+import csv
+import logging
+import os
+
+from sgmt import common
+from sgmt import compression
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+class SortedFile(object):
+    def __init__(self, filename, key, dialect='default'):
+        if compression.is_compressed(filename):
+            raise ValueError('{}: compressed files can not be searched, decompress it first'.format(filename))
+        self.f = open(filename, 'rb')
+        self.dialect = dialect
+        self.fieldnames = self.parse(self.f.readline())
+        if key not in self.fieldnames:
+            self.f.close()
+            raise ValueError('{}: no column {!r}'.format(filename, key))
+        self.key_index = self.fieldnames.index(key)
+        self.header = csvutil.Header(self.fieldnames)
+        self.data_start = self.f.tell()
+        self.size = os.fstat(self.f.fileno()).st_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    def parse(self, line):
+        return next(csv.reader([line.decode(common.ENCODING)], dialect=self.dialect), [])
+
+    def key_of(self, line):
+        values = self.parse(line)
+        return values[self.key_index] if self.key_index < len(values) else ''
+
+    def line_at(self, pos):
+        '''Returns (offset, line) for the first line starting at `pos` or later.'''
+        if pos <= self.data_start:
+            self.f.seek(self.data_start)
+        else:
+            # Reading from the previous byte skips the rest of a line, or
+            # just the newline if `pos` is a line start.
+            self.f.seek(pos - 1)
+            self.f.readline()
+        return self.f.tell(), self.f.readline()
+
+    def lower_bound(self, key):
+        '''Offset of the first line with key not less than `key`.'''
+        lo, hi = self.data_start, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, line = self.line_at(mid)
+            if not line or self.key_of(line) >= key:
+                hi = mid
+            else:
+                lo = start + len(line)
+        return self.line_at(lo)[0]
+
+    def lookup(self, key):
+        '''Returns a list of `csvutil.TupleRow`s with `key`, in file order.'''
+        self.f.seek(self.lower_bound(key))
+        width = len(self.fieldnames)
+        result = []
+        for line in self.f:
+            values = self.parse(line)
+            if not values:
+                continue
+            if len(values) < width:
+                values += [''] * (width - len(values))
+            if values[self.key_index] != key:
+                break
+            result.append(csvutil.TupleRow(self.header, tuple(values)))
+        return result
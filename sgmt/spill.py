@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Hash partitioning of rows with spilling to disk."""
+
+import logging
+import os
+import pickle
+import tempfile
+
+from sgmt import common
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+DEFAULT_PARTITIONS = 64
+MAX_DEPTH = 4
+
+
+class SpillMixin(object):
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--external',
+            action='store_true',
+            help='Hash-partition inputs to temporary files when they exceed --memory-limit',
+        )
+        parser.add_argument(
+            '--memory-limit',
+            default='1G',
+            help='Memory limit for in-memory partitions, like 512M or 2G',
+        )
+        parser.add_argument(
+            '--spill-dir',
+            help='Directory for temporary files',
+        )
+
+    def partitioner(self, key):
+        return Partitioner(
+            key,
+            memory_limit=common.parse_size(self.flags.memory_limit),
+            dir=self.flags.spill_dir,
+        )
+
+
+def estimate_size(row):
+    '''Rough memory footprint of a row in bytes.'''
+    if type(row) is csvutil.TupleRow:
+        return 120 + 8 * len(row.values) + sum(map(len, row.values))
+    return 240 + sum(100 + len(str(v)) for k, v in row.items() if k != '__dict__')
+
+
+class RowCodec(object):
+    '''Pickles rows.  `TupleRow` headers are kept in memory and shared.'''
+
+    def __init__(self):
+        self.headers = []
+        self.header_ids = {}
+
+    def encode(self, row):
+        if type(row) is csvutil.TupleRow:
+            header_id = self.header_ids.get(id(row.header))
+            if header_id is None:
+                header_id = self.header_ids[id(row.header)] = len(self.headers)
+                self.headers.append(row.header)
+            return (header_id, row.values, row.rn)
+        return common.as_dict(row)
+
+    def decode(self, data):
+        if type(data) is tuple:
+            header_id, values, rn = data
+            return csvutil.TupleRow(self.headers[header_id], values, rn)
+        return csvutil.Row(data)
+
+
+class PlainCodec(object):
+    '''Codec for picklable objects which are not rows.'''
+
+    def encode(self, obj):
+        return obj
+
+    def decode(self, data):
+        return data
+
+
+class Partition(object):
+    def __init__(self, partitioner):
+        self.partitioner = partitioner
+        self.buffer = []
+        self.filename = None
+        self.spilled = 0
+
+    def spill(self):
+        if not self.buffer:
+            return
+        if self.filename is None:
+            fd, self.filename = tempfile.mkstemp(prefix='sgmt-', suffix='.spill', dir=self.partitioner.dir)
+            os.close(fd)
+        encode = self.partitioner.codec.encode
+        with open(self.filename, 'ab') as f:
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            for row in self.buffer:
+                pickler.dump(encode(row))
+                pickler.clear_memo()
+            self.spilled = f.tell()
+        self.buffer = []
+
+    def __iter__(self):
+        if self.filename is not None:
+            decode = self.partitioner.codec.decode
+            with open(self.filename, 'rb') as f:
+                while True:
+                    # Pickler memo is cleared after each row, so each row
+                    # needs an unpickler with a fresh memo.
+                    try:
+                        data = pickle.load(f)
+                    except EOFError:
+                        break
+                    yield decode(data)
+        yield from self.buffer
+
+    def close(self):
+        self.buffer = []
+        if self.filename is not None:
+            os.unlink(self.filename)
+            self.filename = None
+
+
+class Partitioner(object):
+    '''Distributes rows to partitions by hash of `key(row)`.
+
+    Rows are buffered in memory.  When the estimated size of all buffers
+    exceeds `memory_limit`, buffers are appended to temporary files.  Row
+    order is preserved within a partition.  Partitions that are still too
+    large are partitioned again with a different hash salt.
+    '''
+
+    def __init__(self, key, memory_limit, partitions=DEFAULT_PARTITIONS, dir=None, salt=0, codec=None, size=estimate_size):
+        self.key = key
+        self.memory_limit = memory_limit
+        self.dir = dir
+        self.salt = salt
+        self.codec = codec or RowCodec()
+        self.estimate_size = size
+        self.parts = [Partition(self) for _ in range(partitions)]
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def spilled(self):
+        return any(p.filename is not None for p in self.parts)
+
+    def add(self, row):
+        p = hash((self.salt, self.key(row))) % len(self.parts)
+        self.parts[p].buffer.append(row)
+        self.size += self.estimate_size(row)
+        if self.size > self.memory_limit:
+            _logger.debug('Spilling %d bytes to disk', self.size)
+            for part in self.parts:
+                part.spill()
+            self.size = 0
+
+    def partitions(self):
+        '''Yields iterables of rows, one per non-empty partition.'''
+        if not self.spilled:
+            yield from (iter(p.buffer) for p in self.parts if p.buffer)
+            return
+        for part in self.parts:
+            if part.spilled > self.memory_limit and self.salt < MAX_DEPTH:
+                with Partitioner(self.key, self.memory_limit, len(self.parts), self.dir, self.salt + 1, self.codec, self.estimate_size) as sub:
+                    for row in part:
+                        sub.add(row)
+                    part.close()
+                    yield from sub.partitions()
+            elif part.filename is not None or part.buffer:
+                yield iter(part)
+            part.close()
+
+    def close(self):
+        for part in self.parts:
+            part.close()
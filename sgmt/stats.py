@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+"""Run statistics and profiling for commands.
+
+With --stats a command reports rows and bytes read and written, time spent
+in every phase, peak memory and throughput.  Phase times are exclusive: time
+spent reading input while the algorithm pulls rows is counted as "read", not
+as "process".  With --profile the run is profiled by cProfile or tracemalloc.
+"""
+
+import contextlib
+import cProfile
+import json
+import logging
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+
+from sgmt import common
+
+
+_logger = logging.getLogger(__name__)
+
+
+PROFILERS = ('cprofile', 'tracemalloc')
+TOP_COUNT = 25
+
+
+class Stats(object):
+    '''Counters and exclusive phase timers of a command run.'''
+
+    enabled = True
+
+    def __init__(self):
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.times = {}
+        self.current = 'setup'
+        self.started = self.mark = time.perf_counter()
+
+    def switch(self, phase):
+        '''Starts `phase`, returns the previous one.'''
+        now = time.perf_counter()
+        self.times[self.current] = self.times.get(self.current, 0.0) + now - self.mark
+        self.mark = now
+        prev, self.current = self.current, phase
+        return prev
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        prev = self.switch(name)
+        try:
+            yield
+        finally:
+            self.switch(prev)
+
+    def wrap_func(self, name, f):
+        '''Wraps `f` so that its calls are timed as phase `name`.'''
+        switch = self.switch
+        def wrapper(*args, **kw):
+            prev = switch(name)
+            try:
+                return f(*args, **kw)
+            finally:
+                switch(prev)
+        return wrapper
+
+    def wrap_rows(self, name, rows, count=True):
+        '''Iterates `rows` timing it as phase `name`, with `count` also counts input rows.'''
+        switch = self.switch
+        it = iter(rows)
+        while True:
+            prev = switch(name)
+            try:
+                r = next(it)
+            except StopIteration:
+                return
+            finally:
+                switch(prev)
+            if count:
+                self.rows_in += 1
+            yield r
+
+    def wrap_writer(self, w):
+        '''Times and counts rows written by `writerow` and `write_batch` of the writer `w`.'''
+        writerow = self.wrap_func('write', w.writerow)
+        def counted(row):
+            self.rows_out += 1
+            return writerow(row)
+        w.writerow = counted
+        if hasattr(w, 'write_batch'):
+            write_batch = self.wrap_func('write', w.write_batch)
+            def counted_batch(rows):
+                self.rows_out += len(rows)
+                return write_batch(rows)
+            w.write_batch = counted_batch
+        return w
+
+    def add_bytes_in(self, f):
+        self.bytes_in += file_position(f)
+
+    def count_in(self, rows, size):
+        '''Counts input read elsewhere, like in worker processes.'''
+        self.rows_in += rows
+        self.bytes_in += size
+
+    def add_bytes_out(self, f):
+        self.bytes_out += file_position(f)
+
+    def report(self, command):
+        self.switch(self.current)
+        elapsed = time.perf_counter() - self.started
+        return {
+            'command': command,
+            'elapsed': elapsed,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'rows_per_sec': self.rows_in / elapsed if elapsed else None,
+            'peak_rss_kb': peak_rss_kb(),
+            'phases': dict(self.times),
+        }
+
+
+class NullStats(object):
+    '''Stats that collect nothing and add no overhead.'''
+
+    enabled = False
+
+    def phase(self, name):
+        return contextlib.nullcontext()
+
+    def wrap_func(self, name, f):
+        return f
+
+    def wrap_rows(self, name, rows, count=True):
+        return rows
+
+    def wrap_writer(self, w):
+        return w
+
+    def add_bytes_in(self, f):
+        pass
+
+    def count_in(self, rows, size):
+        pass
+
+    def add_bytes_out(self, f):
+        pass
+
+
+NULL_STATS = NullStats()
+
+
+def file_position(f):
+    '''Bytes read from or written to binary file `f`, 0 for pipes.'''
+    try:
+        return f.tell()
+    except (OSError, ValueError):
+        return 0
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def format_report(report):
+    lines = [
+        '{command}: {elapsed:.3f}s, {rows_in} rows in, {rows_out} rows out, '
+        '{bytes_in} bytes in, {bytes_out} bytes out, peak RSS {peak_rss_kb} KB'.format(**report),
+    ]
+    if report['rows_per_sec'] is not None:
+        lines.append('  {:.0f} rows/sec'.format(report['rows_per_sec']))
+    for name, seconds in sorted(report['phases'].items(), key=lambda x: -x[1]):
+        share = seconds / report['elapsed'] * 100 if report['elapsed'] else 0
+        lines.append('  {:<12} {:10.3f}s {:5.1f}%'.format(name, seconds, share))
+    if 'tracemalloc_peak' in report:
+        lines.append('  tracemalloc peak {} bytes'.format(report['tracemalloc_peak']))
+    return '\n'.join(lines) + '\n'
+
+
+class StatsMixin(object):
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            '--stats',
+            nargs='?',
+            const='-',
+            metavar='FILE',
+            help='Report rows, bytes, phase times and peak memory to stderr, or as JSON to FILE',
+        )
+        parser.add_argument(
+            '--profile',
+            choices=PROFILERS,
+            help='Profile the run with cProfile or tracemalloc',
+        )
+        parser.add_argument(
+            '--profile-output',
+            metavar='FILE',
+            help='Dump profile to FILE instead of printing top entries to stderr',
+        )
+
+    @common.lazy
+    def stats(self):
+        if getattr(self.flags, 'stats', None) or getattr(self.flags, 'profile', None):
+            return Stats()
+        return NULL_STATS
+
+    @contextlib.contextmanager
+    def instrumented(self):
+        '''Collects stats and profile of the enclosed run.'''
+        st = self.stats()
+        if not st.enabled:
+            yield
+            return
+        profile = self.flags.profile
+        profiler = None
+        if profile == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif profile == 'tracemalloc':
+            tracemalloc.start()
+        try:
+            with st.phase('process'):
+                yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            report = st.report(getattr(self, 'name', type(self).__name__))
+            if profile == 'tracemalloc':
+                report['tracemalloc_peak'] = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+            self.write_stats(report)
+            if profiler is not None:
+                self.write_profile(pstats.Stats(profiler, stream=sys.stderr))
+            elif profile == 'tracemalloc':
+                self.write_snapshot(snapshot)
+
+    def write_stats(self, report):
+        filename = self.flags.stats
+        if filename is None:
+            return
+        if filename == '-':
+            sys.stderr.write(format_report(report))
+            return
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+    def write_profile(self, profile):
+        if self.flags.profile_output:
+            profile.dump_stats(self.flags.profile_output)
+            return
+        profile.sort_stats('cumulative').print_stats(TOP_COUNT)
+
+    def write_snapshot(self, snapshot):
+        if self.flags.profile_output:
+            snapshot.dump(self.flags.profile_output)
+            return
+        for stat in snapshot.statistics('lineno')[:TOP_COUNT]:
+            sys.stderr.write('{}\n'.format(stat))
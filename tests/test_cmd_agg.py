@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import collections
+import logging
+import os
+import random
+import tempfile
+import unittest
+
+from sgmt import common
+from sgmt import csvutil
+
+from sgmt.cmd import agg
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+AGGS = ['c=count()', 'cv=count(v)', 'd=count_distinct(v)', 'lo=min(n)', 'hi=max(v)', 's=sum(n)', 'f=first(v)']
+
+
+def make_rows(count, keys, seed=1):
+    rnd = random.Random(seed)
+    header = csvutil.Header(['k', 'v', 'n'])
+    return [
+        csvutil.TupleRow(header, ('k{}'.format(rnd.randrange(keys)), rnd.choice(['', 'x', 'y', 'z', str(i % 11)]), str(rnd.randrange(-5, 100))))
+        for i in range(count)
+    ]
+
+
+def brute_force(rows):
+    groups = collections.OrderedDict()
+    for r in rows:
+        groups.setdefault(r['k'], []).append(r)
+    result = []
+    for k, group in groups.items():
+        values = [r['v'] for r in group if r['v']]
+        numbers = [int(r['n']) for r in group]
+        result.append((
+            k, str(len(group)), str(len(values)), str(len(set(values))), str(min(numbers)),
+            max(values, key=agg.order_key) if values else '', str(sum(numbers)), group[0]['v'],
+        ))
+    return result
+
+
+class TestAgg(unittest.TestCase):
+    def run_cmd(self, rows, **flags):
+        cmd = agg.AggCmd()
+        cmd.flags = common.Struct(
+            key='k',
+            agg=AGGS,
+            external=False,
+            sorted=False,
+            memory_limit='1G',
+            spill_dir=self.tmp.name,
+        )
+        cmd.flags.update(flags)
+        cmd.get_in_fieldnames = lambda: ('k', 'v', 'n')
+        return [r.values for r in cmd.process(common.StepBackIterable(rows))]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def testHash(self):
+        rows = make_rows(3000, 200)
+        self.assertEqual(brute_force(rows), self.run_cmd(rows))
+
+    def testExternal(self):
+        rows = make_rows(3000, 500)
+        self.assertEqual(sorted(brute_force(rows)), sorted(self.run_cmd(rows, external=True, memory_limit='20K')))
+
+    def testDefault(self):
+        rows = make_rows(100, 3)
+        counts = collections.Counter(r['k'] for r in rows)
+        self.assertEqual(sorted((k, str(c)) for k, c in counts.items()), sorted(self.run_cmd(rows, agg=None)))
+
+    def testInvalid(self):
+        for spec in ['c=count(x)', 'c=median(v)', 'c=sum()', 'c']:
+            with self.assertRaises(ValueError, msg=spec):
+                self.run_cmd(make_rows(10, 3), agg=[spec])
+
+
+class TestSorted(unittest.TestCase):
+    def run_cmd(self, **flags):
+        cmd = agg.AggCmd()
+        cmd.flags = common.Struct(
+            input=[os.path.join(TESTDATA, 'f1.csv')],
+            input_dialect='default',
+            key='src',
+            agg=['c=count()', 'hi=max(dst)', 's=sum(n)'],
+            external=False,
+            sorted=False,
+            jobs=1,
+        )
+        cmd.flags.update(flags)
+        return [r.values for r in cmd.process(cmd.iter_rows())]
+
+    def testSameAsHash(self):
+        expected = self.run_cmd()
+        self.assertTrue(expected)
+        self.assertEqual(sorted(expected), self.run_cmd(sorted=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
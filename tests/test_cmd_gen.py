@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import random
+import tempfile
+import unittest
+
+from sgmt import common
+
+from sgmt.cmd import gen
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestCmdGen(unittest.TestCase):
+    def flags(self, **kw):
+        flags = common.Struct(
+            kind='random', nodes=10, edges=20, fanout=3, files=2, seed=1,
+            output='-', output_dialect='excel', header=True, inverted=False,
+        )
+        flags.update(kw)
+        return flags
+
+    def testChain(self):
+        self.assertEqual([(0, 1), (1, 2), (2, 3)], list(gen.gen_chain(None, self.flags(nodes=4))))
+
+    def testFanout(self):
+        self.assertEqual(
+            [(0, 1), (0, 2), (0, 3), (1, 4), (1, 5)],
+            list(gen.gen_fanout(None, self.flags(nodes=6))),
+        )
+
+    def testPowerlawEdgeCount(self):
+        for nodes, edges in ((100, 300), (1000, 10000), (100, 50), (2, 5)):
+            result = list(gen.gen_powerlaw(random.Random(1), self.flags(nodes=nodes, edges=edges)))
+            self.assertEqual(edges, len(result), msg=(nodes, edges))
+            self.assertTrue(all(dst < src for src, dst in result))
+
+    def testReproducible(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            outputs = []
+            for name in ('a.csv', 'b.csv'):
+                cmd = gen.GenCmd()
+                cmd.flags = self.flags(output=os.path.join(tmp, name))
+                cmd.main()
+                with open(cmd.flags.output) as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(21, outputs[0].count('\n'))
+
+    def testSets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = gen.GenCmd()
+            cmd.flags = self.flags(kind='sets', output=os.path.join(tmp, 'set{}.csv'))
+            cmd.main()
+            for fn in range(2):
+                with open(os.path.join(tmp, 'set{}.csv'.format(fn))) as f:
+                    lines = f.read().splitlines()
+                self.assertEqual('key,value', lines[0])
+                self.assertEqual(21, len(lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
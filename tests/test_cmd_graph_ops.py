@@ -2,10 +2,13 @@
 # -*- mode: python; coding: utf-8 -*-
 
 import logging
+import os
+import tempfile
 import unittest
 
 from sgmt import common
 from sgmt import csvutil
+from sgmt import graphindex
 
 from sgmt.cmd import graph_ops
 
@@ -60,5 +63,190 @@ class TestCmdBfs(unittest.TestCase):
         self.assertEqual(expected, sorted(cmd.process(iter(rows)), key=lambda r: (r.src, r.dst)))
 
 
+class TestCmdBfsState(unittest.TestCase):
+    def run_cmd(self, filename, rows):
+        cmd = graph_ops.BfsCmd()
+        cmd.set_nodes(['a'])
+        cmd.flags = common.Struct(
+            src='src',
+            dst='dst',
+            inverted=False,
+            index=None,
+            state=filename,
+            delta=True,
+            max_depth=None,
+            depth_column=None,
+        )
+        cmd.get_in_fieldnames = lambda: ['src', 'dst']
+        return cmd.process(iter(rows))
+
+    def testOutputClosedEarly(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'state')
+            out = self.run_cmd(filename, [csvutil.Row(src='a', dst='b'), csvutil.Row(src='b', dst='c')])
+            next(out)
+            out.close()
+            self.assertTrue(os.path.exists(filename))
+
+            out = self.run_cmd(filename, [csvutil.Row(src='c', dst='d'), csvutil.Row(src='d', dst='e')])
+            next(out)
+            out.close()
+            out = self.run_cmd(filename, [csvutil.Row(src='e', dst='f')])
+            self.assertEqual([('e', 'f')], [r.values for r in out])
+
+
+class TestCmdBfsLazy(unittest.TestCase):
+    EDGES = 'src,dst,n\nc,d,1\na,b,2\nb,c,3\nx,b,4\na,c,5\nd,a,6\ny,x,7\n'
+
+    def run_cmd(self, **flags):
+        cmd = graph_ops.BfsCmd()
+        cmd.set_nodes(['b'])
+        cmd.flags = common.Struct(
+            src='src',
+            dst='dst',
+            input=None,
+            input_dialect='default',
+            inverted=False,
+            index=None,
+            state=None,
+            lazy=True,
+            max_depth=None,
+            depth_column=None,
+        )
+        cmd.flags.update(flags)
+        return sorted((r['src'], r['dst'], r['n']) for r in cmd.process(iter([])))
+
+    def testIndex(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'edges.csv')
+            with open(filename, 'w') as f:
+                f.write(self.EDGES)
+            index = os.path.join(tmp, 'edges.idx')
+            graphindex.write(graphindex.build(filename), filename, index)
+            for inverted in (False, True):
+                expected = self.run_cmd(input=[filename], index=index, inverted=inverted, lazy=False)
+                self.assertEqual(expected, self.run_cmd(input=[filename], index=index, inverted=inverted))
+                self.assertEqual(expected, self.run_cmd(index=index, inverted=inverted))
+            self.assertEqual(
+                [('a', 'b', '2'), ('a', 'c', '5'), ('b', 'c', '3'), ('c', 'd', '1'), ('d', 'a', '6')],
+                self.run_cmd(index=index),
+            )
+            self.assertEqual(
+                [('a', 'd', '6'), ('b', 'a', '2'), ('b', 'x', '4'), ('x', 'y', '7')],
+                self.run_cmd(index=index, inverted=True, max_depth=2),
+            )
+
+    def testUnsortedInput(self):
+        with self.assertRaisesRegex(ValueError, 'destination'):
+            list(self.run_cmd(inverted=True))
+
+
+class TestCmdScc(unittest.TestCase):
+    def testCycles(self):
+        cmd = graph_ops.SccCmd()
+        cmd.flags = common.Struct(
+            src='src',
+            dst='dst',
+            node='node',
+            component_column='component',
+            cycles=True,
+            inverted=False,
+        )
+        rows = [
+            csvutil.Row(src='x', dst='a'),
+            csvutil.Row(src='a', dst='b'),
+            csvutil.Row(src='b', dst='a'),
+            csvutil.Row(src='b', dst='c'),
+            csvutil.Row(src='c', dst='c'),
+        ]
+        expected = [
+            csvutil.Row(node='a', component='1'),
+            csvutil.Row(node='b', component='1'),
+            csvutil.Row(node='c', component='2'),
+        ]
+        self.assertEqual(expected, list(cmd.process(iter(rows))))
+
+
+class TestCmdToposort(unittest.TestCase):
+    def testOk(self):
+        cmd = graph_ops.ToposortCmd()
+        cmd.flags = common.Struct(
+            src='src',
+            dst='dst',
+            node='node',
+            order_column='order',
+            level_column='level',
+            inverted=False,
+        )
+        rows = [
+            csvutil.Row(src='b', dst='c'),
+            csvutil.Row(src='a', dst='c'),
+            csvutil.Row(src='c', dst='d'),
+            csvutil.Row(src='a', dst='d'),
+        ]
+        expected = [
+            csvutil.Row(node='a', order='0', level='0'),
+            csvutil.Row(node='b', order='1', level='0'),
+            csvutil.Row(node='c', order='2', level='1'),
+            csvutil.Row(node='d', order='3', level='2'),
+        ]
+        self.assertEqual(expected, list(cmd.process(iter(rows))))
+
+
+class TestCmdGraphStats(unittest.TestCase):
+    def testOk(self):
+        cmd = graph_ops.GraphStatsCmd()
+        cmd.flags = common.Struct(
+            src='src',
+            dst='dst',
+        )
+        cmd.get_in_fieldnames = lambda: ['src', 'dst', 'w']
+        rows = [
+            csvutil.Row(src='a', dst='b'),
+            csvutil.Row(src='a', dst='c'),
+            csvutil.Row(src='a', dst='c'),
+            csvutil.Row(src='b', dst='c'),
+            csvutil.Row(src='c', dst='c'),
+            csvutil.Row(src='d', dst='b'),
+        ]
+        stats = {(r['stat'], r['key']): r['value'] for r in cmd.process(iter(rows))}
+        expected = {
+            ('graph', 'nodes'): '4',
+            ('graph', 'edges'): '6',
+            ('graph', 'distinct_edges'): '5',
+            ('graph', 'duplicate_edges'): '1',
+            ('graph', 'self_loops'): '1',
+            ('graph', 'sources'): '2',
+            ('graph', 'sinks'): '0',
+            ('out_degree', '1'): '3',
+            ('out_degree', '2'): '1',
+            ('in_degree', '0'): '2',
+            ('in_degree', '2'): '1',
+            ('in_degree', '4'): '1',
+            ('top_out_degree', 'a'): '3',
+            ('top_out_degree', 'b'): '1',
+            ('top_out_degree', 'c'): '1',
+            ('top_out_degree', 'd'): '1',
+            ('top_in_degree', 'c'): '4',
+            ('top_in_degree', 'b'): '2',
+        }
+        self.assertEqual('1.0', stats.pop(('sample', 'nodes')))
+        self.assertEqual('1.0', stats.pop(('sample', 'edges')))
+        self.assertTrue(int(stats.pop(('memory', 'bfs'))) > 0)
+        self.assertEqual(expected, stats)
+
+    def testSampled(self):
+        # Hubs start late, after the node sample is reduced.
+        rows = [csvutil.Row(src='n{}'.format(i), dst='n{}'.format(i + 1)) for i in range(3000)]
+        for i in range(300):
+            rows.append(csvutil.Row(src='hub{}'.format(i % 3), dst='m{}'.format(i)))
+            rows.append(csvutil.Row(src='x{}'.format(i), dst='sink'))
+        stats = list(graph_ops.graph_stats(iter(rows), 'src', 'dst', sample_size=500, top=3, hub_capacity=50))
+        stats = [r.values for r in stats]
+        self.assertLess(float([r for r in stats if r[:2] == ('sample', 'nodes')][0][2]), 1)
+        self.assertEqual([('hub0', '100'), ('hub1', '100'), ('hub2', '100')], sorted(r[1:] for r in stats if r[0] == 'top_out_degree'))
+        self.assertEqual(('top_in_degree', 'sink', '300'), [r for r in stats if r[0] == 'top_in_degree'][0])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import tempfile
+import unittest
+
+from sgmt import common
+
+from sgmt.cmd import join
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+NODES = 'node,owner\na,alice\nb,bob\nb,bert\nz,zed\n'
+
+
+class TestCmdJoin(unittest.TestCase):
+    def run_join(self, nodes=NODES, **kw):
+        with tempfile.TemporaryDirectory() as tmp:
+            right = os.path.join(tmp, 'nodes.csv')
+            with open(right, 'w') as f:
+                f.write(nodes)
+            output = os.path.join(tmp, 'out.csv')
+            cmd = join.JoinCmd()
+            cmd.flags = common.Struct(
+                input=[os.path.join(TESTDATA, 'f1.csv')], input_dialect='default', jobs=1,
+                output=output, output_dialect='default',
+                right=right, right_dialect='default', key='src', right_key='node', right_prefix='src_',
+                mode='inner', build='auto', external=False, memory_limit='1G', spill_dir=tmp,
+            )
+            cmd.flags.update(kw)
+            cmd.main()
+            with open(output) as f:
+                return f.read().splitlines()
+
+    def testInner(self):
+        for build in ('left', 'right'):
+            self.assertEqual(
+                ['src,dst,n,src_owner', 'a,b,1,alice', 'b,c,1,bob', 'b,c,1,bert'],
+                self.run_join(build=build),
+            )
+
+    def testLeft(self):
+        for build in ('left', 'right'):
+            self.assertEqual(
+                ['src,dst,n,src_owner', 'a,b,1,alice', 'b,c,1,bob', 'b,c,1,bert', 'c,a,1,'],
+                self.run_join(mode='left', build=build),
+            )
+
+    def testAnti(self):
+        for build in ('left', 'right'):
+            self.assertEqual(['src,dst,n', 'c,a,1'], self.run_join(mode='anti', build=build))
+
+    def testExternal(self):
+        for mode in join.MODES:
+            expected = self.run_join(mode=mode)
+            result = self.run_join(mode=mode, external=True, memory_limit='1')
+            self.assertEqual(expected[0], result[0])
+            self.assertEqual(sorted(expected[1:]), sorted(result[1:]))
+
+    def testNaturalKey(self):
+        self.assertEqual(
+            ['src,dst,n,owner', 'a,b,1,alice', 'c,a,1,carol'],
+            self.run_join(nodes='src,owner\na,alice\nc,carol\n', key=None, right_key=None, right_prefix=''),
+        )
+
+    def testColumnClash(self):
+        nodes = 'node,owner,n\na,alice,5\n'
+        with self.assertRaisesRegex(ValueError, 'input columns: n,'):
+            self.run_join(nodes=nodes, right_prefix='', mode='left')
+        self.assertEqual(
+            ['src,dst,n,src_owner,src_n', 'a,b,1,alice,5'],
+            self.run_join(nodes=nodes),
+        )
+        self.assertEqual(['src,dst,n', 'b,c,1', 'c,a,1'], self.run_join(nodes=nodes, right_prefix='', mode='anti'))
+
+
+if __name__ == '__main__':
+    unittest.main()
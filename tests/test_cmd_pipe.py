@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import tempfile
+import unittest
+
+from sgmt import common
+
+from sgmt.cmd import cat
+from sgmt.cmd import pipe
+from sgmt.cmd import set_ops
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+class TestCmdPipe(unittest.TestCase):
+    def testSplitArgs(self):
+        self.assertEqual(
+            [['cat', '--input', 'a'], ['uni'], ['extract', '--column', 'a=b']],
+            pipe.split_args(['cat', '--input', 'a', '::', 'uni', '::', 'extract', '--column', 'a=b']),
+        )
+
+    def testFindCommands(self):
+        commands = pipe.find_commands()
+        self.assertIs(cat.CatCmd, commands['cat'])
+        self.assertIs(set_ops.UnionCmd, commands['uni'])
+
+    def testRun(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'out.csv')
+            cmd = pipe.PipeCmd()
+            cmd.flags = common.Struct(stages=[
+                'cat', '--input', os.path.join(TESTDATA, 'f1.csv'), '--input', os.path.join(TESTDATA, 'f3.csv'), '::',
+                'extract', '--column', 'a=src', '--column', 'b=dst', '::',
+                'int', '::',
+                'set', '--data', 'c=x', '--output', output,
+            ])
+            cmd.main()
+            with open(output) as f:
+                self.assertEqual('a,b,c\na,b,x\nb,c,x\nc,a,x\na,c,x\nc,b,x\nb,a,x\n', f.read())
+
+    def testStageOptions(self):
+        f1 = os.path.join(TESTDATA, 'f1.csv')
+        for stages in (
+                ['cat', '--input', f1, '--output', 'x.csv', '::', 'uni'],
+                ['cat', '--input', f1, '--output-dialect', 'excel', '::', 'uni'],
+                ['cat', '--input', f1, '--compress-level', '1', '::', 'uni'],
+                ['cat', '--input', f1, '::', 'uni', '--input', f1],
+                ['cat', '--input', f1, '::', 'uni', '--sorted'],
+        ):
+            cmd = pipe.PipeCmd()
+            cmd.flags = common.Struct(stages=stages)
+            with self.assertRaisesRegex(ValueError, 'only', msg=stages):
+                cmd.make_stages()
+
+
+if __name__ == '__main__':
+    unittest.main()
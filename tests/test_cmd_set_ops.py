@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import random
+import tempfile
+import unittest
+
+from sgmt import common
+from sgmt import csvutil
+
+from sgmt.cmd import set_ops
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+def make_rows(inputs, rows_per_input, keys, seed=1):
+    rnd = random.Random(seed)
+    header = [csvutil.Header(['k', 'v'], fn=fn) for fn in range(inputs)]
+    result = []
+    for fn in range(inputs):
+        for i in range(rows_per_input):
+            result.append(csvutil.TupleRow(header[fn], ('k{}'.format(rnd.randrange(keys)), 'v{}.{}'.format(fn, i))))
+    return result
+
+
+class SetOpTestCase(unittest.TestCase):
+    def run_cmd(self, cmd_type, rows, inputs, **flags):
+        cmd = cmd_type()
+        cmd.flags = common.Struct(
+            input=['f{}'.format(i) for i in range(inputs)],
+            key='k',
+            external=False,
+            sorted=False,
+            memory_limit='1G',
+            spill_dir=self.tmp.name,
+        )
+        cmd.flags.update(flags)
+        return [r.values for r in cmd.process(common.StepBackIterable(rows))]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class TestInMemory(SetOpTestCase):
+    def testInt(self):
+        h0, h1 = csvutil.Header(['k'], fn=0), csvutil.Header(['k'], fn=1)
+        rows = [csvutil.TupleRow(h0, (k,)) for k in 'abc'] + [csvutil.TupleRow(h1, (k,)) for k in 'bcd']
+        self.assertEqual([('b',), ('c',)], self.run_cmd(set_ops.IntersectionCmd, rows, 2))
+        self.assertEqual([('a',)], self.run_cmd(set_ops.SubtractCmd, rows, 2))
+        self.assertEqual([('a',), ('d',)], self.run_cmd(set_ops.DiffCmd, rows, 2))
+        self.assertEqual([(k,) for k in 'abcd'], self.run_cmd(set_ops.UnionCmd, rows, 2))
+
+
+class TestExternal(SetOpTestCase):
+    def testSameAsInMemory(self):
+        inputs = 3
+        rows = make_rows(inputs, 2000, 3000)
+        for cmd_type in (set_ops.IntersectionCmd, set_ops.UnionCmd, set_ops.SubtractCmd, set_ops.DiffCmd):
+            expected = self.run_cmd(cmd_type, rows, inputs)
+            actual = self.run_cmd(cmd_type, rows, inputs, external=True, memory_limit='20K')
+            self.assertTrue(expected, cmd_type)
+            self.assertEqual(sorted(expected), sorted(actual), cmd_type)
+
+
+class TestCompact(SetOpTestCase):
+    def testSameAsInMemory(self):
+        for inputs in (1, 2, 3):
+            rows = make_rows(inputs, 2000, 3000)
+            for cmd_type in (set_ops.IntersectionCmd, set_ops.UnionCmd, set_ops.SubtractCmd, set_ops.DiffCmd):
+                expected = self.run_cmd(cmd_type, rows, inputs)
+                self.assertEqual(expected, self.run_cmd(cmd_type, rows, inputs, compact=True), (cmd_type, inputs))
+                actual = self.run_cmd(cmd_type, rows, inputs, compact=True, external=True, memory_limit='20K')
+                self.assertEqual(sorted(expected), sorted(actual), (cmd_type, inputs))
+
+
+class TestSetExpr(SetOpTestCase):
+    def testSameAsSetOps(self):
+        inputs = 3
+        rows = make_rows(inputs, 2000, 3000)
+        keys = [{r['k'] for r in rows if r['@fn'] == fn} for fn in range(inputs)]
+        for expr, expected in (
+                ('a & b & c', keys[0] & keys[1] & keys[2]),
+                ('a | b | c', keys[0] | keys[1] | keys[2]),
+                ('a - b - c', keys[0] - keys[1] - keys[2]),
+                ('(a & b) - c | c ^ a', ((keys[0] & keys[1]) - keys[2]) | (keys[2] ^ keys[0])),
+        ):
+            for flags in ({}, {'compact': True}, {'external': True, 'memory_limit': '20K'}):
+                actual = self.run_cmd(set_ops.SetExprCmd, rows, inputs, expr=expr, aliases=None, **flags)
+                self.assertEqual(sorted(expected), sorted(k for k, _ in actual), (expr, flags))
+                self.assertEqual(len(expected), len(actual))
+
+    def testFirstRow(self):
+        h0, h1 = csvutil.Header(['k', 'v'], fn=0), csvutil.Header(['k', 'v'], fn=1)
+        rows = [csvutil.TupleRow(h0, ('a', '1')), csvutil.TupleRow(h0, ('a', '2')), csvutil.TupleRow(h1, ('a', '3')), csvutil.TupleRow(h1, ('b', '4'))]
+        self.assertEqual([('a', '1'), ('b', '4')], self.run_cmd(set_ops.SetExprCmd, rows, 2, expr='x | y', aliases='x,y'))
+
+
+class TestApprox(SetOpTestCase):
+    def testEstimates(self):
+        inputs = 2
+        # Sets without duplicate keys: diff counts keys found in one row only.
+        header = [csvutil.Header(['k'], fn=fn) for fn in range(inputs)]
+        rows = [csvutil.TupleRow(header[0], ('k{}'.format(i),)) for i in range(3000)]
+        rows += [csvutil.TupleRow(header[1], ('k{}'.format(i),)) for i in range(2000, 6000)]
+        for cmd_type in (set_ops.IntersectionCmd, set_ops.UnionCmd, set_ops.SubtractCmd, set_ops.DiffCmd):
+            exact = len(self.run_cmd(cmd_type, rows, inputs))
+            cmd = cmd_type()
+            cmd.flags = common.Struct(input=['f0', 'f1'], key='k', approx=True)
+            estimate, = cmd.process(common.StepBackIterable(rows))
+            self.assertEqual(['estimate'], cmd.get_out_fieldnames())
+            self.assertAlmostEqual(exact, estimate['estimate'], delta=exact * 0.1, msg=cmd_type)
+
+    def testCard(self):
+        rows = make_rows(2, 3000, 4000)
+        cmd = set_ops.CardCmd()
+        cmd.flags = common.Struct(input=['f0', 'f1'], key='k', pairs=False)
+        result = list(cmd.process(iter(rows)))
+        self.assertEqual(['f0', 'f1'], [r['input'] for r in result])
+        self.assertEqual([3000, 3000], [r['rows'] for r in result])
+        for fn, r in enumerate(result):
+            exact = len({row['k'] for row in rows if row['@fn'] == fn})
+            self.assertAlmostEqual(exact, r['keys'], delta=exact * 0.05)
+
+        cmd.flags.pairs = True
+        pair, = cmd.process(iter(rows))
+        keys = [{row['k'] for row in rows if row['@fn'] == fn} for fn in range(2)]
+        self.assertAlmostEqual(len(keys[0] & keys[1]), pair['intersection'], delta=len(keys[0] | keys[1]) * 0.05)
+        self.assertAlmostEqual(len(keys[0] & keys[1]) / len(keys[0] | keys[1]), float(pair['jaccard']), delta=0.05)
+
+
+class TestSorted(unittest.TestCase):
+    def run_cmd(self, cmd_type, inputs, **flags):
+        cmd = cmd_type()
+        cmd.flags = common.Struct(
+            input=[os.path.join(TESTDATA, f) for f in inputs],
+            input_dialect='default',
+            key='src,dst',
+            external=False,
+            sorted=False,
+            jobs=1,
+        )
+        cmd.flags.update(flags)
+        return [r.values for r in cmd.process(cmd.iter_rows())]
+
+    def testSameAsInMemory(self):
+        inputs = ['f1.csv', 'fa.csv', 'fb.csv', 'fc.csv']
+        for cmd_type in (set_ops.IntersectionCmd, set_ops.UnionCmd, set_ops.SubtractCmd, set_ops.DiffCmd):
+            for n in range(1, len(inputs) + 1):
+                expected = self.run_cmd(cmd_type, inputs[:n])
+                actual = self.run_cmd(cmd_type, inputs[:n], sorted=True)
+                self.assertEqual(sorted(expected), actual, (cmd_type, n))
+
+    def testSetExprSorted(self):
+        inputs = ['f1.csv', 'fa.csv', 'fb.csv']
+        expected = self.run_cmd(set_ops.SetExprCmd, inputs, expr='a & b | c - a', aliases=None)
+        actual = self.run_cmd(set_ops.SetExprCmd, inputs, expr='a & b | c - a', aliases=None, sorted=True)
+        self.assertTrue(expected)
+        self.assertEqual(sorted(expected), actual)
+
+    def testPrefilter(self):
+        inputs = ['f1.csv', 'fa.csv', 'fb.csv', 'fc.csv']
+        for n in range(1, len(inputs) + 1):
+            expected = self.run_cmd(set_ops.IntersectionCmd, inputs[:n])
+            actual = self.run_cmd(set_ops.IntersectionCmd, inputs[:n], prefilter=True, approx=False)
+            self.assertEqual(expected, actual, n)
+
+    def testUnsorted(self):
+        with self.assertRaises(set_ops.UnsortedInputError):
+            self.run_cmd(set_ops.UnionCmd, ['f1.csv', 'f3.csv'], sorted=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import io
+import logging
+import unittest
+
+from sgmt import columnar
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestColumnar(unittest.TestCase):
+    def write(self, rows, fieldnames, block_rows=2):
+        out = io.BytesIO()
+        w = columnar.Writer(out, fieldnames, block_rows=block_rows)
+        w.writeheader()
+        w.writerows(rows)
+        w.flush()
+        return out.getvalue()
+
+    def testRoundTrip(self):
+        header = csvutil.Header(['src', 'dst', 'n'])
+        rows = [
+            csvutil.TupleRow(header, ('a', 'b', '1')),
+            csvutil.Row(src='b', dst='ц', n='2'),
+            csvutil.TupleRow(header, ('c', '', 'x,"y"\n')),
+        ]
+        data = self.write(rows, ['src', 'dst', 'n'])
+        self.assertTrue(columnar.is_columnar(data))
+
+        reader = columnar.Reader(io.BytesIO(data), fn=3)
+        self.assertEqual(['src', 'dst', 'n'], reader.fieldnames)
+        result = list(reader)
+        self.assertEqual([('a', 'b', '1'), ('b', 'ц', '2'), ('c', '', 'x,"y"\n')], [r.values for r in result])
+        self.assertEqual([3, 3, 3], [r['@fn'] for r in result])
+        self.assertEqual([0, 1, 2], [r['@frn'] for r in result])
+
+        rows = list(columnar.Reader(io.BytesIO(data), tuples=False))
+        self.assertEqual(csvutil.Row(src='b', dst='ц', n='2'), rows[1])
+
+    def testProjection(self):
+        header = csvutil.Header(['src', 'dst'])
+        data = self.write([csvutil.TupleRow(header, ('a', 'b'))], ['dst', 'missing'])
+        self.assertEqual([('b', '')], [r.values for r in columnar.Reader(io.BytesIO(data))])
+
+    def testEmpty(self):
+        data = self.write([], ['src'])
+        reader = columnar.Reader(io.BytesIO(data))
+        self.assertEqual(['src'], reader.fieldnames)
+        self.assertEqual([], list(reader))
+
+
+if __name__ == '__main__':
+    unittest.main()
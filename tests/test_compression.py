@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import io
+import logging
+import os
+import tempfile
+import unittest
+
+from sgmt import common
+from sgmt import compression
+
+
+_logger = logging.getLogger(__name__)
+
+
+TEXT = ''.join('n{},n{}\n'.format(i, i + 1) for i in range(10000))
+
+
+class TestCompression(unittest.TestCase):
+    def extensions(self):
+        result = ['.gz', '.bz2', '.xz']
+        if compression.zstandard is not None:
+            result.append('.zst')
+        return result
+
+    def testRoundTrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for ext in self.extensions():
+                filename = os.path.join(tmp, 'a.csv' + ext)
+                with common.open_file(filename, 'w', compress_level=1) as f:
+                    f.write(TEXT)
+                self.assertTrue(compression.is_compressed(filename), ext)
+                # Renamed file is detected by content.
+                os.rename(filename, filename + '.data')
+                with common.open_file(filename + '.data') as f:
+                    self.assertEqual(TEXT, f.read(), ext)
+
+    def testPlainFile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'a.csv')
+            with common.open_file(filename, 'w') as f:
+                f.write(TEXT)
+            self.assertFalse(compression.is_compressed(filename))
+            with common.open_file(filename) as f:
+                self.assertEqual(TEXT, f.read())
+
+    def testDetect(self):
+        self.assertEqual('gzip', compression.detect(b'\x1f\x8b\x08\x00').name)
+        self.assertEqual('zstd', compression.format_for_name('a.csv.zst').name)
+        self.assertIsNone(compression.detect(b'src,dst\n'))
+        self.assertIsNone(compression.format_for_name('a.csv'))
+
+    def testThreadedReader(self):
+        r = compression.ThreadedReader(io.BytesIO(TEXT.encode()), chunk_size=100, depth=2)
+        self.assertEqual(TEXT.encode(), io.BufferedReader(r).read())
+
+    def testThreadedReaderEarlyClose(self):
+        r = compression.ThreadedReader(io.BytesIO(TEXT.encode()), chunk_size=10, depth=1)
+        self.assertEqual(b'n0,n1\n', io.BufferedReader(r, 16).readline())
+        r.close()
+        self.assertFalse(r.thread.is_alive())
+
+    def testThreadedReaderError(self):
+        class Broken(io.RawIOBase):
+            def read(self, n):
+                raise OSError('broken')
+        r = compression.ThreadedReader(Broken())
+        with self.assertRaisesRegex(OSError, 'broken'):
+            r.read(10)
+        r.close()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import io
+import logging
+import unittest
+
+from sgmt import csvutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+DATA = 'src,dst,n\na,b,1\n\nb,c\nc,a,3\n'
+
+
+class TestTupleReader(unittest.TestCase):
+    def testRows(self):
+        reader = csvutil.TupleReader(io.StringIO(DATA), dialect='default', fn=1)
+        expected = list(csvutil.Reader(io.StringIO(DATA), dialect='default', fn=1))
+        self.assertEqual(['src', 'dst', 'n'], reader.fieldnames)
+        self.assertEqual(expected, list(reader))
+
+    def testAccess(self):
+        r = next(csvutil.TupleReader(io.StringIO(DATA), dialect='default', fn=2, rn=iter([5])))
+        self.assertEqual('a', r['src'])
+        self.assertEqual('b', r.dst)
+        self.assertEqual('', r['missing'])
+        self.assertEqual(2, r['@fn'])
+        self.assertEqual(0, r['@frn'])
+        self.assertEqual(5, r['@rn'])
+        self.assertEqual(csvutil.Row(src='a', dst='b', n='1', **{'@fn': 2, '@frn': 0, '@rn': 5}), r.as_row())
+
+    def testColumnGetter(self):
+        get = csvutil.ColumnGetter(['dst', 'missing', 'src'])
+        rows = list(csvutil.TupleReader(io.StringIO(DATA), dialect='default'))
+        self.assertEqual([('b', '', 'a'), ('c', '', 'b'), ('a', '', 'c')], [get(r) for r in rows])
+        self.assertEqual(('b', '', 'a'), get(csvutil.Row(src='a', dst='b')))
+
+
+class TestWriter(unittest.TestCase):
+    def testTupleRows(self):
+        out = io.StringIO()
+        w = csvutil.Writer(out, fieldnames=['dst', 'src'], dialect='default', extrasaction='ignore')
+        w.writeheader()
+        w.writerows(csvutil.TupleReader(io.StringIO(DATA), dialect='default'))
+        w.writerow(csvutil.Row(src='x', dst='y'))
+        self.assertEqual('dst,src\nb,a\nc,b\na,c\ny,x\n', out.getvalue())
+
+    def testBatches(self):
+        header = csvutil.Header(['src', 'dst'])
+        rows = [
+            csvutil.TupleRow(header, ('a', 'b')),
+            csvutil.TupleRow(header, ('b', 'c', 'extra')),
+            csvutil.TupleRow(csvutil.Header(['dst', 'src']), ('e', 'd')),
+            csvutil.Row(src='f', dst='g', other='1'),
+            csvutil.Row(src='h'),
+            csvutil.Row(src='i', dst='j'),
+        ]
+        expected = 'src,dst\na,b\nb,c\nd,e\nf,g\nh,\ni,j\n'
+        for batch_rows in (1, 2, 3, 100):
+            out = io.StringIO()
+            w = csvutil.Writer(out, fieldnames=['src', 'dst'], dialect='default', extrasaction='ignore', batch_rows=batch_rows)
+            w.writeheader()
+            w.writerows(rows)
+            self.assertEqual(expected, out.getvalue(), batch_rows)
+
+    def testPostprocess(self):
+        out = io.StringIO()
+        w = csvutil.Writer(out, fieldnames=['src'], dialect='default', extrasaction='ignore', postprocess=lambda r: csvutil.Row(src=r.src.upper()))
+        w.writerows(csvutil.TupleReader(io.StringIO(DATA), dialect='default'))
+        self.assertEqual('A\nB\nC\n', out.getvalue())
+
+    def testPostprocessMixedBatch(self):
+        swap = {'src': 'dst', 'dst': 'src'}
+        def invert(r):
+            if type(r) is csvutil.TupleRow:
+                return csvutil.TupleRow(csvutil.Header([swap.get(n, n) for n in r.header.fieldnames]), r.values)
+            return csvutil.Row(src=r['dst'], dst=r['src'])
+        rows = [
+            csvutil.TupleRow(csvutil.Header(['src', 'dst']), ('a', 'b')),
+            csvutil.TupleRow(csvutil.Header(['dst', 'src']), ('d', 'c')),
+            csvutil.Row(src='e', dst='f'),
+        ]
+        out = io.StringIO()
+        w = csvutil.Writer(out, fieldnames=['src', 'dst'], dialect='default', extrasaction='ignore', postprocess=invert)
+        w.writerows(rows)
+        w.writerow(csvutil.Row(src='g', dst='h'))
+        self.assertEqual('b,a\nd,c\nf,e\nh,g\n', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import csv
+import io
+import logging
+import os
+import pickle
+import tempfile
+import unittest
+
+from sgmt import dialects
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestDialects(unittest.TestCase):
+    def testSniff(self):
+        d = dialects.sniff('a;b;c\n1;"2;3";4\n')
+        self.assertEqual(';', d.delimiter)
+        self.assertEqual([['1', '2;3', '4']], list(csv.reader(['1;"2;3";4'], dialect=d)))
+        self.assertEqual(d, pickle.loads(pickle.dumps(d)))
+        self.assertEqual(d, dialects.from_json(dialects.to_json(d)))
+
+    def testSampleHasCompleteLines(self):
+        f = io.BufferedReader(io.BytesIO(b'a,b\n1,2\n3,'))
+        self.assertEqual('a,b\n1,2\n', dialects.read_sample(f))
+        self.assertEqual(0, f.tell())
+
+    def testFallback(self):
+        f = io.BufferedReader(io.BytesIO(b'no newline'))
+        self.assertEqual(dialects.FALLBACK, dialects.detect(f))
+
+    def testCacheBySignature(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'a.csv')
+            with open(filename, 'w') as f:
+                f.write('a\tb\n1\t2\n')
+            with open(filename, 'rb') as f:
+                d = dialects.detect(f, filename)
+            self.assertEqual('\t', d.delimiter)
+            with open(filename, 'rb') as f:
+                self.assertIs(d, dialects.detect(f, filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
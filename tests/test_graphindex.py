@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from sgmt import csvutil
+from sgmt import graphindex
+from sgmt import graphstore
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+class TestGraphIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'g.csv')
+        shutil.copy(os.path.join(TESTDATA, 'f3.csv'), self.source)
+        self.index = os.path.join(self.tmp, 'g.idx')
+        graphindex.write(graphindex.build(self.source), self.source, self.index)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def edges(self, graph):
+        return sorted(
+            (r.src, r.dst, r.n)
+            for r in (graph.edge_row(e) for e in graphstore.bfs(graph, range(len(graph))))
+        )
+
+    def testLoad(self):
+        graph = graphindex.load(self.index)
+        with open(self.source) as f:
+            expected = graphstore.Graph.from_rows(csvutil.Reader(f, dialect='default'))
+        self.assertEqual(['src', 'dst', 'n'], graph.fieldnames)
+        self.assertEqual(self.edges(expected), self.edges(graph))
+        self.assertEqual(self.edges(expected.transpose()), self.edges(graphindex.load(self.index, reverse=True)))
+
+    def testStale(self):
+        with open(self.source, 'a') as f:
+            f.write('d,a,4\n')
+        with self.assertRaises(graphindex.StaleIndexError):
+            graphindex.load(self.index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import collections
+import logging
+import random
+import unittest
+
+from sgmt import csvutil
+from sgmt import graphstore
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestGraph(unittest.TestCase):
+    def makeGraph(self, edges, payload=True):
+        rows = [csvutil.Row(src=s, dst=d, n=n) for s, d, n in edges]
+        return graphstore.Graph.from_rows(rows, payload=payload)
+
+    def testCsr(self):
+        g = self.makeGraph([('a', 'b', '1'), ('b', 'c', '2'), ('a', 'c', '3')])
+        a, b, c = (g.nodes.get(n) for n in 'abc')
+        self.assertEqual([b, c], [d for d, _ in g.successors(a)])
+        self.assertEqual([c], [d for d, _ in g.successors(b)])
+        self.assertEqual([], list(g.successors(c)))
+
+    def testDuplicateEdgeKeepsLastRow(self):
+        g = self.makeGraph([('a', 'b', '1'), ('a', 'c', '2'), ('a', 'b', '3')])
+        a = g.nodes.get('a')
+        rows = [g.edge_row(e) for _, e in g.successors(a)]
+        expected = [
+            csvutil.Row(src='a', dst='b', n='3'),
+            csvutil.Row(src='a', dst='c', n='2'),
+        ]
+        self.assertEqual(expected, rows)
+
+    def testSparsePayload(self):
+        rows = [
+            csvutil.Row(src='a', dst='b'),
+            csvutil.Row(src='b', dst='c', w='x'),
+            csvutil.Row(src='c', dst='d'),
+        ]
+        g = graphstore.Graph.from_rows(rows)
+        self.assertEqual(rows, [g.edge_row(e) for e in range(3)])
+
+    def testBfs(self):
+        g = self.makeGraph([('a', 'c', ''), ('b', 'c', ''), ('c', 'd', ''), ('d', 'a', '')])
+        edges = list(graphstore.bfs(g, [g.nodes.get('a')]))
+        self.assertEqual(
+            [('a', 'c'), ('c', 'd'), ('d', 'a')],
+            [(g.edge_row(e).src, g.edge_row(e).dst) for e in edges],
+        )
+
+    def testMaxDepth(self):
+        g = self.makeGraph([('a', 'b', ''), ('b', 'c', ''), ('c', 'd', ''), ('a', 'c', '')])
+        levels = [
+            (depth, [(g.edge_row(e).src, g.edge_row(e).dst) for e in edges])
+            for depth, edges in graphstore.bfs_levels(g, [g.nodes.get('a')], max_depth=2)
+        ]
+        self.assertEqual([(1, [('a', 'b'), ('a', 'c')]), (2, [('b', 'c'), ('c', 'd')])], levels)
+
+    def testSources(self):
+        g = self.makeGraph([('a', 'c', ''), ('b', 'c', ''), ('c', 'd', '')], payload=False)
+        self.assertEqual(['a', 'b'], [g.nodes.name(i) for i in graphstore.sources(g)])
+
+    def testSinks(self):
+        g = self.makeGraph([('a', 'c', ''), ('a', 'b', ''), ('c', 'd', ''), ('e', 'e', '')], payload=False)
+        self.assertEqual(['b', 'd'], sorted(g.nodes.name(i) for i in graphstore.sinks(g)))
+
+    def testTopologicalLevels(self):
+        g = self.makeGraph([('a', 'b', ''), ('b', 'd', ''), ('a', 'd', ''), ('c', 'd', ''), ('x', 'y', ''), ('y', 'x', '')], payload=False)
+        levels = [sorted(g.nodes.name(i) for i in level) for level in graphstore.topological_levels(g)]
+        self.assertEqual([['a', 'c'], ['b'], ['d']], levels)
+
+
+def reachable(g, start):
+    seen = {start}
+    stack = [start]
+    while stack:
+        for d, _ in g.successors(stack.pop()):
+            if d not in seen:
+                seen.add(d)
+                stack.append(d)
+    return seen
+
+
+def distances(g, seeds):
+    dist = {n: 0 for n in seeds}
+    queue = collections.deque(dist)
+    while queue:
+        n = queue.popleft()
+        for d, _ in g.successors(n):
+            if d not in dist:
+                dist[d] = dist[n] + 1
+                queue.append(d)
+    return dist
+
+
+class TestPaths(unittest.TestCase):
+    def randomGraphs(self):
+        rnd = random.Random(2)
+        for _ in range(50):
+            n = rnd.randint(2, 40)
+            rows = [
+                csvutil.Row(src=str(rnd.randrange(n)), dst=str(rnd.randrange(n)))
+                for _ in range(rnd.randint(1, 80))
+            ]
+            g = graphstore.Graph.from_rows(rows, payload=False)
+            nodes = list(range(len(g)))
+            rnd.shuffle(nodes)
+            k = rnd.randint(1, max(1, len(nodes) // 4))
+            yield g, g.transpose(), nodes[:k], nodes[k:2 * k]
+
+    def testShortestPaths(self):
+        for g, t, sources, targets in self.randomGraphs():
+            df = distances(g, sources)
+            db = distances(t, targets)
+            common = [df[n] + db[n] for n in df if n in db]
+            expected = set()
+            if common and min(common) > 0:
+                d = min(common)
+                for u in range(len(g)):
+                    for v, e in g.successors(u):
+                        if u in df and v in db and df[u] + 1 + db[v] == d:
+                            expected.add(e)
+            result = list(graphstore.shortest_path_edges(g, t, sources, targets))
+            self.assertEqual(len(result), len(set(result)))
+            self.assertEqual(expected, set(result))
+
+    def testAllPaths(self):
+        for g, t, sources, targets in self.randomGraphs():
+            forward = graphstore.reachable(g, sources)
+            backward = graphstore.reachable(t, targets)
+            expected = {
+                e
+                for u in range(len(g)) if forward[u]
+                for v, e in g.successors(u) if backward[v]
+            }
+            result = list(graphstore.path_edges(g, t, sources, targets))
+            self.assertEqual(len(result), len(set(result)))
+            self.assertEqual(expected, set(result))
+
+
+class TestStronglyConnectedComponents(unittest.TestCase):
+    def testSameAsReachability(self):
+        rnd = random.Random(1)
+        for _ in range(20):
+            n = rnd.randint(1, 40)
+            rows = [
+                csvutil.Row(src=str(rnd.randrange(n)), dst=str(rnd.randrange(n)))
+                for _ in range(rnd.randint(0, 80))
+            ]
+            g = graphstore.Graph.from_rows(rows, payload=False)
+            count, components = graphstore.strongly_connected_components(g)
+            reach = [reachable(g, i) for i in range(len(g))]
+            for u in range(len(g)):
+                for v in reach[u]:
+                    same = u in reach[v]
+                    self.assertEqual(same, components[u] == components[v])
+                    self.assertLessEqual(components[u], components[v])
+            self.assertEqual(count, len(set(components)))
+
+    def testLongChain(self):
+        n = 100000
+        rows = [csvutil.Row(src=str(i), dst=str(i + 1)) for i in range(n)]
+        rows.append(csvutil.Row(src=str(n), dst='0'))
+        g = graphstore.Graph.from_rows(rows, payload=False)
+        count, _ = graphstore.strongly_connected_components(g)
+        self.assertEqual(1, count)
+
+
+def queue_bfs(g, seeds):
+    visited = set(seeds)
+    queue = collections.deque(sorted(visited))
+    while queue:
+        n = queue.popleft()
+        for d, e in g.successors(n):
+            yield e
+            if d not in visited:
+                visited.add(d)
+                queue.append(d)
+
+
+class TestBfsLevels(unittest.TestCase):
+    def setUp(self):
+        self.numpy = graphstore.numpy
+
+    def tearDown(self):
+        graphstore.numpy = self.numpy
+
+    def testSameAsQueueBfs(self):
+        rnd = random.Random(1)
+        for _ in range(20):
+            n = rnd.randint(1, 50)
+            rows = [
+                csvutil.Row(src=str(rnd.randrange(n)), dst=str(rnd.randrange(n)))
+                for _ in range(rnd.randint(0, 200))
+            ]
+            g = graphstore.Graph.from_rows(rows)
+            seeds = rnd.sample(range(len(g)), min(len(g), 3))
+            expected = list(queue_bfs(g, seeds))
+            for numpy in {self.numpy, None}:
+                graphstore.numpy = numpy
+                self.assertEqual(expected, list(graphstore.bfs(g, seeds)), numpy)
+
+
+if __name__ == '__main__':
+    unittest.main()
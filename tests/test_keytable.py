@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import unittest
+from unittest import mock
+
+from sgmt import csvutil
+from sgmt import keytable
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestKeyTable(unittest.TestCase):
+    def testGrow(self):
+        table = keytable.KeyTable(capacity=4)
+        for i in range(5000):
+            self.assertEqual((i, True), table.add(('k{}'.format(i), str(i % 7))))
+        self.assertEqual(5000, len(table))
+        self.assertEqual((1234, False), table.add(('k1234', str(1234 % 7))))
+        self.assertEqual(1234, table.get(('k1234', str(1234 % 7))))
+        self.assertIsNone(table.get(('k1234', 'x')))
+
+    def testCollisions(self):
+        # All keys have the same digest, they are told apart by encoded keys.
+        table = keytable.KeyTable()
+        with mock.patch.object(keytable, 'key_digest', return_value=(1, 2)):
+            for k in 'abc':
+                table.add((k,))
+            self.assertEqual((1, False), table.add(('b',)))
+            self.assertEqual([0, 1, 2, None], [table.get((k,)) for k in 'abcd'])
+
+    def testEncodeKey(self):
+        keys = [('a', 'b'), ('a\0b',), ('a\0', 'b'), ('',), (), ('', ''), (1, 'a'), ('\1',)]
+        encoded = [keytable.encode_key(k) for k in keys]
+        self.assertEqual(len(keys), len(set(encoded)))
+
+
+class TestRowTable(unittest.TestCase):
+    def testRows(self):
+        header = csvutil.Header(['k', 'v'])
+        table = keytable.RowTable()
+        for values in (('a', '1'), ('b', '2'), ('a', '3')):
+            table.add(values[:1], csvutil.TupleRow(header, values))
+        self.assertEqual((0, False), table.add_new(('a',), csvutil.TupleRow(header, ('a', '4'))))
+        self.assertEqual(2, len(table))
+        self.assertEqual(1, table.get(('b',)))
+        rows = list(table.rows([0, 1]))
+        self.assertEqual([('a', '3'), ('b', '2')], [r.values for r in rows])
+        self.assertIs(header, rows[0].header)
+
+
+if __name__ == '__main__':
+    unittest.main()
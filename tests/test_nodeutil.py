@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import itertools
+import logging
+import random
+import unittest
+
+from sgmt import nodeutil
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestMatcher(unittest.TestCase):
+    def assertSameAsRe(self, patterns, strings):
+        m = nodeutil.Matcher(patterns)
+        r = nodeutil.re_contains(patterns)
+        for s in strings:
+            self.assertEqual(bool(r.search(s)), m(s), (patterns, s))
+
+    def testAnchors(self):
+        patterns = ['^a^', 'b^', '^c', 'd', '^e.f^', '^.g^', '^h_i^']
+        parts = ['', 'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'x', '.', '_', ' ', 'é']
+        strings = [''.join(p) for p in itertools.product(parts, repeat=3)]
+        self.assertSameAsRe(patterns, strings)
+
+    def testDegenerate(self):
+        strings = ['', '.', 'a', 'a.b']
+        for patterns in ([], [''], ['^'], ['^^'], ['^', 'a^']):
+            self.assertSameAsRe(patterns, strings)
+
+    def testRandom(self):
+        rnd = random.Random(1)
+        alphabet = 'ab.-_'
+        def word(n):
+            return ''.join(rnd.choice(alphabet) for _ in range(n))
+        for _ in range(50):
+            patterns = [
+                rnd.choice(['', '^']) + word(rnd.randint(1, 3)) + rnd.choice(['', '^'])
+                for _ in range(rnd.randint(1, 5))
+            ]
+            strings = [word(rnd.randint(0, 8)) for _ in range(50)]
+            self.assertSameAsRe(patterns, strings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from sgmt import common
+from sgmt import parallel
+
+from sgmt.cmd import cat
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.big = os.path.join(self.tmp.name, 'big.csv')
+        rnd = random.Random(1)
+        with open(self.big, 'w') as f:
+            f.write('src,dst,n\n')
+            for i in range(2000):
+                f.write('n{},n{},{}\n'.format(rnd.randrange(100), rnd.randrange(100), i))
+        self.inputs = [os.path.join(TESTDATA, 'f1.csv'), self.big, os.path.join(TESTDATA, 'f3.csv')]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_cmd(self, cmd_type, jobs, **flags):
+        cmd = cmd_type()
+        cmd.flags = common.Struct(
+            input=self.inputs,
+            input_dialect='default',
+            jobs=jobs,
+            chunk_size='4K',
+        )
+        cmd.flags.update(flags)
+        return cmd
+
+    def rows(self, rows):
+        return [(r.values, r['@fn'], r['@frn'], r['@rn']) for r in rows]
+
+    def testSameAsSequential(self):
+        expected = self.rows(self.make_cmd(cat.CatCmd, 1).iter_rows())
+        self.assertEqual(2009, len(expected))
+        self.assertEqual(expected, self.rows(self.make_cmd(cat.CatCmd, 3).iter_rows()))
+        self.assertTrue(len(list(parallel.make_tasks(self.make_cmd(cat.CatCmd, 3)))) > 5)
+
+    def testLocalProcess(self):
+        flags = dict(column=['s=src'])
+        expected = list(self.make_cmd(cat.ExtractCmd, 1, **flags).process_rows())
+        actual = list(self.make_cmd(cat.ExtractCmd, 3, **flags).process_rows())
+        self.assertEqual(sorted(r.values for r in expected), sorted(r.values for r in actual))
+
+    def testBatches(self):
+        cmd = self.make_cmd(cat.CatCmd, 3, chunk_size=None, spill_dir=self.tmp.name)
+        expected = self.rows(self.make_cmd(cat.CatCmd, 1).iter_rows())
+        task = [t for t in parallel.make_tasks(cmd) if t.filename == self.big][0]
+        parallel.init_worker(cmd)
+        with mock.patch.object(parallel, 'BATCH_ROWS', 300):
+            counter, rows, filename = parallel.run_task(task, False)
+        self.assertEqual([2000, []], [counter[0], rows])
+        self.assertTrue(os.path.exists(filename))
+        actual = [parallel.renumber(r, 3, 0) for r in parallel.read_batches(filename)]
+        self.assertEqual(expected[3:2003], self.rows(actual))
+        self.assertFalse(os.path.exists(filename))
+
+    def testWholeFiles(self):
+        spill_dir = os.path.join(self.tmp.name, 'spill')
+        os.mkdir(spill_dir)
+        huge = os.path.join(self.tmp.name, 'huge.csv')
+        with open(huge, 'w') as f:
+            f.write('src,dst,n\n')
+            for i in range(3 * parallel.BATCH_ROWS):
+                f.write('n{},n{},{}\n'.format(i % 7, i % 11, i))
+        cmd = self.make_cmd(cat.CatCmd, 2, input=[huge, self.big, huge], chunk_size=None, spill_dir=spill_dir)
+        expected = self.rows(self.make_cmd(cat.CatCmd, 1, input=[huge, self.big, huge]).iter_rows())
+        self.assertEqual(expected, self.rows(parallel.iter_rows(cmd)))
+
+        rows = parallel.iter_rows(cmd)
+        next(rows)
+        rows.close()
+        self.assertEqual([], os.listdir(spill_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
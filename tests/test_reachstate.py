@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import random
+import tempfile
+import unittest
+
+from sgmt import csvutil
+from sgmt import graphstore
+from sgmt import reachstate
+
+
+_logger = logging.getLogger(__name__)
+
+
+def full_bfs(rows, is_src):
+    graph = graphstore.Graph.from_rows(rows)
+    seeds = [n for n in graph.find_nodes(is_src) if graph.out_degree(n)]
+    edge_ids = list(graphstore.bfs(graph, seeds))
+    return graph, seeds, edge_ids
+
+
+class TestState(unittest.TestCase):
+    def testIncrementalSameAsFull(self):
+        rnd = random.Random(1)
+        is_src = lambda n: n in ('0', '1')
+        for _ in range(30):
+            n = rnd.randint(2, 30)
+            rows = [
+                csvutil.Row(src=str(rnd.randrange(n)), dst=str(rnd.randrange(n)), w=str(i))
+                for i in range(rnd.randint(1, 60))
+            ]
+            split = rnd.randrange(len(rows) + 1)
+
+            graph, seeds, edge_ids = full_bfs(rows[:split], is_src)
+            state = reachstate.State.from_graph(graph, None, ['src', 'dst', 'w'], seeds, edge_ids)
+            state.extend(rows[split:], is_src)
+
+            graph, _, edge_ids = full_bfs(rows, is_src)
+            expected = {
+                (r['src'], r['dst']): (r['src'], r['dst'], r['w'])
+                for r in map(graph.edge_row, edge_ids)
+            }
+            self.assertEqual(expected, state.edges)
+
+    def testDormantStore(self):
+        is_src = lambda n: n == 'a'
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'state')
+            rows = [csvutil.Row(src='a', dst='b', w='1')]
+            rows += [csvutil.Row(src='x', dst='y{}'.format(i), w='2') for i in range(1000)]
+            graph, seeds, edge_ids = full_bfs(rows, is_src)
+            dormant = reachstate.DormantStore(reachstate.dormant_filename(filename), new=True)
+            state = reachstate.State.from_graph(graph, None, ['src', 'dst', 'w'], seeds, edge_ids, dormant)
+            state.save(filename)
+            state.close()
+            # Dormant edges are not saved with the state.
+            self.assertLess(os.path.getsize(filename), 1000)
+
+            state = reachstate.State.load(filename, None)
+            state.extend([csvutil.Row(src='z', dst='x', w='3')], is_src)
+            state.save(filename)
+            state.close()
+
+            state = reachstate.State.load(filename, None)
+            reached = state.extend([csvutil.Row(src='b', dst='z', w='4')], is_src)
+            self.assertEqual(1002, len(reached))
+            self.assertEqual(('x', 'y7', '2'), state.edges[('x', 'y7')])
+            state.save(filename)
+            self.assertEqual([(0,)], list(state.dormant.db.execute('SELECT COUNT(*) FROM dormant')))
+            state.close()
+
+    def testSignatureMismatch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'state')
+            reachstate.State({'nodes': ['a']}, ['src', 'dst'], 'src', 'dst').save(filename)
+            self.assertEqual(['src', 'dst'], reachstate.State.load(filename, {'nodes': ['a']}).fieldnames)
+            with self.assertRaises(reachstate.StateMismatchError):
+                reachstate.State.load(filename, {'nodes': ['b']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import unittest
+
+from sgmt import setexpr
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestSetExpr(unittest.TestCase):
+    def members(self, text, count=4):
+        expr = setexpr.SetExpr(text, setexpr.default_aliases(count))
+        return [mask for mask in range(1 << count) if expr(mask)]
+
+    def testPrecedence(self):
+        # "-" binds tighter than "&", so "a & b - c | d" is parsed as
+        # (a & (b - c)) | d, which is the same set as ((a & b) - c) | d.
+        expected = [m for m in range(16) if (m & 3 == 3 and not m & 4) or m & 8]
+        self.assertEqual(expected, self.members('(a & b) - c | d'))
+        self.assertEqual(expected, self.members('a & b - c | d'))
+        self.assertEqual([m for m in range(16) if m & 1 and not m & 2], self.members('a - b'))
+        self.assertEqual([m for m in range(16) if bool(m & 1) != bool(m & 2)], self.members('a ^ b'))
+        self.assertEqual([m for m in range(16) if not m & 1], self.members('~a'))
+
+    def testErrors(self):
+        for text in ('a + b', 'a &', 'a & e', 'f(a)', '1'):
+            with self.assertRaises(setexpr.ExprError, msg=text):
+                setexpr.SetExpr(text, 'abcd')
+        with self.assertRaises(setexpr.ExprError):
+            setexpr.SetExpr('a', ['a', 'a'])
+        with self.assertRaises(setexpr.ExprError):
+            setexpr.default_aliases(27)
+
+
+if __name__ == '__main__':
+    unittest.main()
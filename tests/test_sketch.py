@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import unittest
+
+from sgmt import sketch
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestKeyHash(unittest.TestCase):
+    def testStable(self):
+        # The same in every process, whatever PYTHONHASHSEED is.
+        self.assertEqual(11797832347080049151, sketch.key_hash(('a', 'b')))
+        self.assertEqual(sketch.key_hash(('a',)), sketch.key_hash('a'))
+        self.assertNotEqual(sketch.key_hash(('a', 'b')), sketch.key_hash(('a\0b',)))
+
+
+class TestBloomFilter(unittest.TestCase):
+    def testFalsePositives(self):
+        bloom = sketch.BloomFilter(10000, 0.01)
+        for i in range(10000):
+            bloom.add(('k{}'.format(i),))
+        self.assertTrue(all(('k{}'.format(i),) in bloom for i in range(10000)))
+        false_positives = sum(('x{}'.format(i),) in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def testCount(self):
+        for n in (0, 10, 1000, 100000):
+            hll = sketch.HyperLogLog(12)
+            for i in range(n):
+                hll.add(('k{}'.format(i),))
+                hll.add(('k{}'.format(i),))
+            self.assertAlmostEqual(n, hll.count(), delta=n * 0.06 + 1)
+
+    def testCompare(self):
+        a, b = sketch.HyperLogLog(), sketch.HyperLogLog()
+        for i in range(30000):
+            a.add(str(i))
+        for i in range(20000, 40000):
+            b.add(str(i))
+        c = sketch.compare(a, b)
+        self.assertAlmostEqual(40000, c.union, delta=1000)
+        self.assertAlmostEqual(10000, c.intersection, delta=1500)
+        self.assertAlmostEqual(0.25, c.jaccard, delta=0.04)
+        self.assertAlmostEqual(0.5, c.right_in_left, delta=0.08)
+
+    def testMergePrecision(self):
+        with self.assertRaises(ValueError):
+            sketch.HyperLogLog(10).merge(sketch.HyperLogLog(12))
+
+
+class TestDistinctSample(unittest.TestCase):
+    def testExact(self):
+        sample = sketch.DistinctSample(100, lambda: [0])
+        for i in range(300):
+            sample.get(i % 100)[0] += 1
+        self.assertEqual(1.0, sample.rate)
+        self.assertEqual([3] * 100, [v[0] for v in sample.items.values()])
+
+    def testSampled(self):
+        sample = sketch.DistinctSample(1000, lambda: [0])
+        for i in range(100000):
+            v = sample.get('k{}'.format(i % 20000))
+            if v is not None:
+                v[0] += 1
+        self.assertLess(sample.rate, 1.0)
+        self.assertLessEqual(len(sample), 1000)
+        self.assertTrue(all(v[0] == 5 for v in sample.items.values()))
+        self.assertAlmostEqual(20000, sample.estimate(len(sample)), delta=3000)
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def testTop(self):
+        hubs = sketch.SpaceSaving(20)
+        for i in range(20000):
+            # Keys 0-4 are frequent, others are seen once or twice.
+            hubs.add(i % 5 if i % 2 else 'k{}'.format(i // 3))
+        self.assertEqual(20, len(hubs))
+        top = hubs.top(5)
+        self.assertEqual(list(range(5)), sorted(k for k, _ in top))
+        for _, c in top:
+            self.assertEqual(2000, c)
+
+    def testInitialCounts(self):
+        hubs = sketch.SpaceSaving(2, [('a', 5), ('b', 3)])
+        hubs.add('c')
+        self.assertEqual([('a', 5), ('c', 1)], hubs.top(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
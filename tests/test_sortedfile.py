@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import os
+import random
+import tempfile
+import unittest
+
+from sgmt import csvutil
+from sgmt import sortedfile
+
+from sgmt.cmd import graph_ops
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestSortedFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'sorted.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rows):
+        with open(self.filename, 'w') as f:
+            f.write('n,src,dst\n')
+            for i, (src, dst) in enumerate(sorted(rows, key=lambda r: r[0])):
+                f.write('{},{},{}\n'.format(i, src, dst))
+
+    def testLookup(self):
+        self.write([('a', 'b'), ('b', 'c'), ('b', 'd'), ('d', 'a'), ('é', 'a')])
+        with sortedfile.SortedFile(self.filename, 'src') as sf:
+            self.assertEqual([('1', 'b', 'c'), ('2', 'b', 'd')], [r.values for r in sf.lookup('b')])
+            self.assertEqual(['b'], [r['dst'] for r in sf.lookup('a')])
+            self.assertEqual(['a'], [r['dst'] for r in sf.lookup('é')])
+            self.assertEqual([], sf.lookup('c'))
+            self.assertEqual([], sf.lookup(''))
+            self.assertEqual([], sf.lookup('z'))
+
+    def testMissingColumn(self):
+        self.write([])
+        with self.assertRaises(ValueError):
+            sortedfile.SortedFile(self.filename, 'node')
+
+    def testLazyBfsSameAsBfs(self):
+        rnd = random.Random(1)
+        for _ in range(20):
+            n = rnd.randint(1, 30)
+            edges = [(str(rnd.randrange(n)), str(rnd.randrange(n))) for _ in range(rnd.randint(0, 60))]
+            self.write(edges)
+            seeds = {str(rnd.randrange(n)) for _ in range(2)}
+            with open(self.filename) as f:
+                rows = list(csvutil.Reader(f))
+            with sortedfile.SortedFile(self.filename, 'src') as sf:
+                expected = {(r.src, r.dst, r.n) for r in graph_ops.bfs(rows, seeds.__contains__, 'src', 'dst')}
+                result = {(r['src'], r['dst'], r['n']) for r in graph_ops.bfs_lazy(sf.lookup, seeds, 'src', 'dst')}
+                self.assertEqual(expected, result)
+
+
+if __name__ == '__main__':
+    unittest.main()
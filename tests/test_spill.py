@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import logging
+import tempfile
+import unittest
+
+from sgmt import csvutil
+from sgmt import spill
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TestPartitioner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def testRepeatedValues(self):
+        # Single-character strings are shared objects, so rows repeat them.
+        rows = [csvutil.Row(k=k, v=k if i % 2 else 'x{}'.format(i)) for i, k in enumerate('abcdefgh' * 50)]
+        with spill.Partitioner(lambda r: r['k'], memory_limit=1000, partitions=4, dir=self.tmp.name) as p:
+            for r in rows:
+                p.add(r)
+            self.assertTrue(p.spilled)
+            actual = [r for part in p.partitions() for r in part]
+        self.assertEqual(sorted((r['k'], r['v']) for r in rows), sorted((r['k'], r['v']) for r in actual))
+
+    def testTupleRows(self):
+        header = csvutil.Header(['k', 'v'])
+        rows = [csvutil.TupleRow(header, (k, k)) for k in 'abcd' * 100]
+        with spill.Partitioner(lambda r: r['k'], memory_limit=1000, partitions=2, dir=self.tmp.name) as p:
+            for r in rows:
+                p.add(r)
+            actual = [r for part in p.partitions() for r in part]
+        self.assertEqual(sorted(r.values for r in rows), sorted(r.values for r in actual))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- mode: python; coding: utf-8 -*-
+
+import gzip
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from sgmt import common
+from sgmt import stats
+
+from sgmt.cmd import cat
+
+
+_logger = logging.getLogger(__name__)
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+class TestStats(unittest.TestCase):
+    def testWrapRows(self):
+        st = stats.Stats()
+        with st.phase('process'):
+            self.assertEqual([1, 2, 3], list(st.wrap_rows('read', [1, 2, 3])))
+        self.assertEqual(3, st.rows_in)
+        self.assertEqual({'setup', 'process', 'read'}, set(st.times))
+
+    def testWrapFunc(self):
+        st = stats.Stats()
+        f = st.wrap_func('double', lambda x: 2 * x)
+        self.assertEqual(4, f(2))
+        self.assertEqual('setup', st.current)
+        self.assertIn('double', st.times)
+
+    def testNullStats(self):
+        rows = [1, 2]
+        self.assertIs(rows, stats.NULL_STATS.wrap_rows('read', rows))
+        self.assertIs(len, stats.NULL_STATS.wrap_func('len', len))
+
+    def run_cat(self, tmp, cmd_type=cat.CatCmd, **kw):
+        report = os.path.join(tmp, 'stats.json')
+        cmd = cmd_type()
+        cmd.flags = common.Struct(
+            input=[os.path.join(TESTDATA, 'f1.csv')], input_dialect='default', jobs=1,
+            output=os.path.join(tmp, 'out.csv'), output_dialect='default',
+            debug=False, stats=report, profile=None, profile_output=None,
+        )
+        cmd.flags.update(kw)
+        cmd.main()
+        with open(report) as f:
+            return cmd, json.load(f)
+
+    def testCommandReport(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd, data = self.run_cat(tmp)
+            self.assertEqual(3, data['rows_in'])
+            self.assertEqual(3, data['rows_out'])
+            self.assertEqual(os.path.getsize(cmd.flags.input[0]), data['bytes_in'])
+            self.assertEqual(os.path.getsize(cmd.flags.output), data['bytes_out'])
+            self.assertIn('read', data['phases'])
+            self.assertIn('write', data['phases'])
+
+    def testParallel(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            big = os.path.join(tmp, 'big.csv')
+            with open(big, 'w') as f:
+                f.write('src,dst,n\n')
+                for i in range(1000):
+                    f.write('a{},b{},{}\n'.format(i, i, i))
+            inputs = [os.path.join(TESTDATA, 'f1.csv'), big]
+            size = sum(map(os.path.getsize, inputs))
+            for cmd_type in (cat.CatCmd, cat.ExtractCmd):
+                _, data = self.run_cat(tmp, cmd_type, input=inputs, jobs=2, chunk_size='1K', column=['s=src'])
+                self.assertEqual([1003, size], [data['rows_in'], data['bytes_in']], msg=cmd_type.name)
+
+    def testCompressed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'f1.csv.gz')
+            with open(os.path.join(TESTDATA, 'f1.csv'), 'rb') as f, gzip.open(filename, 'wb') as out:
+                out.write(f.read())
+            _, data = self.run_cat(tmp, input=[filename])
+            self.assertEqual([3, os.path.getsize(filename)], [data['rows_in'], data['bytes_in']])
+
+
+if __name__ == '__main__':
+    unittest.main()